@@ -0,0 +1,207 @@
+"""
+Benchmark suite.
+
+Times parsing, evaluation of assignments, steady-state residuals and jacobians on the bundled
+models and on synthetic models of increasing size. Results are written as JSON and can be
+compared against a stored baseline:
+
+    python benchmarks/bench.py -o bench.json
+    python benchmarks/bench.py --sizes 10 100 --compare bench.json --threshold 1.25
+"""
+
+import os
+import sys
+import json
+import time
+import timeit
+import platform
+import argparse
+import tempfile
+from os import path
+
+import numpy as np
+
+sys.path.insert(0, path.dirname(__file__))
+from synthetic import synthetic_model
+
+BUNDLED_MODELS = {
+    "rbc": path.join(path.dirname(__file__), "..", "tests", "rbc.dyno"),
+    "neo": path.join(path.dirname(__file__), "..", "tests", "neo.dyno"),
+}
+
+SIZES = [10, 100, 1000, 5000]
+
+# parameter sweeps: number of calibrations and numbers of worker processes (0: in-process)
+SWEEP_SIZE = 256
+SWEEP_WORKERS = [0, 1, 2, 4]
+
+# dense jacobians are only benchmarked up to this number of equations
+DENSE_MAX = 1000
+
+
+def measure(f, repeat=3):
+    """Best time (in seconds) of one call to f"""
+    timer = timeit.Timer(f)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def bench_model(name, filename, repeat=3):
+    """Benchmarks for one model file. Returns a list of results."""
+
+    import dynsym
+    from dynsym.grammar import get_parser
+    from dynsym.analyze import FormulaEvaluator
+
+    txt = open(filename, "rt", encoding="utf-8").read()
+    parser = get_parser()
+    tree = parser.parse(txt, start="free_block")
+
+    fe = FormulaEvaluator(steady_state=True)
+    fe.visit(tree)
+    neq = len(fe.equations)
+
+    compiled = dynsym.compile_equations(fe)
+    ys, es = compiled.steady_state
+
+    def assignments():
+        FormulaEvaluator(steady_state=True).visit(tree)
+
+    def residuals_interpreter():
+        [fe.visit(eq) for eq in fe.equations]
+
+    cases = {
+        "parse": lambda: parser.parse(txt, start="free_block"),
+        "assignments": assignments,
+        "residuals_interpreter": residuals_interpreter,
+        "compile": lambda: dynsym.compile_equations(fe),
+        "residuals_compiled": lambda: compiled(ys, ys, ys, es),
+        "read_model_sparse": lambda: dynsym.read_model(filename, sparse=True, cache=True),
+    }
+    model = dynsym.Model(tree, filename=filename)
+    program = model.bytecode
+    params = model.parameters
+    cases["residuals_bytecode"] = lambda: program(ys, ys, ys, es, params)
+    sparse_symbolic = model.sparse_jacobian("symbolic")
+    sparse_colored = model.sparse_jacobian("colored")
+    cases["jacobian_sparse_symbolic"] = lambda: sparse_symbolic(ys, ys, ys, es)
+    cases["jacobian_sparse_colored"] = lambda: sparse_colored(ys, ys, ys, es)
+    if neq <= DENSE_MAX:
+        cases["read_model"] = lambda: dynsym.read_model(filename, cache=True)
+        cases["jacobians_compiled"] = lambda: compiled.jacobians(ys, ys, ys, es)
+        cases["jacobians_dual"] = lambda: compiled.jacobians(ys, ys, ys, es, method="dual")
+
+    results = []
+    for bench, f in cases.items():
+        t = measure(f, repeat=repeat)
+        print(f"{name:>16} {bench:>24}: {t*1000:10.3f} ms")
+        results.append({"benchmark": bench, "model": name, "neq": neq, "time": t})
+    return results
+
+
+def bench_sweep(name, filename, n=SWEEP_SIZE, workers=SWEEP_WORKERS):
+    """Scaling of `dynsym.sweep` with the number of worker processes (one run each)."""
+
+    import dynsym
+
+    model = dynsym.import_model(filename)
+    p = model.parameters
+    # small perturbations of all the constants around the calibration
+    rng = np.random.default_rng(0)
+    table = np.tile(p, (n, 1))
+    nconstants = len(model.constants)
+    table[:, :nconstants] *= 1 + 0.01 * rng.uniform(-1, 1, size=(n, nconstants))
+
+    # compile residuals and jacobians before timing
+    dynsym.sweep(model, table[:1], max_workers=0)
+
+    results = []
+    t_serial = None
+    for w in workers:
+        t = time.perf_counter()
+        dynsym.sweep(model, table, max_workers=w)
+        t = time.perf_counter() - t
+        if w == 0:
+            t_serial = t
+        speedup = f" ({t_serial / t:5.2f}x)" if t_serial else ""
+        print(f"{name:>16} {f'sweep_{n}_w{w}':>24}: {t*1000:10.3f} ms{speedup}")
+        results.append({"benchmark": f"sweep_{n}_w{w}", "model": name, "neq": len(model.equations), "time": t})
+    return results
+
+
+def run(sizes=SIZES, repeat=3, sweep_size=SWEEP_SIZE):
+
+    import dynsym
+
+    results = []
+    with tempfile.TemporaryDirectory() as d:
+        # keep the user cache untouched (and warm it up once per model)
+        os.environ["DYNSYM_CACHE_DIR"] = d
+        for name, filename in BUNDLED_MODELS.items():
+            results += bench_model(name, filename, repeat=repeat)
+        for n in sizes:
+            filename = path.join(d, f"synthetic_{n}.dyno")
+            with open(filename, "wt", encoding="utf-8") as f:
+                f.write(synthetic_model(n))
+            results += bench_model(f"synthetic_{n}", filename, repeat=repeat)
+        if sweep_size:
+            results += bench_sweep("neo", BUNDLED_MODELS["neo"], n=sweep_size)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "dynsym": dynsym.cache.version(),
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, threshold=1.25):
+    """Prints the ratio to the baseline for each benchmark. Returns the list of regressions."""
+
+    base = {(r["benchmark"], r["model"]): r["time"] for r in baseline["results"]}
+    regressions = []
+    for r in results["results"]:
+        key = (r["benchmark"], r["model"])
+        if key not in base:
+            continue
+        ratio = r["time"] / base[key]
+        flag = " <-- regression" if ratio > threshold else ""
+        print(f"{r['model']:>16} {r['benchmark']:>24}: {ratio:6.2f}x{flag}")
+        if ratio > threshold:
+            regressions.append({**r, "baseline": base[key], "ratio": ratio})
+    return regressions
+
+
+def main(args=None):
+
+    ap = argparse.ArgumentParser(description="dynsym benchmarks")
+    ap.add_argument("--sizes", type=int, nargs="*", default=SIZES, help="sizes of the synthetic models")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--sweep", type=int, default=SWEEP_SIZE, help="number of calibrations in the sweep benchmark (0 to skip)")
+    ap.add_argument("-o", "--output", help="write results to this JSON file")
+    ap.add_argument("--compare", help="baseline JSON file to compare with")
+    ap.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    opts = ap.parse_args(args)
+
+    results = run(sizes=opts.sizes, repeat=opts.repeat, sweep_size=opts.sweep)
+
+    if opts.output:
+        with open(opts.output, "wt", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if opts.compare:
+        with open(opts.compare, "rt", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, threshold=opts.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s)")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+Generator of synthetic models of arbitrary size, for benchmarks.
+
+Each endogenous variable follows
+
+    x_i[t] = (1-rho) + rho * x_i[t-1]^alpha * x_j[t+1]^(1-alpha) * exp(e_k[t])
+
+where x_j is a neighbour of x_i and e_k one of the shocks, so that the steady-state is x_i = 1.
+"""
+
+
+def synthetic_model(neq: int, nshocks: int = None, T: int = 50) -> str:
+    """Source of a synthetic model with `neq` equations"""
+
+    if nshocks is None:
+        nshocks = max(1, neq // 10)
+
+    lines = [
+        "# Parameters",
+        "rho <- 0.9",
+        "alpha <- 0.7",
+        f"T <- {T}",
+        "",
+        "# Steady-state",
+    ]
+    for i in range(neq):
+        lines.append(f"x{i}[~] <- 1")
+    lines.append("")
+    lines.append("# Exogenous variables")
+    for k in range(nshocks):
+        lines.append(f"e{k}[t] <- N(0, 0.01)")
+    lines.append("")
+    lines.append("# Dynamic equations")
+    for i in range(neq):
+        j = (i + 1) % neq
+        k = i % nshocks
+        lines.append(f"x{i}[t] = (1-rho) + rho*x{i}[t-1]^alpha*x{j}[t+1]^(1-alpha)*exp(e{k}[t])")
+    lines.append("")
+    lines.append("# Initial values and shocks")
+    lines.append("x0[0] <- 1.01")
+    for k in range(nshocks):
+        lines.append(f"∀ t, 0 <= t < 10 : e{k}[t] <- 0.01/(t+1)")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+
+    import sys
+    print(synthetic_model(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
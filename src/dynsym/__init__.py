@@ -1,47 +1,89 @@
-from .grammar import parser, str_expression
-from .analyze import FormulaEvaluator as Analyzer
+# modules importing lark (grammar, analyze) are imported on first use, so that
+# compiled models can be loaded (`load_compiled`) without it
+from .compiler import compile_equations
+from .autodiff import DenseDNumber
+from .sparse import sparse_blocks
+from .cache import parse as parse_cached
+from .model import Model
+from .steady_state import solve_steady_state
+from .perfect_foresight import solve_perfect_foresight
+from .perturbation import solve_perturbation
+from .sweep import sweep
+from .export import import_exported
+from .artifact import save_compiled, load_compiled
 
 import numpy as np
 
-def read_model(filename, diff=True):
+def read_model(filename, diff=True, sparse=False, cache=False):
+    """
+    Read a model file and compute the residuals and jacobians at the steady-state.
+
+    Returns (r, A, B, C, D) where A, B, C are the derivatives w.r.t. endogenous variables
+    at t+1, t and t-1 and D the derivatives w.r.t. exogenous variables.
+    With `sparse=True` (or a format among "csr", "csc", "coo") the jacobians are returned as
+    scipy.sparse matrices (or `COOTriplets` if scipy is not installed).
+    If `cache` is True, the parsed model is stored in (and reloaded from) the on-disk cache
+    (see `dynsym.cache`: the cache directory must be trusted).
+    """
 
     with open(filename, "rt", encoding="utf-8") as f:
         txt = f.read()
-    tree = parser.parse(txt, start="free_block")
+    tree = parse_cached(txt, start="free_block", cache=cache)
+
+    from .analyze import FormulaEvaluator as Analyzer
 
     if diff is False:
         an = Analyzer(steady_state=True, diff=False)
         res = an.evaluate(tree)
         return res
 
-    an = Analyzer(steady_state=False, diff=True)
+    if sparse:
+        an = Analyzer(steady_state=False, diff="sparse")
+        res = an.evaluate(tree)
+        r = np.array([getattr(v, 'value', v) for v in res], dtype=float)
+        derivatives = [getattr(v, 'derivatives', {}) for v in res]
+        fmt = sparse if isinstance(sparse, str) else "csr"
+        A, B, C, D = sparse_blocks(derivatives, an.index, format=fmt)
+        return r, A, B, C, D
+
+    an = Analyzer(steady_state=False, diff="dense")
     res = an.evaluate(tree)
 
-    variables = an.symbols['variables']
-    exogenous = an.symbols['exogenous']
-    endogenous = [v for v in variables if v not in exogenous]
-    # constants = an.symbols['constants']
-    # values = an.symbols['values']
-        
-    A = np.zeros((len(res), len(endogenous)))
-    B = np.zeros((len(res), len(endogenous)))
-    C = np.zeros((len(res), len(endogenous)))
-    D = np.zeros((len(res), len(exogenous)))
-
-    J = [A,B,C]
-
-    for i,v in enumerate(endogenous):
-        for k,_s in enumerate(["[t+1]", "[t]", "[t-1]"]):
-            vfull = v+_s
-            for n,r in enumerate(res):
-                if vfull not in r.derivatives:
-                    continue
-                J[k][n,i] = r.derivatives[vfull]
-    for i,v in enumerate(exogenous):
-        vfull = v+"[t]"
-        for n,r in enumerate(res):
-            if vfull not in r.derivatives:
-                continue
-            D[n,i] = r.derivatives[vfull]
+    # equations without any variable evaluate to plain numbers
+    r = np.array([getattr(v, 'value', v) for v in res], dtype=float)
+    J = np.array([
+        v.gradient if isinstance(v, DenseDNumber) else np.zeros(an.index.size)
+        for v in res
+    ]).reshape((len(res), an.index.size))
+
+    A, B, C, D = an.index.blocks(J)
 
     return r, A, B, C, D
+
+
+def import_model(filename, cache=False) -> Model:
+    """
+    Read a model file and return a `Model`.
+
+    If `cache` is True, the parsed model is stored in (and reloaded from) the on-disk cache
+    (see `dynsym.cache`: the cache directory must be trusted).
+    """
+
+    with open(filename, "rt", encoding="utf-8") as f:
+        txt = f.read()
+    tree = parse_cached(txt, start="free_block", cache=cache)
+    return Model(tree, filename=filename)
+
+
+def __getattr__(name):
+    # the parser is built lazily, on first use
+    if name == "parser":
+        from .grammar import get_parser
+        return get_parser()
+    if name == "str_expression":
+        from .grammar import str_expression
+        return str_expression
+    if name == "Analyzer":
+        from .analyze import FormulaEvaluator
+        return FormulaEvaluator
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
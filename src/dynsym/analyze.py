@@ -2,8 +2,12 @@ from lark.visitors import Transformer, Interpreter
 from lark.tree import Tree
 from lark.lexer import Token
 import math
+import numpy as np
 from typing import Dict, Any, Callable, Union, List
 from .autodiff import DNumber as DN
+from .autodiff import VariableIndex
+from .timeseries import TimeSeries
+from .processes import Normal
 import math
 
 class DefinitionError(Exception):
@@ -20,10 +24,17 @@ class DefinitionError(Exception):
 
 
     
-class Normal:
-    def __init__(self, u,v):
-        self.mu = u
-        self.sigma = v
+def find_variables(equations: List[Tree]) -> List[str]:
+    """Return the names of the variables (name[t+shift]) appearing in equations, by order of first appearance"""
+    names = {}
+    for eq in equations:
+        for node in eq.iter_subtrees_topdown():
+            if node.data == 'variable':
+                name = str(node.children[0].children[0])
+                index = str(node.children[1].children[0])
+                if index != '~':
+                    names[name] = None
+    return list(names)
 
 class FormulaEvaluator(Interpreter):
     """
@@ -36,7 +47,7 @@ class FormulaEvaluator(Interpreter):
     - Assignments and equations
     """
     
-    def __init__(self, symbol_table: Dict[str, Any] = None, function_table: Dict[str, Callable] = None, steady_state=False, diff=False):
+    def __init__(self, symbol_table: Dict[str, Any] = None, function_table: Dict[str, Callable] = None, steady_state=False, diff=False, profile=False):
         """
         Initialize the evaluator.
         
@@ -44,6 +55,13 @@ class FormulaEvaluator(Interpreter):
             symbol_table: Dictionary mapping symbol names to their values
             function_table: Dictionary mapping function names to callable functions
             steady_state: If True, evaluates variables at their steady state (only the name of the symbol is taken into account)
+            diff: If True, `evaluate` differentiates the equations using dual numbers keyed by variable (e.g. "k[t-1]").
+                If "dense", it uses dense dual numbers sharing the slots of `self.index` (a `VariableIndex`).
+                If "sparse", it uses dual numbers keyed by the (integer) slots of `self.index`.
+                If "reverse", operations are recorded on `self.tape` (see `dynsym.reverse.Tape`), with
+                the variables as inputs (at the position of their slot in `self.index`).
+            profile: If True, records call counts and times per rule, function and equation in `self.profile`
+                (see `dynsym.profiling`). Evaluators created without profiling are not instrumented at all.
         """
         super().__init__()
         # self.symbol_table = symbol_table or {}
@@ -53,13 +71,16 @@ class FormulaEvaluator(Interpreter):
 
         self.constants = {}
         self.processes = {}
-        self.values = {}
+        self.values = {} # name -> TimeSeries
         self.variables = {}
         self.steady_states = {}
 
         self.equations = []
         self.time = None # None or integer
         self.errors = []
+        self.index = None
+        self.tape = None
+        self.folded = []
 
         # Add default mathematical functions
         from .autodiff import MATH_FUNCTIONS
@@ -67,6 +88,105 @@ class FormulaEvaluator(Interpreter):
 
         self.function_table.update({'N': (lambda u,v: Normal(u,v)) })
 
+        self.profile = None
+        if profile:
+            from .profiling import instrument
+            self.profile = instrument(self)
+
+    @property
+    def symbols(self):
+        """Symbols defined by the processed blocks"""
+        exogenous = list(self.processes.keys())
+        variables = find_variables(self.equations)
+        return {
+            'variables': variables,
+            'endogenous': [v for v in variables if v not in exogenous],
+            'exogenous': exogenous,
+            'constants': self.constants,
+            'values': self.values,
+            'steady_states': self.steady_states,
+        }
+
+    def get_symbol_table(self):
+        """Flat dictionary with all defined constants, steady-states and values"""
+        table = dict(self.constants)
+        for name, value in self.steady_states.items():
+            table[f"{name}[~]"] = value
+        for name, values in self.values.items():
+            for time, value in values.items():
+                table[f"{name}[{time}]"] = value
+        return table
+
+    def evaluate(self, tree, fold=True):
+        """
+        Process a free block and evaluate its equations at the steady-state.
+
+        Unless `steady_state` is True, the variables at t-1, t, t+1 are set to their
+        steady-state values (as dual numbers, if `diff` is set) before evaluating the equations.
+        If `fold` is True, constants are substituted and folded in the equations before they are evaluated.
+        """
+        self.visit(tree)
+
+        if not self.steady_state:
+            symbols = self.symbols
+            endogenous = symbols['endogenous']
+            exogenous = symbols['exogenous']
+            if self.diff in ("dense", "sparse", "reverse"):
+                self.index = VariableIndex(endogenous, exogenous)
+            if self.diff == "reverse":
+                from .reverse import Tape
+                self.tape = Tape()
+                self.function_table.update(self.tape.functions)
+            for name in endogenous:
+                self.variables[name] = {
+                    shift: self.seed(name, shift, self.steady_states.get(name, math.nan))
+                    for shift in (-1, 0, 1)
+                }
+            for name in exogenous:
+                self.variables[name] = {0: self.seed(name, 0, self.steady_states.get(name, math.nan))}
+
+        self.folded = self.equations
+        if fold:
+            from .folding import fold_constants
+            self.folded = fold_constants(self.equations, self.constants, self.steady_states)
+        res = [self.visit(eq) for eq in self.folded]
+        if self.diff == "reverse" and not self.steady_state:
+            self.tape.output(res)
+        return res
+
+    def evaluate_batch(self, variables: Dict[str, Dict[int, np.ndarray]] = None) -> np.ndarray:
+        """
+        Evaluate the equations for a batch of N points in one tree walk.
+
+        Values, steady-states and variables can all be numpy arrays of shape (N,):
+        arithmetic is then vectorized and math functions dispatch to numpy ufuncs.
+
+        Args:
+            variables: maps variable names to {shift: array of shape (N,)}. If None,
+                the current `variables` (or `steady_states` in steady-state mode) are used.
+
+        Returns:
+            An array of residuals with shape (neq, N).
+        """
+        if variables is not None:
+            self.variables.update(variables)
+        res = [self.visit(eq) for eq in self.equations]
+        return np.array(np.broadcast_arrays(*res), dtype=float)
+
+    def seed(self, name, shift, value):
+        """Returns the value of variable name[t+shift], as a dual number if `diff` is set"""
+        if self.diff == "dense":
+            return self.index.seed(name, shift, value)
+        elif self.diff == "sparse":
+            return DN(value, {self.index.slots[(name, shift)]: 1.0})
+        elif self.diff == "reverse":
+            return self.tape.input(value, position=self.index.slots[(name, shift)])
+        elif self.diff:
+            key = f"{name}[t{shift:+d}]" if shift != 0 else f"{name}[t]"
+            return DN(value, {key: 1.0})
+        else:
+            return value
+
     # Arithmetic operations
     def add(self, tree):
         """Handle addition: a + b"""
@@ -90,7 +210,7 @@ class FormulaEvaluator(Interpreter):
         """Handle division: a / b"""
         left = self.visit(tree.children[0])
         right = self.visit(tree.children[1])
-        if right == 0:
+        if not isinstance(right, np.ndarray) and right == 0:
             raise ZeroDivisionError("Division by zero")
         return left / right
     
@@ -141,14 +261,13 @@ class FormulaEvaluator(Interpreter):
                 )
                 return math.nan
             else:
-                vvs = self.values[name]
-                if time not in vvs:
+                try:
+                    return self.values[name][time]
+                except KeyError:
                     self.errors.append(
                         DefinitionError(f"Undefined value {name}[{time}]", tree=tree)
                     )
                     return math.nan
-                else:
-                    return vvs[time]
     
     def variable(self, tree):
         """Handle variables with time indexing: name[t+shift]"""
@@ -160,7 +279,10 @@ class FormulaEvaluator(Interpreter):
         if name not in self.variables:
             self.variables[name] = {}
         
-        if self.time is not None:
+        if isinstance(self.time, np.ndarray):
+            # all the dates of a quantified assignment at once
+            return self.values[name].at(int(self.time[0]) + shift, int(self.time[-1]) + shift + 1)
+        elif self.time is not None:
             time = self.time + shift
             key = f"{name}[{time}]"
             return self.values[name].get(time, math.nan)
@@ -209,7 +331,7 @@ class FormulaEvaluator(Interpreter):
 
         elif symbol_tree.data == "value":
             if name not in self.values:
-                self.values[name] = {}
+                self.values[name] = TimeSeries()
             time = int(symbol_tree.children[1].children[0])
             self.values[name][time] = value
 
@@ -229,7 +351,7 @@ class FormulaEvaluator(Interpreter):
                     raise Exception(f"Warning: invalid redefinition of process {name}.")
                 else:
                     self.processes[name] = value
-                    self.steady_states[name] = value.mu
+                    self.steady_states[name] = getattr(value, "mu", value)
 
         return value
     
@@ -243,31 +365,42 @@ class FormulaEvaluator(Interpreter):
             assert( isinstance(lower,int) and isinstance(upper, int) and lower<upper)
         except:
             raise ValueError(f"Invalid bounds in quantified assignment: {lower}, {upper}")
-        dates = range(lower, upper)
-        
+
         symbol_tree = tree.children[1]
         name = str(symbol_tree.children[0].children[0])
+        index = str(symbol_tree.children[1].children[0])
+        shift = int(symbol_tree.children[2].children[0])
+        assert index=='t' and shift==0
 
         if name not in self.values:
-            self.values[name] = {}
+            self.values[name] = TimeSeries()
 
-        for d in dates:
-            
-            self.time = d
-            self.constants['t'] = d
+        # a right-hand side referring to the symbol being defined is evaluated date by date
+        recursive = any(
+            node.data == 'variable' and str(node.children[0].children[0]) == name
+            for node in tree.children[2].iter_subtrees()
+        )
 
-            value = self.visit(tree.children[2])
-            
-            name = str(symbol_tree.children[0].children[0])
-            index = str(symbol_tree.children[1].children[0])
-            shift = int(symbol_tree.children[2].children[0])
-            assert index=='t' and shift==0
+        if not recursive:
+            # evaluate once for all dates: references to x[t+s] are shifted slices of the values of x
+            # (t is a float array, as integer arrays don't support e.g. t^(-2))
+            self.time = np.arange(lower, upper, dtype=float)
+            self.constants['t'] = self.time
+            try:
+                with np.errstate(divide='raise', over='raise', invalid='raise'):
+                    value = self.visit(tree.children[2])
+            except FloatingPointError:
+                # report the error as the evaluation date by date does
+                recursive = True
+            else:
+                self.values[name].assign(lower, np.broadcast_to(value, (upper - lower,)))
 
-            # self.symbol_table[key] = value
-            self.values[name][d] = value
-            
+        if recursive:
+            for d in range(lower, upper):
+                self.time = d
+                self.constants['t'] = d
+                self.values[name][d] = self.visit(tree.children[2])
 
-        # self.time = original_time
         self.constants.pop('t', None)
         self.time=None
         
@@ -313,4 +446,6 @@ class FormulaEvaluator(Interpreter):
 #         """Handle equations: left = right. Returns the difference (should be 0 for equality)"""
 #         left = self.visit(tree.children[0])
 #         right = self.visit(tree.children[1])
-#         return right - left  # Return difference for equation solving
\ No newline at end of file
+#         return right - left  # Return difference for equation solving
+
+Analyzer = FormulaEvaluator
@@ -0,0 +1,187 @@
+"""
+Compiled models saved to a single file.
+
+`save_compiled` writes everything derived from a model file to an (uncompressed) `.npz` archive:
+orderings of the variables, constants, steady-states, processes, values, the sparsity pattern
+of the jacobian and the compiled kernels (residuals and sparse jacobian refill), as python source
+and as marshalled code objects. `load_compiled` reads it back into a `CompiledModel` without parsing
+the model, evaluating its definitions or compiling python code (when the python version is the same).
+
+Loading a file executes the code it contains: only load files from trusted sources.
+"""
+
+import sys
+import json
+import marshal
+import numpy as np
+from typing import Dict, List
+
+from .autodiff import MATH_FUNCTIONS, DERIVATIVE_FUNCTIONS, VariableIndex
+from .compiler import CompiledEquations
+from .sparsity import SparsityPattern, SparseJacobian
+from .timeseries import TimeSeries
+from .processes import Normal
+
+# version of the file layout
+ARTIFACT_FORMAT = 1
+
+
+def _plain(x):
+    # json representation of calibrated values (numbers or arrays)
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    if isinstance(x, np.generic):
+        return x.item()
+    return x
+
+
+def _bytes(b: bytes) -> np.ndarray:
+    return np.frombuffer(b, dtype=np.uint8)
+
+
+def save_compiled(model, filename: str):
+    """Saves the compiled `model` to `filename` (see `load_compiled`)"""
+
+    compiled = model.compiled
+    pattern = model.sparsity
+    jac = model.sparse_jacobian()
+    code = compile(compiled.source + "\n" + jac.source, "<dynsym>", "exec")
+
+    names = list(model.values.keys())
+    header = {
+        "format": ARTIFACT_FORMAT,
+        "filename": model.filename,
+        "endogenous": list(model.endogenous),
+        "exogenous": list(model.exogenous),
+        "parameters": list(compiled.parameters),
+        "constants": {k: _plain(v) for k, v in model.constants.items()},
+        "steady_states": {k: _plain(v) for k, v in model.steady_states.items()},
+        "processes": {
+            k: {"mu": _plain(getattr(p, "mu", p)), "sigma": _plain(getattr(p, "sigma", None))}
+            for k, p in model.processes.items()
+        },
+        # values are stored one after the other in a single array
+        "values": [[name, model.values[name].start, len(model.values[name].data)] for name in names],
+        "cache_tag": sys.implementation.cache_tag,
+    }
+    arrays = {
+        "header": _bytes(json.dumps(header).encode("utf-8")),
+        "parameter_values": compiled.parameter_values,
+        "indptr": pattern.indptr,
+        "indices": pattern.indices,
+        "residuals_source": _bytes(compiled.source.encode("utf-8")),
+        "jacobian_source": _bytes(jac.source.encode("utf-8")),
+        "code": _bytes(marshal.dumps(code)),
+        "values": np.concatenate([model.values[name].data for name in names] + [np.zeros(0)]),
+    }
+    with open(filename, "wb") as f:
+        np.savez(f, **arrays)
+
+
+class CompiledModel:
+    """
+    A model loaded by `load_compiled`: calibration and compiled kernels, without the model definitions.
+
+    It has the attributes of a `Model` describing the calibration (`endogenous`, `exogenous`, `constants`,
+    `steady_states`, `processes`, `values`) and evaluates residuals and jacobians as a `Model` does.
+    """
+
+    def __init__(self, compiled: CompiledEquations, pattern: SparsityPattern, jacobian: SparseJacobian,
+                 constants: Dict, steady_states: Dict, processes: Dict, values: Dict, filename: str = None):
+
+        self.filename = filename
+        self.compiled = compiled
+        self.sparsity = pattern
+        self._sparse_jacobian = jacobian
+        self.endogenous: List[str] = compiled.endogenous
+        self.exogenous: List[str] = compiled.exogenous
+        self.constants = constants
+        self.steady_states = steady_states
+        self.processes = processes
+        self.values = values
+
+    @property
+    def parameters(self) -> np.ndarray:
+        """Default parameter vector (see `CompiledEquations.parameters` for the names)"""
+        return self.compiled.parameter_values
+
+    def steady_state(self):
+        """Calibrated steady-state as a tuple of arrays (y, e)"""
+        return self.compiled.steady_state
+
+    def residuals(self, y_lead, y, y_lag, e, params=None) -> np.ndarray:
+        """Residuals of the dynamic equations"""
+        return self.compiled(y_lead, y, y_lag, e, params)
+
+    def sparse_jacobian(self, method="symbolic") -> SparseJacobian:
+        """Evaluator of the residuals and jacobian into a preallocated CSR matrix (see `Model.sparse_jacobian`)"""
+        if method != "symbolic":
+            raise ValueError(f"Unknown method: {method}")
+        return self._sparse_jacobian
+
+    def jacobians(self, y_lead=None, y=None, y_lag=None, e=None, params=None):
+        """Residuals and jacobians (r, A, B, C, D), arguments which are not given being set to their steady-state value"""
+        ys, es = self.steady_state()
+        y_lead = ys if y_lead is None else y_lead
+        y = ys if y is None else y
+        y_lag = ys if y_lag is None else y_lag
+        e = es if e is None else e
+        jac = self._sparse_jacobian
+        r, _ = jac(y_lead, y, y_lag, e, params)
+        J = np.zeros(self.sparsity.shape)
+        J[self.sparsity.rows, self.sparsity.indices] = jac.data
+        A, B, C, D = self.compiled.index.blocks(J)
+        return (r.copy(), A, B, C, D)
+
+    def __repr__(self):
+        name = f"'{self.filename}', " if self.filename else ""
+        return f"CompiledModel({name}endogenous={self.endogenous}, exogenous={self.exogenous})"
+
+
+def load_compiled(filename: str) -> CompiledModel:
+    """Loads a model saved by `save_compiled`"""
+
+    with np.load(filename, allow_pickle=False) as f:
+        header = json.loads(f["header"].tobytes().decode("utf-8"))
+        if header["format"] != ARTIFACT_FORMAT:
+            raise ValueError(f"Unsupported format of compiled model: {header['format']}")
+        parameter_values = f["parameter_values"]
+        indptr, indices = f["indptr"], f["indices"]
+        residuals_source = f["residuals_source"].tobytes().decode("utf-8")
+        jacobian_source = f["jacobian_source"].tobytes().decode("utf-8")
+        # code objects can only be reused by the same python version
+        if header["cache_tag"] == sys.implementation.cache_tag:
+            code = marshal.loads(f["code"].tobytes())
+        else:
+            code = compile(residuals_source + "\n" + jacobian_source, "<dynsym>", "exec")
+        data = f["values"]
+    values = {}
+    offset = 0
+    for name, start, size in header["values"]:
+        values[name] = TimeSeries(data[offset:offset + size].copy(), start)
+        offset += size
+
+    namespace = {**MATH_FUNCTIONS, **DERIVATIVE_FUNCTIONS}
+    exec(code, namespace)
+
+    endogenous, exogenous = header["endogenous"], header["exogenous"]
+    steady_states = header["steady_states"]
+    compiled = CompiledEquations(
+        residuals_source,
+        namespace["residuals"],
+        endogenous,
+        exogenous,
+        header["parameters"],
+        parameter_values=parameter_values,
+        steady_state=steady_states,
+    )
+    pattern = SparsityPattern.from_csr(indptr, indices, VariableIndex(endogenous, exogenous))
+    jacobian = SparseJacobian(compiled, pattern, source=jacobian_source, function=namespace["jacobian_fill"])
+    processes = {
+        k: Normal(p["mu"], p["sigma"]) if p["sigma"] is not None else p["mu"]
+        for k, p in header["processes"].items()
+    }
+    return CompiledModel(
+        compiled, pattern, jacobian, header["constants"], steady_states, processes, values,
+        filename=header["filename"],
+    )
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 
 class DNumber:
 
@@ -108,214 +109,432 @@ class DNumber:
         new_derivatives = {var: -deriv for var, deriv in self.derivatives.items()}
         return DNumber(-self.value, new_derivatives)
     
+    def chain(self, value, factor):
+        """Returns f(self) given value=f(self.value) and factor=f'(self.value)"""
+        new_derivatives = {var: deriv * factor for var, deriv in self.derivatives.items()}
+        return DNumber(value, new_derivatives)
+
+    def lift(self, value):
+        """Returns a constant with the same derivative structure as self"""
+        return DNumber(value)
+
     def __repr__(self):
         return f"DNumber(value={self.value}, derivatives={self.derivatives})"
-    
+
+
+class VariableIndex:
+    """
+    Assigns one gradient slot to each variable of a model.
+
+    Slots are ordered as [endogenous at t+1, endogenous at t, endogenous at t-1, exogenous at t],
+    so that the gradient of a residual is the concatenation of the corresponding rows of A, B, C and D.
+    """
+
+    def __init__(self, endogenous, exogenous):
+        self.endogenous = list(endogenous)
+        self.exogenous = list(exogenous)
+        n = len(self.endogenous)
+        self.slots = {}
+        for k, shift in enumerate([1, 0, -1]):
+            for i, name in enumerate(self.endogenous):
+                self.slots[(name, shift)] = k * n + i
+        for i, name in enumerate(self.exogenous):
+            self.slots[(name, 0)] = 3 * n + i
+        self.size = 3 * n + len(self.exogenous)
+
+    def seed(self, name, shift, value):
+        """Returns a DenseDNumber with value `value` and a unit derivative w.r.t. name[t+shift]"""
+        gradient = np.zeros(self.size)
+        gradient[self.slots[(name, shift)]] = 1.0
+        return DenseDNumber(value, gradient)
+
+    def blocks(self, gradients):
+        """Splits a (neq, size) array of gradients into the A, B, C, D blocks"""
+        n = len(self.endogenous)
+        return gradients[:, :n], gradients[:, n:2 * n], gradients[:, 2 * n:3 * n], gradients[:, 3 * n:]
+
+
+class DenseDNumber:
+    """
+    A dual number whose derivatives are stored in a numpy array.
+
+    All dense dual numbers taking part in the same computation share the slots of one
+    `VariableIndex`, so that no key lookup or dictionary merge is needed in arithmetic operations.
+    """
+
+    __slots__ = ('value', 'gradient')
+
+    # make numpy defer to our reflected operators
+    __array_ufunc__ = None
+
+    def __init__(self, value, gradient):
+        self.value = value
+        self.gradient = gradient
+
+    def __add__(self, other):
+        if isinstance(other, DenseDNumber):
+            return DenseDNumber(self.value + other.value, self.gradient + other.gradient)
+        else:
+            return DenseDNumber(self.value + other, self.gradient)
+
+    def __radd__(self, other):
+        return DenseDNumber(other + self.value, self.gradient)
+
+    def __sub__(self, other):
+        if isinstance(other, DenseDNumber):
+            return DenseDNumber(self.value - other.value, self.gradient - other.gradient)
+        else:
+            return DenseDNumber(self.value - other, self.gradient)
+
+    def __rsub__(self, other):
+        return DenseDNumber(other - self.value, -self.gradient)
+
+    def __mul__(self, other):
+        if isinstance(other, DenseDNumber):
+            return DenseDNumber(
+                self.value * other.value,
+                self.gradient * other.value + other.gradient * self.value
+            )
+        else:
+            return DenseDNumber(self.value * other, self.gradient * other)
+
+    def __rmul__(self, other):
+        return DenseDNumber(other * self.value, self.gradient * other)
+
+    def __truediv__(self, other):
+        if isinstance(other, DenseDNumber):
+            return DenseDNumber(
+                self.value / other.value,
+                (self.gradient * other.value - other.gradient * self.value) / (other.value ** 2)
+            )
+        else:
+            return DenseDNumber(self.value / other, self.gradient / other)
+
+    def __rtruediv__(self, other):
+        return DenseDNumber(other / self.value, self.gradient * (-other / (self.value ** 2)))
+
+    def __pow__(self, power):
+        if isinstance(power, DenseDNumber):
+            if not power.gradient.any():
+                return self.__pow__(power.value)
+            new_value = self.value ** power.value
+            return DenseDNumber(
+                new_value,
+                new_value * (self.gradient * (power.value / self.value) + power.gradient * math.log(self.value))
+            )
+        else:
+            return DenseDNumber(self.value ** power, self.gradient * (power * self.value ** (power - 1)))
+
+    def __rpow__(self, base):
+        new_value = base ** self.value
+        return DenseDNumber(new_value, self.gradient * (new_value * math.log(base)))
+
+    def __neg__(self):
+        return DenseDNumber(-self.value, -self.gradient)
+
+    def chain(self, value, factor):
+        """Returns f(self) given value=f(self.value) and factor=f'(self.value)"""
+        return DenseDNumber(value, self.gradient * factor)
+
+    def lift(self, value):
+        """Returns a constant with the same derivative structure as self"""
+        return DenseDNumber(value, np.zeros_like(self.gradient))
+
+    def __repr__(self):
+        return f"DenseDNumber(value={self.value}, gradient={self.gradient})"
+
+
+class DualNumber:
+    """
+    A dual number with a single directional derivative (`tangent`), for jacobian-vector products:
+    all operations are on floats.
+    """
+
+    __slots__ = ('value', 'tangent')
+
+    __array_ufunc__ = None
+
+    def __init__(self, value, tangent=0.0):
+        self.value = value
+        self.tangent = tangent
+
+    def __add__(self, other):
+        if isinstance(other, DualNumber):
+            return DualNumber(self.value + other.value, self.tangent + other.tangent)
+        return DualNumber(self.value + other, self.tangent)
+
+    def __radd__(self, other):
+        return DualNumber(other + self.value, self.tangent)
+
+    def __sub__(self, other):
+        if isinstance(other, DualNumber):
+            return DualNumber(self.value - other.value, self.tangent - other.tangent)
+        return DualNumber(self.value - other, self.tangent)
+
+    def __rsub__(self, other):
+        return DualNumber(other - self.value, -self.tangent)
+
+    def __mul__(self, other):
+        if isinstance(other, DualNumber):
+            return DualNumber(self.value * other.value, self.tangent * other.value + other.tangent * self.value)
+        return DualNumber(self.value * other, self.tangent * other)
+
+    def __rmul__(self, other):
+        return DualNumber(other * self.value, self.tangent * other)
+
+    def __truediv__(self, other):
+        if isinstance(other, DualNumber):
+            value = self.value / other.value
+            return DualNumber(value, (self.tangent - value * other.tangent) / other.value)
+        return DualNumber(self.value / other, self.tangent / other)
+
+    def __rtruediv__(self, other):
+        value = other / self.value
+        return DualNumber(value, -value * self.tangent / self.value)
+
+    def __pow__(self, power):
+        if isinstance(power, DualNumber):
+            if power.tangent == 0:
+                return self.__pow__(power.value)
+            value = self.value ** power.value
+            return DualNumber(
+                value,
+                value * (self.tangent * power.value / self.value + power.tangent * math.log(self.value))
+            )
+        return DualNumber(self.value ** power, self.tangent * power * self.value ** (power - 1))
+
+    def __rpow__(self, base):
+        value = base ** self.value
+        return DualNumber(value, self.tangent * value * math.log(base))
+
+    def __neg__(self):
+        return DualNumber(-self.value, -self.tangent)
+
+    def chain(self, value, factor):
+        """Returns f(self) given value=f(self.value) and factor=f'(self.value)"""
+        return DualNumber(value, self.tangent * factor)
+
+    def lift(self, value):
+        """Returns a constant"""
+        return DualNumber(value, 0.0)
+
+    def __repr__(self):
+        return f"DualNumber(value={self.value}, tangent={self.tangent})"
+
+
+DUAL_TYPES = (DNumber, DenseDNumber, DualNumber)
+
+
 # Math functions for dual numbers
+# (numpy arrays are dispatched to the corresponding ufuncs, to evaluate batches of points)
 
 def sin(x):
-    """Sine function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
-        new_value = math.sin(x.value)
-        new_derivatives = {var: deriv * math.cos(x.value) for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+    """Sine function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
+        return x.chain(math.sin(x.value), math.cos(x.value))
+    elif isinstance(x, np.ndarray):
+        return np.sin(x)
     else:
         return math.sin(x)
 
 def cos(x):
-    """Cosine function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
-        new_value = math.cos(x.value)
-        new_derivatives = {var: -deriv * math.sin(x.value) for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+    """Cosine function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
+        return x.chain(math.cos(x.value), -math.sin(x.value))
+    elif isinstance(x, np.ndarray):
+        return np.cos(x)
     else:
         return math.cos(x)
 
 def tan(x):
-    """Tangent function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
-        new_value = math.tan(x.value)
+    """Tangent function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
         sec_squared = 1 / (math.cos(x.value) ** 2)
-        new_derivatives = {var: deriv * sec_squared for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+        return x.chain(math.tan(x.value), sec_squared)
+    elif isinstance(x, np.ndarray):
+        return np.tan(x)
     else:
         return math.tan(x)
 
 def exp(x):
-    """Exponential function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
+    """Exponential function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
         new_value = math.exp(x.value)
-        new_derivatives = {var: deriv * new_value for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+        return x.chain(new_value, new_value)
+    elif isinstance(x, np.ndarray):
+        return np.exp(x)
     else:
         return math.exp(x)
 
 def log(x):
-    """Natural logarithm function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
-        new_value = math.log(x.value)
-        new_derivatives = {var: deriv / x.value for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+    """Natural logarithm function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
+        return x.chain(math.log(x.value), 1 / x.value)
+    elif isinstance(x, np.ndarray):
+        return np.log(x)
     else:
         return math.log(x)
 
 def sqrt(x):
-    """Square root function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
+    """Square root function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
         new_value = math.sqrt(x.value)
-        new_derivatives = {var: deriv / (2 * new_value) for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+        return x.chain(new_value, 1 / (2 * new_value))
+    elif isinstance(x, np.ndarray):
+        return np.sqrt(x)
     else:
         return math.sqrt(x)
 
 def dabs(x):
-    """Absolute value function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
-        new_value = abs(x.value)
+    """Absolute value function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
         sign = 1 if x.value >= 0 else -1
-        new_derivatives = {var: deriv * sign for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+        return x.chain(abs(x.value), sign)
+    elif isinstance(x, np.ndarray):
+        return np.abs(x)
     else:
         return abs(x)
 
 def sinh(x):
-    """Hyperbolic sine function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
-        new_value = math.sinh(x.value)
-        new_derivatives = {var: deriv * math.cosh(x.value) for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+    """Hyperbolic sine function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
+        return x.chain(math.sinh(x.value), math.cosh(x.value))
+    elif isinstance(x, np.ndarray):
+        return np.sinh(x)
     else:
         return math.sinh(x)
 
 def cosh(x):
-    """Hyperbolic cosine function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
-        new_value = math.cosh(x.value)
-        new_derivatives = {var: deriv * math.sinh(x.value) for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+    """Hyperbolic cosine function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
+        return x.chain(math.cosh(x.value), math.sinh(x.value))
+    elif isinstance(x, np.ndarray):
+        return np.cosh(x)
     else:
         return math.cosh(x)
 
 def tanh(x):
-    """Hyperbolic tangent function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
+    """Hyperbolic tangent function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
         new_value = math.tanh(x.value)
         sech_squared = 1 - new_value ** 2
-        new_derivatives = {var: deriv * sech_squared for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+        return x.chain(new_value, sech_squared)
+    elif isinstance(x, np.ndarray):
+        return np.tanh(x)
     else:
         return math.tanh(x)
 
 def asin(x):
-    """Arcsine function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
-        new_value = math.asin(x.value)
+    """Arcsine function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
         derivative_factor = 1 / math.sqrt(1 - x.value ** 2)
-        new_derivatives = {var: deriv * derivative_factor for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+        return x.chain(math.asin(x.value), derivative_factor)
+    elif isinstance(x, np.ndarray):
+        return np.arcsin(x)
     else:
         return math.asin(x)
 
 def acos(x):
-    """Arccosine function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
-        new_value = math.acos(x.value)
+    """Arccosine function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
         derivative_factor = -1 / math.sqrt(1 - x.value ** 2)
-        new_derivatives = {var: deriv * derivative_factor for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+        return x.chain(math.acos(x.value), derivative_factor)
+    elif isinstance(x, np.ndarray):
+        return np.arccos(x)
     else:
         return math.acos(x)
 
 def atan(x):
-    """Arctangent function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
-        new_value = math.atan(x.value)
+    """Arctangent function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
         derivative_factor = 1 / (1 + x.value ** 2)
-        new_derivatives = {var: deriv * derivative_factor for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+        return x.chain(math.atan(x.value), derivative_factor)
+    elif isinstance(x, np.ndarray):
+        return np.arctan(x)
     else:
         return math.atan(x)
 
 def dmax(x, y):
-    """Maximum function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber) or isinstance(y, DNumber):
-        # Convert to DNumber if needed
-        if not isinstance(x, DNumber):
-            x = DNumber(x)
-        if not isinstance(y, DNumber):
-            y = DNumber(y)
+    """Maximum function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES) or isinstance(y, DUAL_TYPES):
+        # Convert to dual numbers if needed
+        if not isinstance(x, DUAL_TYPES):
+            x = y.lift(x)
+        if not isinstance(y, DUAL_TYPES):
+            y = x.lift(y)
         
         if x.value >= y.value:
             return x
         else:
             return y
+    elif isinstance(x, np.ndarray) or isinstance(y, np.ndarray):
+        return np.maximum(x, y)
     else:
         return max(x, y)
 
 def dmin(x, y):
-    """Minimum function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber) or isinstance(y, DNumber):
-        # Convert to DNumber if needed
-        if not isinstance(x, DNumber):
-            x = DNumber(x)
-        if not isinstance(y, DNumber):
-            y = DNumber(y)
+    """Minimum function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES) or isinstance(y, DUAL_TYPES):
+        # Convert to dual numbers if needed
+        if not isinstance(x, DUAL_TYPES):
+            x = y.lift(x)
+        if not isinstance(y, DUAL_TYPES):
+            y = x.lift(y)
         
         if x.value <= y.value:
             return x
         else:
             return y
+    elif isinstance(x, np.ndarray) or isinstance(y, np.ndarray):
+        return np.minimum(x, y)
     else:
         return min(x, y)
 
 def log10(x):
-    """Base-10 logarithm function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
-        new_value = math.log10(x.value)
-        new_derivatives = {var: deriv / (x.value * math.log(10)) for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+    """Base-10 logarithm function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
+        return x.chain(math.log10(x.value), 1 / (x.value * math.log(10)))
+    elif isinstance(x, np.ndarray):
+        return np.log10(x)
     else:
         return math.log10(x)
 
 def log2(x):
-    """Base-2 logarithm function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
-        new_value = math.log2(x.value)
-        new_derivatives = {var: deriv / (x.value * math.log(2)) for var, deriv in x.derivatives.items()}
-        return DNumber(new_value, new_derivatives)
+    """Base-2 logarithm function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
+        return x.chain(math.log2(x.value), 1 / (x.value * math.log(2)))
+    elif isinstance(x, np.ndarray):
+        return np.log2(x)
     else:
         return math.log2(x)
 
 def floor(x):
-    """Floor function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
-        new_value = math.floor(x.value)
+    """Floor function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
         # Derivative of floor is 0 everywhere except at integer points (where it's undefined)
-        new_derivatives = {var: 0.0 for var in x.derivatives.keys()}
-        return DNumber(new_value, new_derivatives)
+        return x.chain(math.floor(x.value), 0.0)
+    elif isinstance(x, np.ndarray):
+        return np.floor(x)
     else:
         return math.floor(x)
 
 def ceil(x):
-    """Ceiling function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber):
-        new_value = math.ceil(x.value)
+    """Ceiling function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
         # Derivative of ceil is 0 everywhere except at integer points (where it's undefined)
-        new_derivatives = {var: 0.0 for var in x.derivatives.keys()}
-        return DNumber(new_value, new_derivatives)
+        return x.chain(math.ceil(x.value), 0.0)
+    elif isinstance(x, np.ndarray):
+        return np.ceil(x)
     else:
         return math.ceil(x)
 
 def pow(x, y):
-    """Power function that works with both floats and DNumber objects."""
-    if isinstance(x, DNumber) or isinstance(y, DNumber):
-        if isinstance(x, DNumber):
-            return x.__pow__(y)
-        else:
-            # x is float, y is DNumber
-            if not isinstance(y, DNumber):
-                y = DNumber(y)
-            return DNumber(x).__rpow__(y)
+    """Power function that works with both floats and dual numbers."""
+    if isinstance(x, DUAL_TYPES):
+        return x.__pow__(y)
+    elif isinstance(y, DUAL_TYPES):
+        # x is float, y is a dual number
+        return y.__rpow__(x)
     else:
         return x ** y
 
@@ -343,3 +562,21 @@ MATH_FUNCTIONS = {
     'pow': pow,
 }
 
+
+def sign(x):
+    """Derivative of abs (1 for x >= 0, -1 otherwise)"""
+    if isinstance(x, np.ndarray):
+        return np.where(x >= 0, 1.0, -1.0)
+    return 1.0 if x >= 0 else -1.0
+
+def step(x, y):
+    """Derivative of max(x, y) w.r.t. x (1 for x >= y, 0 otherwise)"""
+    if isinstance(x, np.ndarray) or isinstance(y, np.ndarray):
+        return np.where(np.asarray(x) >= np.asarray(y), 1.0, 0.0)
+    return 1.0 if x >= y else 0.0
+
+# Functions only appearing in symbolic derivatives
+DERIVATIVE_FUNCTIONS = {
+    'sign': sign,
+    'step': step,
+}
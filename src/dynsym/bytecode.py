@@ -0,0 +1,220 @@
+"""
+Stack-based bytecode for equations.
+
+Equations are lowered to a flat instruction stream stored in arrays: `opcodes` (uint8), `operands`
+(int32) and a constant pool `constants` (float64). Variables are resolved to integer slots when
+lowering (by the same rules as `dynsym.dag.DAGBuilder`), so evaluation is a single loop over the
+instructions with a value stack. Programs contain only arrays and strings: they are compact and
+cheap to pickle (e.g. to send to worker processes).
+"""
+
+import numpy as np
+from lark.tree import Tree
+from typing import Dict, List
+
+from .autodiff import MATH_FUNCTIONS
+from .dag import DAGBuilder
+
+
+# opcodes (operand in parentheses)
+LOAD_Y_LEAD = 0  # (index)
+LOAD_Y = 1       # (index)
+LOAD_Y_LAG = 2   # (index)
+LOAD_E = 3       # (index)
+LOAD_PARAM = 4   # (index)
+LOAD_CONST = 5   # (index in the constant pool)
+ADD = 6
+SUB = 7
+MUL = 8
+DIV = 9
+POW = 10
+NEG = 11
+CALL = 12        # (index in the function table)
+SWAP = 13
+STORE = 14       # (equation)
+
+OPNAMES = [
+    'LOAD_Y_LEAD', 'LOAD_Y', 'LOAD_Y_LAG', 'LOAD_E', 'LOAD_PARAM', 'LOAD_CONST',
+    'ADD', 'SUB', 'MUL', 'DIV', 'POW', 'NEG', 'CALL', 'SWAP', 'STORE',
+]
+
+_LOADS = {"y_lead": LOAD_Y_LEAD, "y": LOAD_Y, "y_lag": LOAD_Y_LAG, "e": LOAD_E, "params": LOAD_PARAM}
+_BINARY = {"add": ADD, "sub": SUB, "mul": MUL, "div": DIV, "pow": POW}
+
+
+class BytecodeEmitter:
+    """
+    Receives the nodes created by a `DAGBuilder` (in postfix order) and emits instructions.
+
+    Node ids are the positions of the values on the stack at emission time, which tells whether
+    the operands of a binary operation are in stack order (`DAGBuilder.equality` computes rhs - lhs).
+    """
+
+    def __init__(self):
+        self.opcodes: List[int] = []
+        self.operands: List[int] = []
+        self.constants: List[float] = []
+        self.functions: List[str] = []
+        self._constants: Dict = {}
+        self._stack: List[int] = []
+        self._count = 0
+
+    def emit(self, opcode, operand=0):
+        self.opcodes.append(opcode)
+        self.operands.append(operand)
+
+    def _push(self):
+        self._count += 1
+        self._stack.append(self._count)
+        return self._count
+
+    def node(self, op, *args):
+        if op == "number":
+            key = (type(args[0]).__name__, args[0])
+            if key not in self._constants:
+                self._constants[key] = len(self.constants)
+                self.constants.append(float(args[0]))
+            self.emit(LOAD_CONST, self._constants[key])
+            return self._push()
+        if op in _LOADS:
+            self.emit(_LOADS[op], args[0])
+            return self._push()
+        if op == "neg":
+            self._stack.pop()
+            self.emit(NEG)
+            return self._push()
+        if op == "call":
+            name, *operands = args
+            if name not in self.functions:
+                self.functions.append(name)
+            self._pop(operands)
+            self.emit(CALL, self.functions.index(name))
+            return self._push()
+        self._pop(args)
+        self.emit(_BINARY[op])
+        return self._push()
+
+    def _pop(self, args):
+        n = len(args)
+        top = self._stack[-n:]
+        if list(args) != top:
+            if n == 2 and list(args) == top[::-1]:
+                self.emit(SWAP)
+            else:
+                raise ValueError(f"Operands of {args} are not on top of the stack.")
+        del self._stack[-n:]
+
+    def store(self, i):
+        self._stack.pop()
+        self.emit(STORE, i)
+
+
+class Program:
+    """
+    Bytecode of a list of equations, callable as `program(y_lead, y, y_lag, e, params)`.
+
+    Like compiled equations, it works with floats, dual numbers and numpy arrays.
+    """
+
+    def __init__(self, opcodes, operands, constants, functions, neq):
+        self.opcodes = np.asarray(opcodes, dtype=np.uint8)
+        self.operands = np.asarray(operands, dtype=np.int32)
+        self.constants = np.asarray(constants, dtype=float)
+        self.functions = list(functions)
+        self.neq = neq
+        self._code = None
+
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in ('opcodes', 'operands', 'constants', 'functions', 'neq')}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _instructions(self):
+        # python lists are faster to iterate over than numpy arrays
+        if self._code is None:
+            arities = [2 if f in ('max', 'min', 'pow') else 1 for f in self.functions]
+            self._code = (
+                list(zip(self.opcodes.tolist(), self.operands.tolist())),
+                self.constants.tolist(),
+                [MATH_FUNCTIONS[f] for f in self.functions],
+                arities,
+            )
+        return self._code
+
+    def __call__(self, y_lead, y, y_lag, e, params):
+        """Evaluate the residuals (returns a numpy array)"""
+        return np.array(self.run(y_lead, y, y_lag, e, params))
+
+    def run(self, y_lead, y, y_lag, e, params) -> list:
+        """Evaluate the residuals (returns a list)"""
+        code, constants, functions, arities = self._instructions()
+        inputs = (y_lead, y, y_lag, e, params)
+        out = [None] * self.neq
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        for op, arg in code:
+            if op <= LOAD_PARAM:
+                push(inputs[op][arg])
+            elif op == LOAD_CONST:
+                push(constants[arg])
+            elif op == ADD:
+                b = pop()
+                stack[-1] = stack[-1] + b
+            elif op == SUB:
+                b = pop()
+                stack[-1] = stack[-1] - b
+            elif op == MUL:
+                b = pop()
+                stack[-1] = stack[-1] * b
+            elif op == DIV:
+                b = pop()
+                stack[-1] = stack[-1] / b
+            elif op == POW:
+                b = pop()
+                stack[-1] = stack[-1] ** b
+            elif op == NEG:
+                stack[-1] = -stack[-1]
+            elif op == CALL:
+                if arities[arg] == 1:
+                    stack[-1] = functions[arg](stack[-1])
+                else:
+                    b = pop()
+                    stack[-1] = functions[arg](stack[-1], b)
+            elif op == SWAP:
+                stack[-1], stack[-2] = stack[-2], stack[-1]
+            elif op == STORE:
+                out[arg] = pop()
+        return out
+
+    def disassemble(self) -> str:
+        lines = []
+        for k, (op, arg) in enumerate(zip(self.opcodes.tolist(), self.operands.tolist())):
+            if op == LOAD_CONST:
+                detail = f"{arg} ({self.constants[arg]!r})"
+            elif op == CALL:
+                detail = f"{arg} ({self.functions[arg]})"
+            elif op <= LOAD_PARAM or op == STORE:
+                detail = str(arg)
+            else:
+                detail = ""
+            lines.append(f"{k:>6} {OPNAMES[op]:<12} {detail}")
+        return "\n".join(lines)
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def __repr__(self):
+        return f"Program({self.neq} equations, {len(self)} instructions, {len(self.constants)} constants)"
+
+
+def compile_bytecode(equations: List[Tree], endogenous: List[str], exogenous: List[str],
+                     parameters: List[str], values: Dict = None) -> Program:
+    """Lower equation trees to a bytecode `Program` (parameters are constants, then `name[~]` steady-states)"""
+    emitter = BytecodeEmitter()
+    builder = DAGBuilder(endogenous, exogenous, parameters, values=values, dag=emitter)
+    for i, eq in enumerate(equations):
+        builder.visit(eq)
+        emitter.store(i)
+    return Program(emitter.opcodes, emitter.operands, emitter.constants, emitter.functions, len(equations))
@@ -0,0 +1,151 @@
+"""
+On-disk cache of parsed model files.
+
+Entries are keyed by a hash of the model source, of the grammar file and of the dynsym version,
+so that any change to one of them invalidates the cache. Entries are evicted by age and
+total size (least recently used first).
+
+The cache directory defaults to `$XDG_CACHE_HOME/dynsym` (or `~/.cache/dynsym`)
+and can be set with the `DYNSYM_CACHE_DIR` environment variable.
+
+Caching parsed models is opt-in (`cache=True` in `read_model` / `import_model`). Entries are
+unpickled when loaded, which can execute arbitrary code: the cache directory must only be writable
+by trusted users (don't point it to a shared directory).
+"""
+
+import os
+import time
+import pickle
+import hashlib
+from os import path
+
+GRAMMAR_FILE = path.join(path.split(__file__)[0], "grammars", "grammar.lark")
+
+MAX_SIZE = 100 * 1024 * 1024  # bytes
+MAX_AGE = 30 * 24 * 3600  # seconds
+
+_fingerprint = None
+
+
+def cache_dir() -> str:
+    """Directory where cache entries are stored"""
+    d = os.environ.get("DYNSYM_CACHE_DIR")
+    if d is None:
+        base = os.environ.get("XDG_CACHE_HOME") or path.join(path.expanduser("~"), ".cache")
+        d = path.join(base, "dynsym")
+    return d
+
+
+def version() -> str:
+    """Installed version of dynsym"""
+    try:
+        from importlib.metadata import version as _version
+        return _version("dynsym")
+    except Exception:
+        return "unknown"
+
+
+def fingerprint() -> str:
+    """Hash of the grammar file and of the dynsym version"""
+    global _fingerprint
+    if _fingerprint is None:
+        h = hashlib.sha256()
+        h.update(version().encode())
+        with open(GRAMMAR_FILE, "rb") as f:
+            h.update(f.read())
+        _fingerprint = h.hexdigest()
+    return _fingerprint
+
+
+def cache_key(txt: str, start: str = "free_block") -> str:
+    """Key of the cache entry for a model source"""
+    h = hashlib.sha256()
+    h.update(fingerprint().encode())
+    h.update(start.encode())
+    h.update(txt.encode("utf-8"))
+    return h.hexdigest()
+
+
+def load(key: str):
+    """Returns the cached object for `key`, or None"""
+    filename = path.join(cache_dir(), key + ".pickle")
+    try:
+        with open(filename, "rb") as f:
+            obj = pickle.load(f)
+    except Exception:
+        return None
+    # mark entry as recently used
+    try:
+        os.utime(filename)
+    except OSError:
+        pass
+    return obj
+
+
+def store(key: str, obj, max_size=MAX_SIZE, max_age=MAX_AGE):
+    """Stores `obj` in the cache and evicts old entries"""
+    d = cache_dir()
+    filename = path.join(d, key + ".pickle")
+    try:
+        os.makedirs(d, exist_ok=True)
+        tmp = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, filename)
+    except OSError:
+        # the cache is an optimization: never fail because of it
+        return
+    evict(max_size=max_size, max_age=max_age)
+
+
+def evict(max_size=MAX_SIZE, max_age=MAX_AGE):
+    """Removes entries older than `max_age` seconds, then least recently used entries until the cache is smaller than `max_size` bytes"""
+    d = cache_dir()
+    try:
+        names = [n for n in os.listdir(d) if n.endswith(".pickle")]
+    except OSError:
+        return
+    now = time.time()
+    entries = []
+    for n in names:
+        filename = path.join(d, n)
+        try:
+            st = os.stat(filename)
+        except OSError:
+            continue
+        if now - st.st_mtime > max_age:
+            _remove(filename)
+        else:
+            entries.append((st.st_mtime, st.st_size, filename))
+    total = sum(e[1] for e in entries)
+    for _, size, filename in sorted(entries):
+        if total <= max_size:
+            break
+        _remove(filename)
+        total -= size
+
+
+def clear():
+    """Removes all cache entries"""
+    evict(max_size=0)
+
+
+def _remove(filename):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+
+
+def parse(txt: str, start: str = "free_block", cache: bool = True):
+    """Parses `txt`, using the on-disk cache if `cache` is True"""
+    if cache:
+        key = cache_key(txt, start)
+        tree = load(key)
+        if tree is not None:
+            return tree
+    from .grammar import get_parser
+    tree = get_parser().parse(txt, start=start)
+    if cache:
+        store(key, tree)
+    return tree
@@ -0,0 +1,211 @@
+import numpy as np
+from typing import Dict, List, Callable, Union, TYPE_CHECKING
+
+from .autodiff import MATH_FUNCTIONS, VariableIndex, DenseDNumber
+
+if TYPE_CHECKING:
+    # modules building trees depend on lark: compiled equations can be loaded without it
+    from lark.tree import Tree
+    from .analyze import FormulaEvaluator
+    from .dag import ExpressionDAG
+
+
+class CompiledEquations:
+    """
+    Residuals of a model compiled to a single python function.
+
+    The compiled function has signature `f(y_lead, y, y_lag, e, params)` and returns
+    a tuple with one residual per equation. Any type supporting the arithmetic operators
+    and the functions of `MATH_FUNCTIONS` can be used as input (floats, dual numbers, numpy arrays).
+    It is generated from the expression DAG of the equations (`self.dag`), so that subexpressions
+    shared by several equations are computed only once.
+    """
+
+    def __init__(self, source: str, function: Callable, endogenous: List[str], exogenous: List[str],
+                 parameters: List[str], parameter_values: List[float] = None,
+                 steady_state: Dict[str, float] = None, dag: "ExpressionDAG" = None):
+
+        self.source = source
+        self.function = function
+        self.dag = dag
+        self.endogenous = endogenous
+        self.exogenous = exogenous
+        self.parameters = parameters
+        self.parameter_values = np.array(
+            parameter_values if parameter_values is not None else [np.nan] * len(parameters),
+            dtype=float
+        )
+        steady_state = steady_state if steady_state is not None else {}
+        self.steady_state = (
+            np.array([steady_state.get(v, np.nan) for v in endogenous], dtype=float),
+            np.array([steady_state.get(v, np.nan) for v in exogenous], dtype=float),
+        )
+        self._index = None
+        self._symbolic = None
+
+    def __call__(self, y_lead, y, y_lag, e, params=None):
+        """Evaluate the residuals (returns a numpy array)"""
+        if params is None:
+            params = self.parameter_values
+        return np.array(self.function(y_lead, y, y_lag, e, params))
+
+    def jacobians(self, y_lead, y, y_lag, e, params=None, method="symbolic"):
+        """
+        Evaluate the residuals and their derivatives.
+
+        With method="symbolic" (default), the compiled symbolic derivatives (see `self.symbolic`) are evaluated.
+        With method="dual", derivatives are computed in forward-mode, with dense dual numbers.
+
+        Returns (r, A, B, C, D) where A, B, C are the derivatives w.r.t. y_lead, y, y_lag and D w.r.t. e.
+        """
+        if params is None:
+            params = self.parameter_values
+        index = self.index
+        if method == "symbolic":
+            r, J = self.symbolic.dense(y_lead, y, y_lag, e, params)
+            A, B, C, D = index.blocks(J)
+            return r, A, B, C, D
+        if method != "dual":
+            raise ValueError(f"Unknown method: {method}")
+        seeds = [
+            [index.seed(v, shift, x[i]) for i, v in enumerate(self.endogenous)]
+            for shift, x in ((1, y_lead), (0, y), (-1, y_lag))
+        ]
+        seeds.append([index.seed(v, 0, e[i]) for i, v in enumerate(self.exogenous)])
+        res = self.function(*seeds, params)
+        r = np.array([getattr(v, 'value', v) for v in res], dtype=float)
+        J = np.array([
+            v.gradient if isinstance(v, DenseDNumber) else np.zeros(index.size)
+            for v in res
+        ]).reshape((len(res), index.size))
+        A, B, C, D = index.blocks(J)
+        return r, A, B, C, D
+
+    def tape(self, y_lead, y, y_lag, e, params=None):
+        """
+        Evaluate the residuals while recording a reverse-mode tape (see `dynsym.reverse.Tape`).
+
+        Inputs of the tape are, by position, the variables in the slots of `self.index`
+        ([y_lead, y, y_lag, e]) followed by the parameters. The tape can be replayed at other points.
+        """
+        from .reverse import Tape
+
+        if params is None:
+            params = self.parameter_values
+        tape = Tape()
+        args = []
+        position = 0
+        for x in (y_lead, y, y_lag, e, params):
+            args.append([tape.input(v, position=position + i) for i, v in enumerate(x)])
+            position += len(x)
+        namespace = dict(tape.functions)
+        exec(compile(self.source, "<dynsym-tape>", "exec"), namespace)
+        tape.output(namespace['residuals'](*args))
+        return tape
+
+    @property
+    def symbolic(self):
+        """Residuals and nonzero derivatives compiled together (see `dynsym.symbolic.SymbolicJacobian`), built on first use"""
+        if self._symbolic is None:
+            from .symbolic import symbolic_jacobian
+            self._symbolic = symbolic_jacobian(self.dag, self.index)
+        return self._symbolic
+
+    @property
+    def index(self):
+        """Gradient slots of the variables (see `VariableIndex`)"""
+        if self._index is None:
+            self._index = VariableIndex(self.endogenous, self.exogenous)
+        return self._index
+
+    def batch(self, y_lead, y, y_lag, e, params=None):
+        """
+        Evaluate the residuals at N points at once.
+
+        `y_lead`, `y`, `y_lag` have shape (n_endogenous, N) and `e` has shape (n_exogenous, N).
+        Returns an array of shape (neq, N).
+        """
+        if params is None:
+            params = self.parameter_values
+        res = self.function(y_lead, y, y_lag, e, params)
+        return np.array(np.broadcast_arrays(*res), dtype=float)
+
+    def profile(self, y_lead, y, y_lag, e, params=None, profile=None):
+        """
+        Evaluate the residuals one equation at a time, recording times per equation and per function.
+
+        Returns a `dynsym.profiling.Profile` (the normal evaluation path is not instrumented).
+        """
+        from .profiling import Profile, timed_function
+        from time import perf_counter
+
+        if profile is None:
+            profile = Profile()
+        if params is None:
+            params = self.parameter_values
+        namespace = {k: timed_function(f, k, profile) for k, f in MATH_FUNCTIONS.items()}
+        source = "".join(
+            self.dag.source(funname=f"equation_{i}", roots=[r]) for i, r in enumerate(self.dag.roots)
+        )
+        exec(compile(source, "<dynsym-profile>", "exec"), namespace)
+        for i, r in enumerate(self.dag.roots):
+            f = namespace[f"equation_{i}"]
+            t0 = perf_counter()
+            (result,) = f(y_lead, y, y_lag, e, params)
+            profile.record_equation(i, perf_counter() - t0, text=self.dag.expression(r))
+            profile.record_result(result)
+        return profile
+
+    def __repr__(self):
+        return f"CompiledEquations(endogenous={self.endogenous}, exogenous={self.exogenous})"
+
+
+def compile_equations(tree: Union["Tree", "FormulaEvaluator"], endogenous: List[str] = None, exogenous: List[str] = None) -> CompiledEquations:
+    """
+    Compile the equations of a model to a python function.
+
+    Args:
+        tree: a `free_block` tree (as returned by `parser.parse(txt, start="free_block")`),
+            or a `FormulaEvaluator` which has already processed one
+        endogenous: ordering of the endogenous variables (defaults to order of appearance)
+        exogenous: ordering of the exogenous variables (defaults to order of definition)
+
+    Returns:
+        A `CompiledEquations` object, callable as `f(y_lead, y, y_lag, e, params)`
+    """
+
+    from .analyze import FormulaEvaluator
+    from .dag import build_dag
+
+    if isinstance(tree, FormulaEvaluator):
+        fe = tree
+    else:
+        fe = FormulaEvaluator()
+        fe.visit(tree)
+
+    symbols = fe.symbols
+    if exogenous is None:
+        exogenous = symbols['exogenous']
+    if endogenous is None:
+        endogenous = [v for v in symbols['variables'] if v not in exogenous]
+
+    parameters = list(fe.constants.keys()) + [f"{k}[~]" for k in fe.steady_states.keys()]
+    parameter_values = list(fe.constants.values()) + list(fe.steady_states.values())
+
+    dag = build_dag(fe.equations, endogenous, exogenous, parameters, values=fe.values)
+    source = dag.source()
+
+    namespace = dict(MATH_FUNCTIONS)
+    code = compile(source, "<dynsym>", "exec")
+    exec(code, namespace)
+
+    return CompiledEquations(
+        source,
+        namespace['residuals'],
+        endogenous,
+        exogenous,
+        parameters,
+        parameter_values=parameter_values,
+        steady_state=fe.steady_states,
+        dag=dag,
+    )
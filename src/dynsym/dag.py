@@ -0,0 +1,284 @@
+"""
+Hash-consed expression DAG.
+
+The equations of a model are converted to a directed acyclic graph in which every distinct
+subexpression is represented by a single node, shared by all the equations in which it appears.
+Evaluation, differentiation and code generation all work from this representation, so that each
+unique subexpression is computed once per evaluation.
+
+Nodes are tuples `(op, *args)` stored in topological order (operands before the nodes using them):
+- leaves: ("number", value), ("y_lead", i), ("y", i), ("y_lag", i), ("e", i), ("params", i)
+- operations: ("add", a, b), ("sub", a, b), ("mul", a, b), ("div", a, b), ("pow", a, b), ("neg", a)
+- function calls: ("call", name, a, b, ...)
+where a, b, ... are indices of other nodes.
+"""
+
+import math
+from lark.visitors import Interpreter
+from lark.tree import Tree
+from typing import Callable, Dict, List, Tuple
+
+from .autodiff import MATH_FUNCTIONS, DERIVATIVE_FUNCTIONS
+
+
+LEAVES = ("number", "y_lead", "y", "y_lag", "e", "params")
+COMMUTATIVE = ("add", "mul")
+
+# functions which can appear in call nodes (derivative nodes may use DERIVATIVE_FUNCTIONS)
+FUNCTIONS = {**MATH_FUNCTIONS, **DERIVATIVE_FUNCTIONS}
+
+
+class ExpressionDAG:
+
+    def __init__(self):
+        self.nodes: List[Tuple] = []
+        self.table: Dict[Tuple, int] = {}
+        self.roots: List[int] = []
+
+    def node(self, op, *args) -> int:
+        """Returns the index of node (op, *args), creating it if it doesn't exist yet"""
+        if op in COMMUTATIVE and args[0] > args[1]:
+            args = (args[1], args[0])
+        key = (op, type(args[0]).__name__, *args) if op == "number" else (op, *args)
+        i = self.table.get(key)
+        if i is None:
+            i = len(self.nodes)
+            self.nodes.append((op, *args))
+            self.table[key] = i
+        return i
+
+    def operands(self, i) -> Tuple[int, ...]:
+        """Indices of the operands of node i"""
+        op, *args = self.nodes[i]
+        if op in LEAVES:
+            return ()
+        if op == "call":
+            return tuple(args[1:])
+        return tuple(args)
+
+    def reachable(self, roots=None) -> List[int]:
+        """Indices (in topological order) of the nodes needed to compute `roots`"""
+        roots = self.roots if roots is None else roots
+        needed = set()
+        stack = list(roots)
+        while stack:
+            i = stack.pop()
+            if i not in needed:
+                needed.add(i)
+                stack.extend(self.operands(i))
+        return sorted(needed)
+
+    def evaluate(self, y_lead, y, y_lag, e, params, functions=FUNCTIONS):
+        """
+        Evaluate all roots, computing once each node they need (other nodes, e.g. derivatives, are skipped).
+        Works with floats, dual numbers and numpy arrays.
+        """
+        inputs = {"y_lead": y_lead, "y": y, "y_lag": y_lag, "e": e, "params": params}
+        v = [None] * len(self.nodes)
+        for i in self.reachable():
+            op, *args = self.nodes[i]
+            if op == "number":
+                v[i] = args[0]
+            elif op in inputs:
+                v[i] = inputs[op][args[0]]
+            elif op == "add":
+                v[i] = v[args[0]] + v[args[1]]
+            elif op == "sub":
+                v[i] = v[args[0]] - v[args[1]]
+            elif op == "mul":
+                v[i] = v[args[0]] * v[args[1]]
+            elif op == "div":
+                v[i] = v[args[0]] / v[args[1]]
+            elif op == "pow":
+                v[i] = v[args[0]] ** v[args[1]]
+            elif op == "neg":
+                v[i] = -v[args[0]]
+            elif op == "call":
+                v[i] = functions[args[0]](*[v[k] for k in args[1:]])
+        return tuple(v[r] for r in self.roots)
+
+    def _leaf(self, i):
+        op, arg = self.nodes[i]
+        if op == "number":
+            if not math.isfinite(arg):
+                return f"float('{arg}')"
+            # parenthesized, so that e.g. -2 ** 2 is not read as -(2 ** 2)
+            return f"({arg!r})" if arg < 0 else repr(arg)
+        return f"{op}[{arg}]"
+
+    def _operation(self, i, ref):
+        op, *args = self.nodes[i]
+        if op == "add":
+            return f"{ref(args[0])} + {ref(args[1])}"
+        if op == "sub":
+            return f"{ref(args[0])} - {ref(args[1])}"
+        if op == "mul":
+            return f"{ref(args[0])} * {ref(args[1])}"
+        if op == "div":
+            return f"{ref(args[0])} / {ref(args[1])}"
+        if op == "pow":
+            return f"{ref(args[0])} ** {ref(args[1])}"
+        if op == "neg":
+            return f"-{ref(args[0])}"
+        if op == "call":
+            return f"{args[0]}({', '.join(ref(k) for k in args[1:])})"
+        raise ValueError(f"Unknown operation: {op}")
+
+    def expression(self, i) -> str:
+        """Python expression for node i, with all shared subexpressions expanded"""
+        if self.nodes[i][0] in LEAVES:
+            return self._leaf(i)
+        expr = self._operation(i, self.expression)
+        return expr if self.nodes[i][0] == "call" else f"({expr})"
+
+    def _body(self, roots, names=None) -> Tuple[List[str], Callable]:
+        """Lines computing the operation nodes needed by `roots`, and the reference to a node in those lines"""
+        names = names or {}
+
+        def ref(k):
+            node = self.nodes[k]
+            if node in names:
+                return names[node]
+            return self._leaf(k) if node[0] in LEAVES else f"_{k}"
+
+        lines = []
+        for i in self.reachable(roots):
+            node = self.nodes[i]
+            if node in names:
+                lines.append(f"    {names[node]} = {self._leaf(i)}")
+            elif node[0] not in LEAVES:
+                lines.append(f"    _{i} = {self._operation(i, ref)}")
+        return lines, ref
+
+    def source(self, funname="residuals", roots=None, names=None) -> str:
+        """
+        Source code of a function `funname(y_lead, y, y_lag, e, params)` returning the tuple of roots.
+
+        Every operation node is computed once and stored in a local variable. `names` optionally maps
+        input leaves (e.g. `("y", 0)`) to the names of local variables they are bound to.
+        """
+        roots = self.roots if roots is None else roots
+        body, ref = self._body(roots, names)
+        lines = [f"def {funname}(y_lead, y, y_lag, e, params):"] + body
+        lines.append("    return (")
+        for r in roots:
+            lines.append(f"        {ref(r)},")
+        lines.append("    )")
+        return "\n".join(lines) + "\n"
+
+    def fill_source(self, funname, outputs, buffers=("r", "data"), names=None) -> str:
+        """
+        Source code of a function `funname(y_lead, y, y_lag, e, params, *buffers)` storing nodes into
+        preallocated buffers: `outputs` is a list of (target, node) where target is e.g. "data[3]".
+        """
+        body, ref = self._body([node for _, node in outputs], names)
+        lines = [f"def {funname}(y_lead, y, y_lag, e, params, {', '.join(buffers)}):"] + body
+        for target, node in outputs:
+            lines.append(f"    {target} = {ref(node)}")
+        return "\n".join(lines) + "\n"
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __repr__(self):
+        return f"ExpressionDAG({len(self.nodes)} nodes, {len(self.roots)} roots)"
+
+
+class DAGBuilder(Interpreter):
+    """
+    Converts equation trees to nodes of an `ExpressionDAG`.
+
+    All symbols are resolved to slots:
+    - endogenous variables at t+1, t, t-1 become `y_lead[i]`, `y[i]`, `y_lag[i]`
+    - exogenous variables (at t) become `e[i]`
+    - constants and steady-state values (name[~]) become `params[i]`
+    - values (name[date]) are replaced by their numerical value
+    """
+
+    def __init__(self, endogenous: List[str], exogenous: List[str], parameters: List[str], values: Dict = None, dag: ExpressionDAG = None):
+
+        super().__init__()
+        self.endogenous = {v: i for i, v in enumerate(endogenous)}
+        self.exogenous = {v: i for i, v in enumerate(exogenous)}
+        self.parameters = {v: i for i, v in enumerate(parameters)}
+        self.values = values if values is not None else {}
+        self.dag = dag if dag is not None else ExpressionDAG()
+
+    def add(self, tree):
+        return self.dag.node("add", self.visit(tree.children[0]), self.visit(tree.children[1]))
+
+    def sub(self, tree):
+        return self.dag.node("sub", self.visit(tree.children[0]), self.visit(tree.children[1]))
+
+    def mul(self, tree):
+        return self.dag.node("mul", self.visit(tree.children[0]), self.visit(tree.children[1]))
+
+    def div(self, tree):
+        return self.dag.node("div", self.visit(tree.children[0]), self.visit(tree.children[1]))
+
+    def pow(self, tree):
+        return self.dag.node("pow", self.visit(tree.children[0]), self.visit(tree.children[1]))
+
+    def neg(self, tree):
+        return self.dag.node("neg", self.visit(tree.children[0]))
+
+    def number(self, tree):
+        value = tree.children[0].value
+        try:
+            return self.dag.node("number", int(value))
+        except ValueError:
+            return self.dag.node("number", float(value))
+
+    def constant(self, tree):
+        name = str(tree.children[0].children[0])
+        if name not in self.parameters:
+            raise ValueError(f"({tree.meta.line},{tree.meta.column}): Undefined value: {name}")
+        return self.dag.node("params", self.parameters[name])
+
+    def value(self, tree):
+        name = str(tree.children[0].children[0])
+        time = int(tree.children[1].children[0])
+        try:
+            return self.dag.node("number", float(self.values[name][time]))
+        except KeyError:
+            raise ValueError(f"({tree.meta.line},{tree.meta.column}): Undefined value {name}[{time}]")
+
+    def variable(self, tree):
+        name = str(tree.children[0].children[0])
+        index = str(tree.children[1].children[0])
+        shift = int(tree.children[2].children[0])
+
+        if index == '~':
+            key = f"{name}[~]"
+            if key not in self.parameters:
+                raise ValueError(f"({tree.meta.line},{tree.meta.column}): Undefined steady state for variable {key}")
+            return self.dag.node("params", self.parameters[key])
+        if name in self.exogenous:
+            if shift != 0:
+                raise ValueError(f"({tree.meta.line},{tree.meta.column}): Exogenous variable {name} can only appear at date t")
+            return self.dag.node("e", self.exogenous[name])
+        if name in self.endogenous:
+            if shift not in (-1, 0, 1):
+                raise ValueError(f"({tree.meta.line},{tree.meta.column}): Unsupported shift for variable {name}: {shift}")
+            arg = ('y', 'y_lead', 'y_lag')[shift]
+            return self.dag.node(arg, self.endogenous[name])
+        raise ValueError(f"({tree.meta.line},{tree.meta.column}): Unknown variable {name}")
+
+    def call(self, tree):
+        funname = str(tree.children[0].children[0])
+        if funname not in MATH_FUNCTIONS:
+            raise ValueError(f"Undefined function: {funname}")
+        args = [self.visit(c) for c in tree.children[1:]]
+        return self.dag.node("call", funname, *args)
+
+    def equality(self, tree):
+        a = self.visit(tree.children[0])
+        b = self.visit(tree.children[1])
+        return self.dag.node("sub", b, a)
+
+
+def build_dag(equations: List[Tree], endogenous: List[str], exogenous: List[str], parameters: List[str], values: Dict = None) -> ExpressionDAG:
+    """Build the expression DAG of a list of equations (one root per equation)"""
+    builder = DAGBuilder(endogenous, exogenous, parameters, values=values)
+    builder.dag.roots = [builder.visit(eq) for eq in equations]
+    return builder.dag
@@ -0,0 +1,123 @@
+"""
+Dependency graph of the definitions of a model.
+
+Each assignment of a free block (constants, steady-states, processes, values and quantified
+assignments) is a node of the graph. Symbols are identified by keys `(kind, name)` where kind is one of
+"constant", "steady_state", "process" or "values" (all the dated values of a name share one key).
+A definition depends on the definitions of the symbols it reads, so that when some symbols change,
+only the definitions downstream of them need to be evaluated again.
+"""
+
+from lark.tree import Tree
+from typing import List, Set, Tuple
+
+Key = Tuple[str, str]
+
+
+def _name(symbol_tree: Tree) -> str:
+    return str(symbol_tree.children[0].children[0])
+
+
+def symbol_reads(tree: Tree, quantified: bool = False, equation: bool = False) -> Set[Key]:
+    """
+    Keys of the symbols read by an expression (`t` is the loop variable in quantified assignments).
+
+    In equations, variables `x[t+s]` are unknowns: they only read the steady-state of x
+    (at which the equations are evaluated by default).
+    """
+    reads = set()
+    for node in tree.iter_subtrees():
+        if node.data == 'constant':
+            name = _name(node)
+            if not (quantified and name == 't'):
+                reads.add(("constant", name))
+        elif node.data == 'value':
+            # values are replaced by steady-states when evaluating at the steady-state
+            reads.add(("values", _name(node)))
+            reads.add(("steady_state", _name(node)))
+        elif node.data == 'variable':
+            if equation or str(node.children[1].children[0]) == '~':
+                reads.add(("steady_state", _name(node)))
+            else:
+                reads.add(("values", _name(node)))
+    return reads
+
+
+def symbol_definitions(statement: Tree) -> Set[Key]:
+    """Keys of the symbols defined by an assignment"""
+    if statement.data == 'quantified_assignment':
+        return {("values", _name(statement.children[1]))}
+    symbol_tree = statement.children[0]
+    name = _name(symbol_tree)
+    if symbol_tree.data == 'constant':
+        return {("constant", name)}
+    if symbol_tree.data == 'value':
+        return {("values", name)}
+    if str(symbol_tree.children[1].children[0]) == '~':
+        return {("steady_state", name)}
+    # a process also defines the steady-state of its variable
+    return {("process", name), ("steady_state", name)}
+
+
+class DependencyGraph:
+    """
+    Definitions of a free block, with the symbols each of them reads and defines.
+
+    `statements` are the assignment trees in order of definition, `equations` the equation trees.
+    """
+
+    def __init__(self, tree: Tree):
+
+        self.statements: List[Tree] = []
+        self.equations: List[Tree] = []
+        for child in tree.children:
+            if not hasattr(child, 'data'):
+                continue
+            if child.data in ('equality', 'formula'):
+                self.equations.append(child)
+            else:
+                self.statements.append(child)
+
+        self.reads: List[Set[Key]] = []
+        self.defines: List[Set[Key]] = []
+        defined = set()
+        for st in self.statements:
+            if st.data == 'quantified_assignment':
+                reads = symbol_reads(st.children[0], quantified=True) | symbol_reads(st.children[2], quantified=True)
+            else:
+                reads = symbol_reads(st.children[1])
+            defines = symbol_definitions(st)
+            if len(defines) == 1 and defines <= defined and next(iter(defines))[0] in ("constant", "steady_state"):
+                # redefinitions of constants and steady-states are ignored by the evaluator
+                defines = set()
+            defined |= defines
+            self.reads.append(reads)
+            self.defines.append(defines)
+
+        self.equation_reads: List[Set[Key]] = [symbol_reads(eq, equation=True) for eq in self.equations]
+
+    def definitions(self) -> Set[Key]:
+        """Keys of all the symbols defined in the block"""
+        return set().union(*self.defines)
+
+    def downstream(self, keys: Set[Key]) -> Tuple[List[int], Set[Key]]:
+        """
+        Definitions to evaluate again when the symbols `keys` change.
+
+        Returns the indices of the statements (in order of definition) and the set of all
+        symbols which may have changed (`keys` included).
+        """
+        changed = set(keys)
+        statements = []
+        for i, (reads, defines) in enumerate(zip(self.reads, self.defines)):
+            if reads & changed:
+                statements.append(i)
+                changed |= defines
+        return statements, changed
+
+    def affected_equations(self, keys: Set[Key]) -> List[int]:
+        """Indices of the equations reading some of the symbols `keys`"""
+        return [i for i, reads in enumerate(self.equation_reads) if reads & keys]
+
+    def __repr__(self):
+        return f"DependencyGraph({len(self.statements)} definitions, {len(self.equations)} equations)"
@@ -0,0 +1,241 @@
+"""
+Export of models to standalone python modules.
+
+`export_source` generates a plain python module (which only depends on numpy) with the residuals and
+the sparse jacobian of a model, its parameters and its steady-state. `import_exported` keeps such a
+module next to the model file (in a `__dynsym__` directory, keyed by a hash of the model source)
+and imports it: once exported, a model is loaded without parsing or evaluating its definitions.
+
+Exported modules can also be imported directly (e.g. by workers in which dynsym is not installed),
+with `__dynsym__` on `sys.path`.
+"""
+
+import os
+import re
+import sys
+import types
+import hashlib
+import importlib.util
+from os import path
+from typing import Dict, Tuple
+
+from .cache import cache_key, version
+
+# part of the hash of exported modules: increase when the generated code changes
+EXPORT_FORMAT = 1
+
+EXPORT_DIR = "__dynsym__"
+
+
+PRELUDE = '''
+import numpy as np
+from numpy import sin, cos, tan, exp, log, sqrt, abs, sinh, cosh, tanh, log10, log2, floor, ceil
+from numpy import arcsin as asin, arccos as acos, arctan as atan, maximum as max, minimum as min
+
+nan = np.nan
+inf = np.inf
+
+
+def pow(x, y):
+    return x ** y
+
+
+def sign(x):
+    return np.where(x >= 0, 1.0, -1.0)
+
+
+def step(x, y):
+    return np.where(x >= y, 1.0, 0.0)
+
+'''
+
+FUNCTIONS = '''
+
+def residuals(y_lead, y, y_lag, e, params=None):
+    """Residuals of the dynamic equations (params defaults to PARAMETER_VALUES)"""
+    if params is None:
+        params = PARAMETER_VALUES
+    return np.array(_residuals(y_lead, y, y_lag, e, params), dtype=float)
+
+
+def jacobian(y_lead, y, y_lag, e, params=None, r=None, data=None):
+    """
+    Residuals and jacobian as (r, data), where data are the values of the nonzeros of the jacobian
+    in the CSR pattern (INDPTR, INDICES) of shape SHAPE. Preallocated `r` and `data` are refilled.
+    """
+    if params is None:
+        params = PARAMETER_VALUES
+    if r is None:
+        r = np.zeros(SHAPE[0])
+    if data is None:
+        data = np.zeros(len(INDICES))
+    _jacobian(y_lead, y, y_lag, e, params, r, data)
+    return r, data
+
+
+def sparse_jacobian(y_lead, y, y_lag, e, params=None):
+    """Residuals and jacobian as (r, J), with J a scipy.sparse CSR matrix"""
+    from scipy.sparse import csr_matrix
+    r, data = jacobian(y_lead, y, y_lag, e, params)
+    return r, csr_matrix((data, INDICES, INDPTR), shape=SHAPE)
+'''
+
+
+def leaf_names(compiled) -> Dict[Tuple[str, int], str]:
+    """Names of the input leaves of the compiled equations, e.g. `k__t_m1_` for ("y_lag", i)"""
+    from .grammar import stringify_constant, stringify_variable
+
+    names = {}
+    for i, v in enumerate(compiled.endogenous):
+        names[("y_lead", i)] = stringify_variable((v, ("t", 1)))
+        names[("y", i)] = stringify_variable((v, ("t", 0)))
+        names[("y_lag", i)] = stringify_variable((v, ("t", -1)))
+    for i, v in enumerate(compiled.exogenous):
+        names[("e", i)] = stringify_variable((v, ("t", 0)))
+    for i, p in enumerate(compiled.parameters):
+        names[("params", i)] = f"{p[:-3]}__ss_" if p.endswith("[~]") else stringify_constant(p)
+    return names
+
+
+def _array(values, dtype="float") -> str:
+    return f"np.array({list(values)!r}, dtype={dtype})"
+
+
+def export_source(model, key: str = None) -> str:
+    """
+    Source code of a standalone module for `model`, defining:
+
+    - `ENDOGENOUS`, `EXOGENOUS`, `PARAMETERS`: orderings of the variables and of the parameters
+    - `PARAMETER_VALUES`, `STEADY_STATE` (a tuple of arrays (y, e)): calibrated values
+    - `SHAPE`, `INDPTR`, `INDICES`: CSR sparsity pattern of the jacobian, with columns ordered as
+      [endogenous at t+1, at t, at t-1, exogenous]
+    - `residuals(y_lead, y, y_lag, e, params=None)`
+    - `jacobian(y_lead, y, y_lag, e, params=None)` returning (r, data) and
+      `sparse_jacobian(y_lead, y, y_lag, e, params=None)` returning (r, scipy.sparse matrix)
+    """
+    compiled = model.compiled
+    pattern = model.sparsity
+    jac = compiled.symbolic
+    dag = jac.dag
+    names = leaf_names(compiled)
+    ys, es = compiled.steady_state
+
+    source = f"model `{path.basename(model.filename)}`" if model.filename else "a model"
+    lines = [
+        '"""',
+        f"Residuals and jacobian of {source}, exported by dynsym {version()}.",
+        "",
+        "This module is generated (see `dynsym.export`): don't edit it.",
+        '"""',
+        PRELUDE,
+        f"KEY = {key!r}",
+        "",
+        f"ENDOGENOUS = {list(compiled.endogenous)!r}",
+        f"EXOGENOUS = {list(compiled.exogenous)!r}",
+        f"PARAMETERS = {list(compiled.parameters)!r}",
+        f"PARAMETER_VALUES = {_array(compiled.parameter_values.tolist())}",
+        f"STEADY_STATE = ({_array(ys.tolist())}, {_array(es.tolist())})",
+        "",
+        f"SHAPE = {tuple(pattern.shape)!r}",
+        f"INDPTR = {_array(pattern.indptr.tolist(), 'np.int32')}",
+        f"INDICES = {_array(pattern.indices.tolist(), 'np.int32')}",
+        "",
+        "",
+        dag.source(funname="_residuals", names=names),
+        "",
+    ]
+    outputs = [(f"r[{i}]", root) for i, root in enumerate(dag.roots)]
+    for row, col, node in zip(jac.rows, jac.cols, jac.nodes):
+        outputs.append((f"data[{pattern.position(int(row), int(col))}]", node))
+    lines.append(dag.fill_source("_jacobian", outputs, names=names))
+    lines.append(FUNCTIONS)
+    return "\n".join(lines)
+
+
+def export_model(model, filename: str, key: str = None) -> str:
+    """Writes the module exported from `model` (see `export_source`) to `filename`. Returns `filename`."""
+    d = path.dirname(filename)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    tmp = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp, "wt", encoding="utf-8") as f:
+        f.write(export_source(model, key=key))
+    os.replace(tmp, filename)
+    return filename
+
+
+def export_key(txt: str) -> str:
+    """Hash of a model source, of the grammar, of the dynsym version and of the export format"""
+    h = hashlib.sha256()
+    h.update(cache_key(txt).encode())
+    h.update(str(EXPORT_FORMAT).encode())
+    return h.hexdigest()
+
+
+def _module_name(filename: str) -> str:
+    stem = re.sub(r"\W", "_", path.splitext(path.basename(filename))[0])
+    return stem if stem[:1].isalpha() else f"model_{stem}"
+
+
+def export_path(filename: str, txt: str = None) -> str:
+    """Path of the exported module of a model file: `__dynsym__/<name>_<hash>.py`, in the directory of the file"""
+    if txt is None:
+        with open(filename, "rt", encoding="utf-8") as f:
+            txt = f.read()
+    name = f"{_module_name(filename)}_{export_key(txt)[:16]}"
+    return path.join(path.dirname(path.abspath(filename)), EXPORT_DIR, name + ".py")
+
+
+def _remove_stale(filename: str, target: str):
+    """Removes the modules exported from previous versions of a model file"""
+    d = path.dirname(target)
+    pattern = re.compile(re.escape(_module_name(filename)) + r"_[0-9a-f]{16}\.py")
+    for n in os.listdir(d):
+        if pattern.fullmatch(n) and path.join(d, n) != target:
+            try:
+                os.remove(path.join(d, n))
+            except OSError:
+                pass
+
+
+def load_module(filename: str) -> types.ModuleType:
+    """Imports an exported module from its path"""
+    name = path.splitext(path.basename(filename))[0]
+    module = sys.modules.get(name)
+    if module is not None and getattr(module, "__file__", None) == filename:
+        return module
+    spec = importlib.util.spec_from_file_location(name, filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules[name] = module
+    return module
+
+
+def import_exported(filename: str, cache: bool = False) -> types.ModuleType:
+    """
+    Standalone module of a model file (see `export_source`).
+
+    The module is imported from `export_path(filename)`. It is generated only if it doesn't exist
+    (that is the first time, or when the model file, the grammar or dynsym changed): the model is
+    then read, and the modules exported from previous versions of the file are removed.
+    If the module can't be written (e.g. read-only directory), it is generated in memory.
+    `cache` is passed to the parser (see `dynsym.cache.parse`).
+    """
+    with open(filename, "rt", encoding="utf-8") as f:
+        txt = f.read()
+    target = export_path(filename, txt)
+    key = export_key(txt)
+    if path.exists(target):
+        return load_module(target)
+
+    from .cache import parse
+    from .model import Model
+    model = Model(parse(txt, start="free_block", cache=cache), filename=filename)
+    try:
+        export_model(model, target, key=key)
+    except OSError:
+        module = types.ModuleType(path.splitext(path.basename(target))[0])
+        exec(compile(export_source(model, key=key), target, "exec"), module.__dict__)
+        return module
+    _remove_stale(filename, target)
+    return load_module(target)
@@ -0,0 +1,148 @@
+"""
+Constant folding.
+
+Substitutes known constants (and steady-state values `name[~]`) in equation trees and folds every
+subtree which doesn't depend on variables or values, producing reduced equation trees.
+"""
+
+from lark.visitors import Transformer, Interpreter, v_args
+from lark.tree import Tree
+from lark.lexer import Token
+from typing import Dict, List, Set
+
+from .autodiff import MATH_FUNCTIONS
+
+
+def number_tree(value, meta=None) -> Tree:
+    """A `number` node with the given value"""
+    return Tree("number", [Token("NUMBER", repr(value))], meta=meta)
+
+
+def is_number(tree) -> bool:
+    return isinstance(tree, Tree) and tree.data == "number"
+
+
+def number_value(tree):
+    value = tree.children[0]
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+@v_args(tree=True)
+class ConstantFolder(Transformer):
+    """Replaces constants by their values and folds subtrees which only contain numbers"""
+
+    def __init__(self, constants: Dict, steady_states: Dict = None):
+        super().__init__()
+        self.constants = constants
+        self.steady_states = steady_states if steady_states is not None else {}
+
+    def constant(self, tree):
+        name = str(tree.children[0].children[0])
+        value = self.constants.get(name)
+        if isinstance(value, (int, float)):
+            return number_tree(value, tree.meta)
+        return tree
+
+    def variable(self, tree):
+        name = str(tree.children[0].children[0])
+        index = str(tree.children[1].children[0])
+        value = self.steady_states.get(name)
+        if index == '~' and isinstance(value, (int, float)):
+            return number_tree(value, tree.meta)
+        return tree
+
+    def _fold(self, tree, f):
+        if all(is_number(c) for c in tree.children):
+            return number_tree(f(*[number_value(c) for c in tree.children]), tree.meta)
+        return tree
+
+    def add(self, tree):
+        return self._fold(tree, lambda a, b: a + b)
+
+    def sub(self, tree):
+        return self._fold(tree, lambda a, b: a - b)
+
+    def mul(self, tree):
+        return self._fold(tree, lambda a, b: a * b)
+
+    def div(self, tree):
+        return self._fold(tree, lambda a, b: a / b)
+
+    def pow(self, tree):
+        return self._fold(tree, lambda a, b: a ** b)
+
+    def neg(self, tree):
+        return self._fold(tree, lambda a: -a)
+
+    def call(self, tree):
+        funname = str(tree.children[0].children[0])
+        args = tree.children[1:]
+        if funname in MATH_FUNCTIONS and all(is_number(c) for c in args):
+            return number_tree(MATH_FUNCTIONS[funname](*[number_value(c) for c in args]), tree.meta)
+        return tree
+
+
+class ConstantDependencies(Interpreter):
+    """Names of the constants (and `name[~]` steady-state values) an expression depends on"""
+
+    def __init__(self):
+        super().__init__()
+        self.names: Set[str] = set()
+
+    def constant(self, tree):
+        self.names.add(str(tree.children[0].children[0]))
+
+    def variable(self, tree):
+        if str(tree.children[1].children[0]) == '~':
+            self.names.add(f"{tree.children[0].children[0]}[~]")
+
+    def value(self, tree):
+        pass
+
+
+def constant_dependencies(tree: Tree) -> Set[str]:
+    d = ConstantDependencies()
+    d.visit(tree)
+    return d.names
+
+
+def fold_constants(equations: List[Tree], constants: Dict, steady_states: Dict = None) -> List[Tree]:
+    """Returns reduced copies of the equations, with constants substituted and folded"""
+    folder = ConstantFolder(constants, steady_states)
+    return [folder.transform(eq) for eq in equations]
+
+
+class FoldedEquations:
+    """
+    Reduced equations which can be updated cheaply when some constants change:
+    only the equations depending on modified constants are folded again.
+    """
+
+    def __init__(self, equations: List[Tree], constants: Dict, steady_states: Dict = None):
+        self.originals = equations
+        self.constants = dict(constants)
+        self.steady_states = dict(steady_states) if steady_states is not None else {}
+        self.dependencies = [constant_dependencies(eq) for eq in equations]
+        self.equations = fold_constants(equations, self.constants, self.steady_states)
+
+    def update(self, constants: Dict = None, steady_states: Dict = None) -> List[int]:
+        """
+        Change the values of some constants (or steady-states) and refold the affected equations.
+
+        Returns the indices of the equations which were folded again.
+        """
+        changed = set()
+        for name, value in (constants or {}).items():
+            self.constants[name] = value
+            changed.add(name)
+        for name, value in (steady_states or {}).items():
+            self.steady_states[name] = value
+            changed.add(f"{name}[~]")
+        folder = ConstantFolder(self.constants, self.steady_states)
+        affected = [i for i, deps in enumerate(self.dependencies) if deps & changed]
+        for i in affected:
+            self.equations[i] = folder.transform(self.originals[i])
+        return affected
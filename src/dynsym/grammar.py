@@ -1,16 +1,16 @@
-from hashlib import new
 from lark.exceptions import (
     LarkError,
     UnexpectedInput,
     ConfigurationError,
     UnexpectedCharacters,
 )
-from yaml import ScalarNode
 
 import copy
+import os
+from functools import wraps
 
 # import lark
-from lark import Lark
+from lark import Lark, __version__ as lark_version
 from lark.visitors import v_args
 from lark.tree import Tree
 from lark.lexer import Token
@@ -26,8 +26,6 @@ GRAMMARS_PATH = path.join(
 )
 GRAMMAR_FILE = path.join(GRAMMARS_PATH, 'grammar.lark')
 
-grammar_0 = open(GRAMMAR_FILE, "rt", encoding="utf-8").read()
-
 
 ### replaces date with 0 when missing
 
@@ -45,19 +43,47 @@ class TimeFixer(Transformer):
             return tree
 
 
-parser = Lark(
-    grammar_0,
-    start=[
-        "formula",
-        "equation_block",
-        "assignment_block",
-        "free_block"
-    ],
-    parser="lalr",
-    strict=True,
-    propagate_positions=True,
-    transformer=TimeFixer()
-)
+_parser = None
+
+def get_parser() -> Lark:
+    """
+    Returns the model parser, building it on first use.
+
+    The LALR tables are serialized in the dynsym cache directory (see `dynsym.cache`),
+    so that only the first process ever pays for the grammar compilation (lark unpickles them:
+    the cache directory must be trusted).
+    """
+    global _parser
+    if _parser is None:
+        from .cache import cache_dir, fingerprint
+        grammar = open(GRAMMAR_FILE, "rt", encoding="utf-8").read()
+        cache_file = path.join(cache_dir(), f"grammar-{fingerprint()[:16]}-lark{lark_version}.cache")
+        try:
+            os.makedirs(cache_dir(), exist_ok=True)
+        except OSError:
+            cache_file = False
+        _parser = Lark(
+            grammar,
+            start=[
+                "formula",
+                "equation_block",
+                "assignment_block",
+                "free_block"
+            ],
+            parser="lalr",
+            strict=True,
+            propagate_positions=True,
+            transformer=TimeFixer(),
+            cache=cache_file,
+        )
+    return _parser
+
+
+def __getattr__(name):
+    # `parser` is built lazily
+    if name == "parser":
+        return get_parser()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 Expression = Union[Tree, Token]
@@ -264,7 +290,7 @@ def expression_or_string(f):
         if not isinstance(args[0], str):
             return f(*args, **kwds)
         else:
-            a = parser.parse(args[0], start="start")
+            a = get_parser().parse(args[0], start="start")
             nargs = tuple([a]) + args[1:]
             res = f(*nargs, **kwds)
             return str_expression(res)
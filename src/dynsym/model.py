@@ -0,0 +1,301 @@
+import numpy as np
+from typing import Dict, List, TYPE_CHECKING
+
+from .compiler import compile_equations, CompiledEquations
+
+if TYPE_CHECKING:
+    from lark.tree import Tree
+
+
+class Model:
+    """
+    A model defined by a free block: calibration (constants, steady-states, processes, values)
+    and dynamic equations, compiled to a python function of (y_lead, y, y_lag, e, params).
+    """
+
+    def __init__(self, tree: "Tree", filename: str = None):
+
+        self.tree = tree
+        self.filename = filename
+
+        from .analyze import FormulaEvaluator
+
+        # definitions only: dated values (e.g. `e[1] <- e[0]*0.5`) refer to other dated values, not to steady-states
+        fe = FormulaEvaluator()
+        fe.visit(tree)
+        self.evaluator = fe
+
+        symbols = fe.symbols
+        self.endogenous: List[str] = symbols['endogenous']
+        self.exogenous: List[str] = symbols['exogenous']
+        self.equations: List["Tree"] = fe.equations
+
+        self.constants: Dict = fe.constants
+        self.steady_states: Dict = fe.steady_states
+        self.processes: Dict = fe.processes
+        self.values: Dict = fe.values
+
+        self._compiled = None
+        self._dependencies = None
+        # values set with `update`, which take precedence over the definitions of the model
+        self._overrides = {}
+        # results cached per model (e.g. perturbation solutions, steady-state jacobian)
+        self._cache = {}
+
+    @property
+    def compiled(self) -> CompiledEquations:
+        """Compiled residuals (built on first use)"""
+        if self._compiled is None:
+            self._compiled = compile_equations(self.evaluator, endogenous=self.endogenous, exogenous=self.exogenous)
+        return self._compiled
+
+    @property
+    def bytecode(self):
+        """Equations lowered to a bytecode program (see `dynsym.bytecode.Program`), built on first use"""
+        program = self._cache.get('bytecode')
+        if program is None:
+            from .bytecode import compile_bytecode
+            program = self._cache['bytecode'] = compile_bytecode(
+                self.equations, self.endogenous, self.exogenous, self.compiled.parameters, values=self.values
+            )
+        return program
+
+    @property
+    def dependencies(self):
+        """Dependency graph of the definitions (see `dynsym.dependencies.DependencyGraph`), built on first use"""
+        if self._dependencies is None:
+            from .dependencies import DependencyGraph
+            self._dependencies = DependencyGraph(self.tree)
+        return self._dependencies
+
+    @property
+    def sparsity(self):
+        """Structural sparsity pattern of the jacobian (see `dynsym.sparsity.SparsityPattern`), computed once from the equations"""
+        pattern = self._cache.get('sparsity')
+        if pattern is None:
+            from .sparsity import SparsityPattern
+            from .autodiff import VariableIndex
+            index = VariableIndex(self.endogenous, self.exogenous)
+            pattern = self._cache['sparsity'] = SparsityPattern(self.equations, index)
+        return pattern
+
+    def sparse_jacobian(self, method="symbolic"):
+        """
+        Evaluator of the residuals and jacobian into a preallocated CSR matrix with the pattern `self.sparsity`,
+        built on first use. With method="symbolic", compiled symbolic derivatives are used
+        (`dynsym.sparsity.SparseJacobian`); with method="colored", compressed forward mode
+        (`dynsym.sparsity.CompressedJacobian`).
+        """
+        key = ('sparse_jacobian', method)
+        jac = self._cache.get(key)
+        if jac is None:
+            from .sparsity import SparseJacobian, CompressedJacobian
+            if method == "symbolic":
+                jac = SparseJacobian(self.compiled, self.sparsity)
+            elif method == "colored":
+                jac = CompressedJacobian(self.compiled, self.sparsity)
+            else:
+                raise ValueError(f"Unknown method: {method}")
+            self._cache[key] = jac
+        return jac
+
+    @property
+    def parameters(self) -> np.ndarray:
+        """Default parameter vector (see `CompiledEquations.parameters` for the names)"""
+        return self.compiled.parameter_values
+
+    def steady_state(self):
+        """Calibrated steady-state as a tuple of arrays (y, e)"""
+        return self.compiled.steady_state
+
+    def residuals(self, y_lead, y, y_lag, e, params=None) -> np.ndarray:
+        """Residuals of the dynamic equations"""
+        return self.compiled(y_lead, y, y_lag, e, params)
+
+    def jacobians(self, y_lead=None, y=None, y_lag=None, e=None, params=None):
+        """
+        Residuals and jacobians (r, A, B, C, D) of the dynamic equations.
+
+        Arguments which are not given are set to their steady-state value. The jacobian at the
+        calibrated steady-state is cached (and partially refreshed by `update`).
+        """
+        if all(x is None for x in (y_lead, y, y_lag, e, params)):
+            cached = self._cache.get('jacobian')
+            if cached is None:
+                ys, es = self.steady_state()
+                r, J = self.compiled.symbolic.dense(ys, ys, ys, es, self.parameters)
+                cached = self._cache['jacobian'] = (r, J)
+            r, J = cached
+            return (r.copy(), *[b.copy() for b in self.compiled.index.blocks(J)])
+        ys, es = self.steady_state()
+        y_lead = ys if y_lead is None else y_lead
+        y = ys if y is None else y
+        y_lag = ys if y_lag is None else y_lag
+        e = es if e is None else e
+        return self.compiled.jacobians(y_lead, y, y_lag, e, params)
+
+    def _point(self, point):
+        ys, es = self.steady_state()
+        if point is None:
+            return ys, ys, ys, es
+        return tuple(np.asarray(x, dtype=float) for x in point)
+
+    def jvp(self, point, direction, params=None):
+        """
+        Jacobian-vector product, without forming the jacobian.
+
+        Args:
+            point: (y_lead, y, y_lag, e), or None for the steady-state
+            direction: (dy_lead, dy, dy_lag, de), with the same shapes
+
+        Returns (r, Jv): the residuals and their directional derivative, computed in one
+        evaluation with single-direction dual numbers.
+        """
+        from .autodiff import DualNumber
+
+        compiled = self.compiled
+        if params is None:
+            params = compiled.parameter_values
+        args = [
+            [DualNumber(float(v), float(d)) for v, d in zip(x, dx)]
+            for x, dx in zip(self._point(point), direction)
+        ]
+        res = compiled.function(*args, params)
+        r = np.array([getattr(v, 'value', v) for v in res], dtype=float)
+        Jv = np.array([getattr(v, 'tangent', 0.0) for v in res], dtype=float)
+        return r, Jv
+
+    def vjp(self, point, cotangent, params=None):
+        """
+        Vector-jacobian product, without forming the jacobian.
+
+        Args:
+            point: (y_lead, y, y_lag, e), or None for the steady-state
+            cotangent: array with one weight per equation
+
+        Returns (r, (g_lead, g, g_lag, g_e)): the residuals and the gradients of
+        `cotangent @ residuals` w.r.t. y_lead, y, y_lag and e, computed in reverse mode with a tape
+        (recorded on first use and replayed afterwards, see `dynsym.reverse.Tape`).
+        """
+        compiled = self.compiled
+        if params is None:
+            params = compiled.parameter_values
+        point = self._point(point)
+        tape = self._cache.get('tape')
+        if tape is None:
+            tape = self._cache['tape'] = compiled.tape(*point, params)
+        r = tape.forward(np.concatenate([*point, params]))
+        g = tape.vjp(cotangent)
+        n, m = len(self.endogenous), len(self.exogenous)
+        return r, (g[:n], g[n:2 * n], g[2 * n:3 * n], g[3 * n:3 * n + m])
+
+    def update(self, changes: Dict = None, **kwargs):
+        """
+        Change the values of some constants (e.g. `model.update(rho=0.9)`) or steady-states
+        (`model.update({"k[~]": 11.0})`) and re-evaluate only the definitions depending on them.
+
+        Updated values take precedence over the definitions of the model (also in later updates).
+        Compiled parameters are updated in place and only the rows of the cached steady-state jacobian
+        which depend on a changed symbol are evaluated again.
+        """
+        changes = {**(changes or {}), **kwargs}
+        graph = self.dependencies
+        defined = graph.definitions()
+        fe = self.evaluator
+
+        keys = {}
+        for name, value in changes.items():
+            key = ("steady_state", name[:-3]) if name.endswith("[~]") else ("constant", name)
+            if key not in defined:
+                raise ValueError(f"Unknown constant or steady-state: {name}")
+            keys[key] = value
+        self._overrides.update(keys)
+
+        def apply(key, value):
+            kind, name = key
+            if kind == "constant":
+                fe.constants[name] = value
+            else:
+                fe.steady_states[name] = value
+
+        for key, value in keys.items():
+            apply(key, value)
+
+        statements, changed = graph.downstream(set(keys))
+        # definitions are evaluated again below: keep their order (that of the parameter vector)
+        orders = [(d, list(d)) for d in (fe.constants, fe.steady_states, fe.processes)]
+        for i in statements:
+            defines = graph.defines[i]
+            # the evaluator ignores (or rejects) redefinitions: remove the previous values first
+            for kind, name in defines:
+                if kind == "constant":
+                    fe.constants.pop(name, None)
+                elif kind == "steady_state":
+                    fe.steady_states.pop(name, None)
+                elif kind == "process":
+                    fe.processes.pop(name, None)
+            fe.visit(graph.statements[i])
+            for key in defines:
+                if key in self._overrides:
+                    apply(key, self._overrides[key])
+        for d, order in orders:
+            items = {k: d[k] for k in order if k in d}
+            items.update(d)
+            d.clear()
+            d.update(items)
+
+        if self._compiled is None:
+            self._cache.pop('jacobian', None)
+            return
+
+        values = {key for key in changed if key[0] == "values"}
+        if graph.affected_equations(values):
+            # values are embedded in the compiled code
+            self._compiled = None
+            self._cache.pop('jacobian', None)
+            self._cache.pop(('sparse_jacobian', 'symbolic'), None)
+            self._cache.pop(('sparse_jacobian', 'colored'), None)
+            self._cache.pop('tape', None)
+            self._cache.pop('bytecode', None)
+            return
+
+        # new arrays: previous ones may be referenced by earlier results
+        compiled = self._compiled
+        compiled.parameter_values = np.array([
+            fe.constants.get(p, np.nan) if not p.endswith("[~]") else fe.steady_states.get(p[:-3], np.nan)
+            for p in compiled.parameters
+        ], dtype=float)
+        compiled.steady_state = (
+            np.array([fe.steady_states.get(v, np.nan) for v in compiled.endogenous], dtype=float),
+            np.array([fe.steady_states.get(v, np.nan) for v in compiled.exogenous], dtype=float),
+        )
+        ys, es = compiled.steady_state
+
+        cached = self._cache.get('jacobian')
+        if cached is not None:
+            rows = graph.affected_equations(changed)
+            if rows:
+                r, J = cached
+                jac = compiled.symbolic
+                function, nonzeros = jac.partial(rows)
+                out = function(ys, ys, ys, es, compiled.parameter_values)
+                r[rows] = out[:len(rows)]
+                J[rows, :] = 0.0
+                J[jac.rows[nonzeros], jac.cols[nonzeros]] = out[len(rows):]
+
+    def __getstate__(self):
+        # compiled functions can't be pickled: the model is rebuilt from its tree (without re-parsing)
+        overrides = {
+            (f"{name}[~]" if kind == "steady_state" else name): value
+            for (kind, name), value in self._overrides.items()
+        }
+        return {'tree': self.tree, 'filename': self.filename, 'overrides': overrides}
+
+    def __setstate__(self, state):
+        self.__init__(state['tree'], filename=state['filename'])
+        if state['overrides']:
+            self.update(state['overrides'])
+
+    def __repr__(self):
+        name = f"'{self.filename}', " if self.filename else ""
+        return f"Model({name}endogenous={self.endogenous}, exogenous={self.exogenous})"
@@ -0,0 +1,313 @@
+import time
+import warnings
+import numpy as np
+
+from .sparse import sparse_matrix, csr_matrix
+
+
+class PerfectForesightResult:
+    """Result of `solve_perfect_foresight`"""
+
+    def __init__(self, paths, exogenous, names, success, iterations, residuals, timings):
+        self.paths = paths
+        self.exogenous = exogenous
+        self.names = names
+        self.success = success
+        self.iterations = iterations
+        self.residuals = residuals
+        self.timings = timings
+
+    def __getitem__(self, name):
+        """Path of variable `name` for dates 0..T+1"""
+        return self.paths[:, self.names.index(name)]
+
+    def __repr__(self):
+        status = "converged" if self.success else "failed"
+        T = self.paths.shape[0] - 2
+        return (
+            f"PerfectForesightResult(T={T}, {status} in {self.iterations} iterations, "
+            f"|r|={np.max(np.abs(self.residuals)):.3e}, time={self.timings['total']:.4f}s)"
+        )
+
+
+def _path(model, names, T, default):
+    """Array (T+2, len(names)) with values[name][t] for t=0..T+1 where defined and `default` elsewhere"""
+    X = np.tile(np.asarray(default, dtype=float), (T + 2, 1))
+    for i, name in enumerate(names):
+        if name in model.values:
+            x = model.values[name].at(0, T + 2)
+            defined = ~np.isnan(x)
+            X[defined, i] = x[defined]
+    return X
+
+
+def exogenous_path(model, T):
+    """Exogenous shocks for dates 0..T+1 (values defined in the model, steady-state elsewhere)"""
+    _, es = model.steady_state()
+    return _path(model, model.exogenous, T, es)
+
+
+def stacked_residuals(model, Y, E, params=None):
+    """
+    Residuals of the dynamic equations for t=1..T.
+
+    Args:
+        Y: (T+2, n) array with endogenous variables at dates 0..T+1
+        E: (T+2, m) array with exogenous variables at dates 0..T+1
+
+    Returns:
+        A (T, neq) array.
+    """
+    return model.compiled.batch(Y[2:].T, Y[1:-1].T, Y[:-2].T, E[1:-1].T, params).T
+
+
+def stacked_values(jac, Y, E, params=None, r=None, values=None):
+    """
+    Residuals and nonzeros of the jacobian for t=1..T, evaluated in one call of the refill kernel of
+    a `SparseJacobian` (with arrays of shape (T,) as inputs).
+
+    Returns (r, values) with shapes (neq, T) and (nnz, T): row k of `values` is the nonzero k of
+    `jac.pattern` at each date. Preallocated `r` and `values` are refilled.
+    """
+    T = Y.shape[0] - 2
+    if params is None:
+        params = jac.compiled.parameter_values
+    if r is None:
+        r = np.zeros((jac.pattern.shape[0], T))
+    if values is None:
+        # entries of the pattern which are not symbolic nonzeros remain 0
+        values = np.zeros((jac.pattern.nnz, T))
+    jac.function(Y[2:].T, Y[1:-1].T, Y[:-2].T, E[1:-1].T, params, r, values)
+    return r, values
+
+
+def stacked_jacobian_blocks(model, Y, E, params=None):
+    """Jacobian blocks (A_t, B_t, C_t) for t=1..T, as (T, neq, n) arrays"""
+    jac = model.sparse_jacobian()
+    pattern = jac.pattern
+    _, values = stacked_values(jac, Y, E, params)
+    n = len(model.endogenous)
+    rows, cols = pattern.rows, pattern.indices
+    k = np.flatnonzero(cols < 3 * n)
+    blocks = np.zeros((3, Y.shape[0] - 2, pattern.shape[0], n))
+    blocks[cols[k] // n, :, rows[k], cols[k] % n] = values[k]
+    return blocks[0], blocks[1], blocks[2]
+
+
+class StackedJacobian:
+    """
+    Residuals and sparse jacobian of the stacked system for t=1..T, w.r.t. y_1..y_T.
+
+    The stacked matrix is block-tridiagonal: row block t has the derivatives w.r.t. y_{t-1}, y_t and
+    y_{t+1}. Its CSR structure is derived once from the sparsity pattern of the model (`Model.sparsity`),
+    and calls refill its data array from `stacked_values`: no dense block is formed, memory is linear
+    in T times the number of nonzeros of the model.
+    """
+
+    def __init__(self, model, T: int):
+
+        self.jac = jac = model.sparse_jacobian()
+        pattern = jac.pattern
+        neq, n = pattern.shape[0], len(model.endogenous)
+        self.T = T
+        self.shape = (T * neq, T * n)
+
+        # nonzeros w.r.t. the endogenous variables at t+1, t and t-1, for each date
+        rows, cols = pattern.rows, pattern.indices
+        k = np.flatnonzero(cols < 3 * n)
+        t = np.repeat(np.arange(T), len(k))
+        k = np.tile(k, T)
+        shift = 1 - cols[k] // n
+        valid = (t + shift >= 0) & (t + shift < T)
+        t, k, shift = t[valid], k[valid], shift[valid]
+        stacked_rows = t * neq + rows[k]
+        stacked_cols = (t + shift) * n + cols[k] % n
+        order = np.lexsort((stacked_cols, stacked_rows))
+
+        # position of each entry of the stacked matrix in the (nnz, T) array of `stacked_values`
+        self.source = (k * T + t)[order]
+        indptr = np.zeros(self.shape[0] + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(stacked_rows, minlength=self.shape[0]))
+        self.matrix = csr_matrix(np.zeros(len(order)), stacked_cols[order], indptr, self.shape)
+        self.data = self.matrix.data
+
+        self.r = np.zeros((neq, T))
+        self.values = np.zeros((pattern.nnz, T))
+
+    def __call__(self, Y, E, params=None):
+        """Refills and returns (residuals, matrix), with residuals of shape (T, neq)"""
+        stacked_values(self.jac, Y, E, params, r=self.r, values=self.values)
+        np.take(self.values, self.source, out=self.data)
+        return self.r.T, self.matrix
+
+    def __repr__(self):
+        return f"StackedJacobian(T={self.T}, shape={self.shape}, nnz={len(self.data)})"
+
+
+def stacked_jacobian(A, B, C, format="csc"):
+    """
+    Assemble the block-tridiagonal jacobian of the stacked system, w.r.t. y_1..y_T.
+
+    Row block t contains C_t (column block t-1), B_t (column block t) and A_t (column block t+1).
+    Only nonzero entries are stored.
+    """
+    T, neq, n = B.shape
+    rows, cols, data = [], [], []
+    for M, offset, tt in ((C, -1, slice(1, T)), (B, 0, slice(0, T)), (A, 1, slice(0, T - 1))):
+        t, i, j = np.nonzero(M[tt])
+        t = t + tt.start
+        rows.append(t * neq + i)
+        cols.append((t + offset) * n + j)
+        data.append(M[t, i, j])
+    return sparse_matrix(
+        np.concatenate(rows), np.concatenate(cols), np.concatenate(data),
+        (T * neq, T * n), format=format
+    )
+
+
+def solve_block_tridiagonal(A, B, C, r):
+    """
+    Solve C_t x_{t-1} + B_t x_t + A_t x_{t+1} = r_t for t=1..T (with x_0 = x_{T+1} = 0)
+    by block elimination. Memory and time are linear in T.
+    """
+    T = B.shape[0]
+    S = np.empty_like(B)
+    g = np.empty_like(r)
+    S[0] = B[0]
+    g[0] = r[0]
+    for t in range(1, T):
+        L = np.linalg.solve(S[t - 1].T, C[t].T).T  # C_t S_{t-1}^{-1}
+        S[t] = B[t] - L @ A[t - 1]
+        g[t] = r[t] - L @ g[t - 1]
+    x = np.empty_like(r)
+    x[T - 1] = np.linalg.solve(S[T - 1], g[T - 1])
+    for t in range(T - 2, -1, -1):
+        x[t] = np.linalg.solve(S[t], g[t] - A[t] @ x[t + 1])
+    return x
+
+
+def solve_perfect_foresight(model, T=None, steady_state=None, guess=None, params=None,
+                            method="sparse", tol=1e-10, maxit=50, verbose=False) -> PerfectForesightResult:
+    """
+    Solve for the perfect-foresight transition path of a model with a stacked Newton method.
+
+    Dynamic equations are stacked for t=1..T. Initial values y_0 are taken from the values
+    defined in the model (e.g. `k[0] <- ...`) and default to the steady-state. Terminal values
+    y_{T+1} are set to the steady-state. Exogenous shocks are taken from the values defined
+    in the model (e.g. `∀ t, 0 <= t < 10 : e[t] <- ...`) and are at their steady-state otherwise.
+
+    Args:
+        model: a `Model`
+        T: horizon (defaults to the constant `T` of the model)
+        steady_state: steady-state of the endogenous variables (defaults to the calibrated one)
+        guess: (T, n) initial guess for y_1..y_T (defaults to the steady-state)
+        method: "sparse" (sparse LU from scipy, the default when available) or "block"
+            (block-tridiagonal elimination)
+
+    Returns:
+        A `PerfectForesightResult` with the (T+2, n) paths for dates 0..T+1. When the stacked jacobian
+        is singular or the line search finds no step decreasing the residuals, iterations stop at
+        the last iterate and `success` is False.
+    """
+
+    t_start = time.perf_counter()
+    timings = {'residuals': 0.0, 'jacobian': 0.0, 'linear_solve': 0.0}
+
+    if T is None:
+        if 'T' not in model.constants:
+            raise ValueError("Horizon T is neither given nor defined in the model.")
+        T = int(model.constants['T'])
+
+    if method == "sparse":
+        try:
+            from scipy.sparse.linalg import spsolve, MatrixRankWarning
+        except ImportError:
+            method = "block"
+    if method not in ("sparse", "block"):
+        raise ValueError(f"Unknown method: {method}")
+
+    n = len(model.endogenous)
+    ys, _ = model.steady_state()
+    if steady_state is not None:
+        ys = np.asarray(steady_state, dtype=float)
+
+    Y = _path(model, model.endogenous, T, ys)
+    Y[T + 1] = ys
+    if guess is not None:
+        Y[1:T + 1] = guess
+    E = exogenous_path(model, T)
+
+    def residuals(Y):
+        t = time.perf_counter()
+        r = stacked_residuals(model, Y, E, params)
+        timings['residuals'] += time.perf_counter() - t
+        return r
+
+    success = False
+    it = 0
+    r = residuals(Y)
+    if r.shape[1] != n:
+        raise ValueError(f"Number of equations ({r.shape[1]}) differs from number of endogenous variables ({n}).")
+    if method == "sparse":
+        stacked = StackedJacobian(model, T)
+
+    for it in range(1, maxit + 1):
+
+        err = np.max(np.abs(r))
+        if verbose:
+            print(f"Iteration {it}: |r| = {err:.3e}")
+        if err < tol:
+            success = True
+            it -= 1
+            break
+
+        t = time.perf_counter()
+        if method == "sparse":
+            _, J = stacked(Y, E, params)
+        else:
+            A, B, C = stacked_jacobian_blocks(model, Y, E, params)
+        timings['jacobian'] += time.perf_counter() - t
+
+        t = time.perf_counter()
+        try:
+            if method == "sparse":
+                with warnings.catch_warnings():
+                    # a singular matrix is reported below (the solution is not finite)
+                    warnings.simplefilter("ignore", MatrixRankWarning)
+                    dY = -spsolve(J, r.ravel()).reshape((T, n))
+            else:
+                dY = -solve_block_tridiagonal(A, B, C, r)
+        except np.linalg.LinAlgError:
+            dY = None
+        finally:
+            timings['linear_solve'] += time.perf_counter() - t
+        if dY is None or not np.all(np.isfinite(dY)):
+            # singular jacobian: stop at the current iterate
+            break
+
+        # backtracking line search on the residual norm
+        norm0 = np.linalg.norm(r)
+        step = 1.0
+        while step >= 1e-10:
+            Y_new = Y.copy()
+            Y_new[1:T + 1] += step * dY
+            try:
+                with np.errstate(all='ignore'):
+                    r_new = residuals(Y_new)
+            except (ValueError, ArithmeticError):
+                # outside the domain of the equations
+                r_new = None
+            if r_new is not None and np.all(np.isfinite(r_new)) and np.linalg.norm(r_new) <= (1 - 1e-4 * step) * norm0:
+                break
+            step /= 2
+        else:
+            # no step decreases the residuals: stop at the current iterate
+            break
+        Y, r = Y_new, r_new
+
+    else:
+        success = np.max(np.abs(r)) < tol
+
+    timings['total'] = time.perf_counter() - t_start
+
+    return PerfectForesightResult(Y, E, model.endogenous, bool(success), it, r, timings)
@@ -0,0 +1,201 @@
+import time
+import numpy as np
+from collections import OrderedDict
+
+from .steady_state import solve_steady_state
+
+
+# maximum number of cached solutions per model
+CACHE_SIZE = 128
+
+
+class BlanchardKahnError(Exception):
+
+    def __init__(self, msg, solution=None):
+        self.msg = msg
+        self.solution = solution
+
+    def __str__(self):
+        return self.msg
+
+
+class PerturbationSolution:
+    """
+    First-order solution `y_t - ȳ = X (y_{t-1} - ȳ) + Y (e_t - ē)`.
+    """
+
+    def __init__(self, X, Y, steady_state, names, exogenous, method, bk, info, timings):
+        self.X = X
+        self.Y = Y
+        self.steady_state = steady_state
+        self.names = names
+        self.exogenous = exogenous
+        self.method = method
+        self.bk = bk
+        self.info = info
+        self.timings = timings
+
+    def __repr__(self):
+        return (
+            f"PerturbationSolution(method={self.method}, bk={self.bk}, "
+            f"spectral_radius={self.info.get('spectral_radius', np.nan):.4f})"
+        )
+
+
+def cyclic_reduction(A0, A1, A2, tol=1e-12, maxit=100):
+    """
+    Minimal solvent of the matrix quadratic equation A0 + A1 X + A2 X^2 = 0 by cyclic reduction.
+
+    Returns (X, iterations, converged).
+    """
+    A0 = A0.copy()
+    A1 = A1.copy()
+    A2 = A2.copy()
+    Ahat = A1.copy()
+    A0_orig = A0
+    converged = False
+    for it in range(1, maxit + 1):
+        K = np.linalg.solve(A1, np.hstack([A0, A2]))
+        KA0 = K[:, :A0.shape[1]]
+        KA2 = K[:, A0.shape[1]:]
+        A1 = A1 - A0 @ KA2 - A2 @ KA0
+        Ahat = Ahat - A2 @ KA0
+        A0, A2 = -A0 @ KA0, -A2 @ KA2
+        if not np.all(np.isfinite(A1)):
+            break
+        if np.max(np.abs(A0)) < tol or np.max(np.abs(A2)) < tol:
+            converged = True
+            break
+    X = -np.linalg.solve(Ahat, A0_orig)
+    return X, it, converged
+
+
+def _solve_cr(A, B, C, tol, maxit):
+
+    info = {}
+    X, it, converged = cyclic_reduction(C, B, A, tol=tol, maxit=maxit)
+    info['iterations'] = it
+    rho = max(abs(np.linalg.eigvals(X))) if X.size else 0.0
+    info['spectral_radius'] = rho
+    # the minimal solvent of the reversed equation has the inverses of the unstable roots as eigenvalues
+    with np.errstate(all='ignore'):
+        try:
+            Z, _, converged_z = cyclic_reduction(A, B, C, tol=tol, maxit=maxit)
+            rho_z = max(abs(np.linalg.eigvals(Z))) if Z.size else 0.0
+        except np.linalg.LinAlgError:
+            converged_z, rho_z = False, np.nan
+    info['spectral_radius_reversed'] = rho_z
+    bk = bool(converged and converged_z and rho < 1 and rho_z < 1)
+    if not converged:
+        info['message'] = "Cyclic reduction did not converge (no stable solution)."
+    elif not (converged_z and rho_z < 1):
+        info['message'] = "Blanchard-Kahn conditions not met: indeterminacy (too many stable roots)."
+    elif rho >= 1:
+        info['message'] = "Blanchard-Kahn conditions not met: no stable solution."
+    return X, bk, info
+
+
+def _solve_qz(A, B, C):
+
+    from scipy.linalg import ordqz
+
+    n = B.shape[0]
+    I = np.eye(n)
+    O = np.zeros((n, n))
+    # [A 0; 0 I] z_{t+1} = [-B -C; I 0] z_t with z_t = (y_t, y_{t-1})
+    F = np.block([[A, O], [O, I]])
+    G = np.block([[-B, -C], [I, O]])
+    AA, BB, alpha, beta, Q, Z = ordqz(G, F, sort='iuc', output='complex')
+    with np.errstate(all='ignore'):
+        eigenvalues = np.where(np.abs(beta) > 0, np.abs(alpha) / np.abs(beta), np.inf)
+    eigenvalues = np.sort(eigenvalues)
+    nstable = int(np.sum(eigenvalues < 1))
+    info = {'eigenvalues': eigenvalues, 'nstable': nstable}
+    bk = nstable == n
+    if nstable > n:
+        info['message'] = f"Blanchard-Kahn conditions not met: indeterminacy ({nstable} stable roots for {n} variables)."
+    elif nstable < n:
+        info['message'] = f"Blanchard-Kahn conditions not met: no stable solution ({nstable} stable roots for {n} variables)."
+    Z11 = Z[:n, :n]
+    Z21 = Z[n:, :n]
+    X = np.real(Z11 @ np.linalg.inv(Z21))
+    info['spectral_radius'] = eigenvalues[n - 1] if n > 0 else 0.0
+    return X, bk, info
+
+
+def solve_perturbation(model, params=None, steady_state=None, method="cr", check=True,
+                       tol=1e-12, maxit=100, cache=True) -> PerturbationSolution:
+    """
+    Compute the first-order solution `y_t = X y_{t-1} + Y e_t` (in deviations from the steady-state).
+
+    The model is linearized as A y_{t+1} + B y_t + C y_{t-1} + D e_t = 0. X solves A X² + B X + C = 0
+    and Y = -(A X + B)^{-1} D.
+
+    Args:
+        model: a `Model`
+        params: parameter vector (defaults to the calibrated parameters)
+        steady_state: steady-state of the endogenous variables (by default, solved with `solve_steady_state`)
+        method: "cr" (cyclic reduction, numpy only) or "qz" (generalized Schur decomposition, requires scipy)
+        check: if True, raises `BlanchardKahnError` when the Blanchard-Kahn conditions are not met
+        cache: if True, solutions are cached per (parameter vector, steady-state, method) on the model
+
+    Returns:
+        A `PerturbationSolution`.
+    """
+
+    if params is None:
+        params = model.parameters
+    params = np.asarray(params, dtype=float)
+
+    key = None
+    if cache:
+        ss_key = None if steady_state is None else np.asarray(steady_state, dtype=float).tobytes()
+        key = (params.tobytes(), ss_key, method)
+        solutions = model._cache.setdefault('perturbation', OrderedDict())
+        if key in solutions:
+            solutions.move_to_end(key)
+            sol = solutions[key]
+            if check and not sol.bk:
+                raise BlanchardKahnError(sol.info.get('message', "Blanchard-Kahn conditions not met."), sol)
+            return sol
+
+    t_start = time.perf_counter()
+    timings = {}
+
+    ys, es = model.steady_state()
+    if steady_state is None:
+        t = time.perf_counter()
+        sol_ss = solve_steady_state(model, params=params)
+        timings['steady_state'] = time.perf_counter() - t
+        if not sol_ss.success:
+            raise ValueError(f"Could not solve for the steady-state: {sol_ss}")
+        ys = sol_ss.x
+    else:
+        ys = np.asarray(steady_state, dtype=float)
+
+    t = time.perf_counter()
+    r, A, B, C, D = model.compiled.jacobians(ys, ys, ys, es, params)
+    timings['jacobian'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    if method == "cr":
+        X, bk, info = _solve_cr(A, B, C, tol, maxit)
+    elif method == "qz":
+        X, bk, info = _solve_qz(A, B, C)
+    else:
+        raise ValueError(f"Unknown method: {method}")
+    Y = -np.linalg.solve(A @ X + B, D)
+    timings['solve'] = time.perf_counter() - t
+    timings['total'] = time.perf_counter() - t_start
+
+    sol = PerturbationSolution(X, Y, (ys, es), model.endogenous, model.exogenous, method, bk, info, timings)
+
+    if cache:
+        solutions[key] = sol
+        while len(solutions) > CACHE_SIZE:
+            solutions.popitem(last=False)
+
+    if check and not bk:
+        raise BlanchardKahnError(info.get('message', "Blanchard-Kahn conditions not met."), sol)
+
+    return sol
@@ -0,0 +1,9 @@
+"""
+Stochastic processes defined in the calibration (e.g. `e[t] <- N(0, 0.01)`).
+"""
+
+
+class Normal:
+    def __init__(self, u,v):
+        self.mu = u
+        self.sigma = v
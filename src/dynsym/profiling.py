@@ -0,0 +1,153 @@
+"""
+Opt-in instrumentation of the evaluators.
+
+Instrumentation is installed on an evaluator instance (by shadowing its methods and functions),
+so that evaluators created without profiling run the original, untouched code.
+"""
+
+from time import perf_counter
+from typing import Dict
+
+from .autodiff import DNumber, DenseDNumber
+from .grammar import str_expression
+
+
+# grammar rules which are timed by an instrumented FormulaEvaluator
+RULES = [
+    'add', 'sub', 'mul', 'div', 'pow', 'neg', 'number',
+    'constant', 'value', 'variable', 'call',
+    'equality', 'assignment', 'quantified_assignment',
+]
+
+
+class Profile:
+    """
+    Call counts and cumulative (inclusive) times per grammar rule, per function and per equation,
+    and number/size of the dual numbers allocated.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.rules: Dict[str, Dict] = {}
+        self.functions: Dict[str, Dict] = {}
+        self.equations: Dict[int, Dict] = {}
+        self.duals = {'allocations': 0, 'derivatives': 0}
+
+    @staticmethod
+    def _record(table, key, dt):
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = {'calls': 0, 'time': 0.0}
+        entry['calls'] += 1
+        entry['time'] += dt
+        return entry
+
+    def record_rule(self, name, dt):
+        self._record(self.rules, name, dt)
+
+    def record_function(self, name, dt):
+        self._record(self.functions, name, dt)
+
+    def record_equation(self, i, dt, text=None):
+        entry = self._record(self.equations, i, dt)
+        if text is not None and 'equation' not in entry:
+            entry['equation'] = text
+
+    def record_result(self, result):
+        """Counts dual numbers (one is allocated per node evaluating to a dual number)"""
+        if isinstance(result, DNumber):
+            self.duals['allocations'] += 1
+            self.duals['derivatives'] += len(result.derivatives)
+        elif isinstance(result, DenseDNumber):
+            self.duals['allocations'] += 1
+            self.duals['derivatives'] += len(result.gradient)
+
+    def report(self) -> Dict:
+        """Structured report (entries sorted by decreasing cumulative time)"""
+        def _sorted(table):
+            return dict(sorted(table.items(), key=lambda kv: -kv[1]['time']))
+        return {
+            'rules': _sorted(self.rules),
+            'functions': _sorted(self.functions),
+            'equations': _sorted(self.equations),
+            'duals': dict(self.duals),
+        }
+
+    def __str__(self):
+        lines = []
+        report = self.report()
+        for section in ('rules', 'functions', 'equations'):
+            lines.append(f"{section}:")
+            for key, entry in report[section].items():
+                label = str(entry.get('equation', key))
+                if len(label) > 40:
+                    label = label[:37] + "..."
+                lines.append(f"  {label:<40} {entry['calls']:>10} calls {entry['time']*1000:>12.3f} ms")
+        lines.append(f"dual numbers: {self.duals['allocations']} allocations, {self.duals['derivatives']} derivatives")
+        return "\n".join(lines)
+
+
+def _timed_rule(method, name, profile):
+    def wrapper(tree):
+        t0 = perf_counter()
+        result = method(tree)
+        profile.record_rule(name, perf_counter() - t0)
+        profile.record_result(result)
+        return result
+    return wrapper
+
+
+def _timed_equation(method, profile, equation_index):
+    def wrapper(tree):
+        t0 = perf_counter()
+        result = method(tree)
+        dt = perf_counter() - t0
+        profile.record_rule('equality', dt)
+        profile.record_result(result)
+        i = equation_index(tree)
+        if i is not None:
+            profile.record_equation(i, dt, text=str_expression(tree))
+        return result
+    return wrapper
+
+
+def timed_function(f, name, profile):
+    """Wraps a function to record its calls in `profile`"""
+    def wrapper(*args):
+        t0 = perf_counter()
+        result = f(*args)
+        profile.record_function(name, perf_counter() - t0)
+        return result
+    return wrapper
+
+
+def instrument(evaluator, profile: Profile = None) -> Profile:
+    """Installs profiling hooks on a FormulaEvaluator instance. Returns the `Profile` filled by the hooks."""
+
+    if profile is None:
+        profile = Profile()
+
+    positions = {}
+
+    def equation_index(tree):
+        if id(tree) not in positions:
+            positions.clear()
+            positions.update({id(eq): i for i, eq in enumerate(evaluator.equations)})
+            # equations evaluated after constant folding
+            positions.update({id(eq): i for i, eq in enumerate(evaluator.folded)})
+        return positions.get(id(tree))
+
+    for name in RULES:
+        method = getattr(evaluator, name)
+        if name == 'equality':
+            setattr(evaluator, name, _timed_equation(method, profile, equation_index))
+        else:
+            setattr(evaluator, name, _timed_rule(method, name, profile))
+
+    evaluator.function_table = {
+        k: timed_function(f, k, profile) for k, f in evaluator.function_table.items()
+    }
+
+    return profile
@@ -0,0 +1,243 @@
+"""
+Reverse-mode automatic differentiation.
+
+While equations are evaluated with `TapeVariable` inputs, every operation (arithmetic and the
+functions of `MATH_FUNCTIONS`) is recorded on a `Tape`, together with its local partial derivatives.
+A backward sweep over the tape gives vector-jacobian products (gradients of any linear combination
+of the outputs w.r.t. all the inputs) for the cost of a few evaluations, whatever the number of inputs.
+
+The tape only stores the structure of the computation (operations and operands): it can be replayed
+(`Tape.forward`) at another point with the same structure, without evaluating the equations again.
+"""
+
+import math
+import numpy as np
+from typing import Dict, List
+
+from .autodiff import MATH_FUNCTIONS
+
+
+def _sign(x):
+    return 1.0 if x >= 0 else -1.0
+
+
+# partial derivatives of the functions of MATH_FUNCTIONS, given the arguments and the value of the function
+PARTIALS = {
+    'sin': lambda x, f: (math.cos(x),),
+    'cos': lambda x, f: (-math.sin(x),),
+    'tan': lambda x, f: (1 + f * f,),
+    'exp': lambda x, f: (f,),
+    'log': lambda x, f: (1 / x,),
+    'sqrt': lambda x, f: (0.5 / f,),
+    'abs': lambda x, f: (_sign(x),),
+    'sinh': lambda x, f: (math.cosh(x),),
+    'cosh': lambda x, f: (math.sinh(x),),
+    'tanh': lambda x, f: (1 - f * f,),
+    'asin': lambda x, f: (1 / math.sqrt(1 - x * x),),
+    'acos': lambda x, f: (-1 / math.sqrt(1 - x * x),),
+    'atan': lambda x, f: (1 / (1 + x * x),),
+    'log10': lambda x, f: (1 / (x * math.log(10)),),
+    'log2': lambda x, f: (1 / (x * math.log(2)),),
+    'floor': lambda x, f: (0.0,),
+    'ceil': lambda x, f: (0.0,),
+    # same branches as autodiff.dmax and autodiff.dmin
+    'max': lambda x, y, f: (1.0, 0.0) if x >= y else (0.0, 1.0),
+    'min': lambda x, y, f: (1.0, 0.0) if x <= y else (0.0, 1.0),
+}
+
+
+class TapeVariable:
+    """A value computed by the operation `index` of `tape`"""
+
+    __slots__ = ('tape', 'index', 'value')
+
+    def __init__(self, tape, index, value):
+        self.tape = tape
+        self.index = index
+        self.value = value
+
+    def __add__(self, other):
+        return self.tape.operation('add', self, other)
+
+    def __radd__(self, other):
+        return self.tape.operation('add', other, self)
+
+    def __sub__(self, other):
+        return self.tape.operation('sub', self, other)
+
+    def __rsub__(self, other):
+        return self.tape.operation('sub', other, self)
+
+    def __mul__(self, other):
+        return self.tape.operation('mul', self, other)
+
+    def __rmul__(self, other):
+        return self.tape.operation('mul', other, self)
+
+    def __truediv__(self, other):
+        return self.tape.operation('div', self, other)
+
+    def __rtruediv__(self, other):
+        return self.tape.operation('div', other, self)
+
+    def __pow__(self, other):
+        return self.tape.operation('pow', self, other)
+
+    def __rpow__(self, other):
+        return self.tape.operation('pow', other, self)
+
+    def __neg__(self):
+        return self.tape.operation('neg', self)
+
+    def __repr__(self):
+        return f"TapeVariable(index={self.index}, value={self.value})"
+
+
+class Tape:
+    """
+    Record of a computation: operation k has kind `kinds[k]`, operands `args[k]` (indices of other
+    operations, or the function name followed by indices for calls), value `values[k]` and local partial
+    derivatives `partials[k]` w.r.t. its operands.
+
+    Inputs are created with `input` and outputs declared with `output`.
+    """
+
+    def __init__(self):
+        self.kinds: List[str] = []
+        self.args: List[tuple] = []
+        self.values: List[float] = []
+        self.partials: List[tuple] = []
+        self.inputs: Dict[int, int] = {}  # position in the input vector -> operation
+        self.outputs: List[int] = []
+        self.functions = {name: self._function(name) for name in MATH_FUNCTIONS}
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def _append(self, kind, args, value=None):
+        self.kinds.append(kind)
+        self.args.append(args)
+        self.values.append(value)
+        self.partials.append(())
+        return len(self.kinds) - 1
+
+    def input(self, value, position=None) -> TapeVariable:
+        """A new input (at `position` in the input vector, by default after the last one)"""
+        if position is None:
+            position = len(self.inputs)
+        k = self._append('input', (position,), value)
+        self.inputs[position] = k
+        return TapeVariable(self, k, value)
+
+    def constant(self, value) -> int:
+        return self._append('const', (), value)
+
+    def _node(self, x) -> int:
+        if isinstance(x, TapeVariable):
+            if x.tape is not self:
+                raise ValueError("Variables from different tapes can't be combined.")
+            return x.index
+        return self.constant(x)
+
+    def operation(self, kind, *operands) -> TapeVariable:
+        k = self._append(kind, tuple(self._node(x) for x in operands))
+        self._eval(k)
+        return TapeVariable(self, k, self.values[k])
+
+    def call(self, name, *operands) -> TapeVariable:
+        k = self._append('call', (name, *[self._node(x) for x in operands]))
+        self._eval(k)
+        return TapeVariable(self, k, self.values[k])
+
+    def _function(self, name):
+        f = MATH_FUNCTIONS[name]
+
+        def function(*args):
+            if any(isinstance(a, TapeVariable) for a in args):
+                if name == 'pow':
+                    return self.operation('pow', *args)
+                return self.call(name, *args)
+            return f(*args)
+        return function
+
+    def output(self, values) -> List[int]:
+        """Declares the outputs of the computation (constants are recorded as such)"""
+        self.outputs = [self._node(v) for v in values]
+        return self.outputs
+
+    def _eval(self, k):
+        """Computes the value and local partial derivatives of operation k from its operands"""
+        kind = self.kinds[k]
+        args = self.args[k]
+        v = self.values
+        if kind == 'add':
+            a, b = args
+            v[k] = v[a] + v[b]
+            self.partials[k] = (1.0, 1.0)
+        elif kind == 'sub':
+            a, b = args
+            v[k] = v[a] - v[b]
+            self.partials[k] = (1.0, -1.0)
+        elif kind == 'mul':
+            a, b = args
+            v[k] = v[a] * v[b]
+            self.partials[k] = (v[b], v[a])
+        elif kind == 'div':
+            a, b = args
+            v[k] = v[a] / v[b]
+            self.partials[k] = (1 / v[b], -v[k] / v[b])
+        elif kind == 'pow':
+            a, b = args
+            v[k] = v[a] ** v[b]
+            # the derivative w.r.t. a constant exponent is not needed (and undefined for a <= 0)
+            db = 0.0 if self.kinds[b] == 'const' else v[k] * math.log(v[a])
+            self.partials[k] = (v[b] * v[a] ** (v[b] - 1), db)
+        elif kind == 'neg':
+            v[k] = -v[args[0]]
+            self.partials[k] = (-1.0,)
+        elif kind == 'call':
+            name, *operands = args
+            x = [v[i] for i in operands]
+            v[k] = MATH_FUNCTIONS[name](*x)
+            self.partials[k] = PARTIALS[name](*x, v[k])
+
+    def forward(self, inputs) -> np.ndarray:
+        """Replays the tape with new input values. Returns the values of the outputs."""
+        for position, k in self.inputs.items():
+            self.values[k] = inputs[position]
+        for k, kind in enumerate(self.kinds):
+            if kind != 'input' and kind != 'const':
+                self._eval(k)
+        return np.array([self.values[k] for k in self.outputs], dtype=float)
+
+    def vjp(self, cotangent) -> np.ndarray:
+        """
+        Vector-jacobian product: gradient of sum_i cotangent[i]*output[i] w.r.t. the inputs
+        (at the point of the last recording or replay). Returns an array indexed by input position.
+        """
+        adjoint = [0.0] * len(self.kinds)
+        for k, w in zip(self.outputs, cotangent):
+            adjoint[k] += w
+        for k in range(len(self.kinds) - 1, -1, -1):
+            a = adjoint[k]
+            if a == 0.0:
+                continue
+            kind = self.kinds[k]
+            if kind == 'input' or kind == 'const':
+                continue
+            operands = self.args[k][1:] if kind == 'call' else self.args[k]
+            for i, p in zip(operands, self.partials[k]):
+                adjoint[i] += a * p
+        n = max(self.inputs) + 1 if self.inputs else 0
+        g = np.zeros(n)
+        for position, k in self.inputs.items():
+            g[position] = adjoint[k]
+        return g
+
+    def jacobian(self) -> np.ndarray:
+        """Full jacobian of the outputs w.r.t. the inputs (one backward sweep per output)"""
+        eye = np.eye(len(self.outputs))
+        return np.array([self.vjp(w) for w in eye]).reshape((len(self.outputs), -1))
+
+    def __repr__(self):
+        return f"Tape({len(self)} operations, {len(self.inputs)} inputs, {len(self.outputs)} outputs)"
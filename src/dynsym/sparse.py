@@ -0,0 +1,91 @@
+from typing import NamedTuple, Tuple
+import numpy as np
+
+
+class COOTriplets(NamedTuple):
+    """Sparse matrix in coordinate format (used when scipy is not available)"""
+
+    row: np.ndarray
+    col: np.ndarray
+    data: np.ndarray
+    shape: Tuple[int, int]
+
+    def toarray(self):
+        a = np.zeros(self.shape)
+        np.add.at(a, (self.row, self.col), self.data)
+        return a
+
+
+class CSRArrays(NamedTuple):
+    """Sparse matrix in compressed sparse row format (used when scipy is not available)"""
+
+    data: np.ndarray
+    indices: np.ndarray
+    indptr: np.ndarray
+    shape: Tuple[int, int]
+
+    def toarray(self):
+        a = np.zeros(self.shape)
+        rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+        a[rows, self.indices] = self.data
+        return a
+
+
+def csr_matrix(data, indices, indptr, shape):
+    """
+    A CSR matrix sharing the arrays `data`, `indices` and `indptr` (no copy), so that it can be
+    updated in place by writing into `data`.
+
+    Returns a scipy.sparse.csr_matrix, or `CSRArrays` if scipy is not installed.
+    """
+    try:
+        from scipy import sparse as sp
+    except ImportError:
+        return CSRArrays(data, indices, indptr, shape)
+    return sp.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+
+def sparse_matrix(row, col, data, shape, format="csr"):
+    """
+    Build a sparse matrix from coordinate triplets.
+
+    Returns a scipy.sparse matrix in the requested format ("csr", "csc" or "coo"),
+    or `COOTriplets` if scipy is not installed.
+    """
+    row = np.asarray(row, dtype=np.int64)
+    col = np.asarray(col, dtype=np.int64)
+    data = np.asarray(data, dtype=float)
+    try:
+        # imported here: scipy is optional and slow to import
+        from scipy import sparse as sp
+    except ImportError:
+        return COOTriplets(row, col, data, shape)
+    m = sp.coo_matrix((data, (row, col)), shape=shape)
+    return m.asformat(format)
+
+
+def sparse_blocks(derivatives, index, format="csr"):
+    """
+    Build the sparse A, B, C, D blocks from the derivatives of each residual.
+
+    Args:
+        derivatives: one dictionary {slot: value} per residual, with slots from `index`
+        index: the `VariableIndex` defining the slots
+
+    Cost is proportional to the number of nonzero derivatives.
+    """
+    n = len(index.endogenous)
+    neq = len(derivatives)
+    triplets = [([], [], []) for _ in range(4)]
+    for i, d in enumerate(derivatives):
+        for slot, v in d.items():
+            k, j = divmod(slot, n) if (n > 0 and slot < 3 * n) else (3, slot - 3 * n)
+            rows, cols, vals = triplets[k]
+            rows.append(i)
+            cols.append(j)
+            vals.append(v)
+    shapes = [(neq, n)] * 3 + [(neq, len(index.exogenous))]
+    return tuple(
+        sparse_matrix(rows, cols, vals, shape, format=format)
+        for (rows, cols, vals), shape in zip(triplets, shapes)
+    )
@@ -0,0 +1,216 @@
+"""
+Static sparsity analysis.
+
+The incidence of the variables (`name[t+shift]`) in each equation is read from the equation trees
+once. It gives the (structural) sparsity pattern of the jacobian, with columns ordered as the slots
+of a `VariableIndex`: [endogenous at t+1, at t, at t-1, exogenous]. `SparseJacobian` (compiled symbolic
+derivatives) and `CompressedJacobian` (column-colored forward mode) evaluate the jacobian into a
+preallocated CSR matrix with this fixed pattern.
+"""
+
+import numpy as np
+from typing import List, Set, Tuple, TYPE_CHECKING
+
+from .autodiff import MATH_FUNCTIONS, DERIVATIVE_FUNCTIONS, VariableIndex, DenseDNumber
+from .sparse import csr_matrix
+
+if TYPE_CHECKING:
+    from lark.tree import Tree
+
+
+def incidence(equation: "Tree") -> Set[Tuple[str, int]]:
+    """Variables (name, shift) appearing in an equation (steady-state values name[~] excluded)"""
+    variables = set()
+    for node in equation.iter_subtrees():
+        if node.data == 'variable' and str(node.children[1].children[0]) != '~':
+            variables.add((str(node.children[0].children[0]), int(node.children[2].children[0])))
+    return variables
+
+
+class SparsityPattern:
+    """
+    Structural nonzeros of the jacobian of a list of equations, in CSR form (`indptr`, `indices`,
+    column indices sorted within each row).
+    """
+
+    def __init__(self, equations: List["Tree"], index: VariableIndex):
+
+        self.index = index
+        self.shape = (len(equations), index.size)
+        rows = []
+        for eq in equations:
+            slots = sorted(index.slots[v] for v in incidence(eq) if v in index.slots)
+            rows.append(slots)
+        self.indptr = np.zeros(len(rows) + 1, dtype=np.int32)
+        self.indptr[1:] = np.cumsum([len(r) for r in rows])
+        self.indices = np.array([j for r in rows for j in r], dtype=np.int32)
+
+    @classmethod
+    def from_csr(cls, indptr, indices, index: VariableIndex) -> "SparsityPattern":
+        """Pattern with given CSR arrays (e.g. saved by `dynsym.save_compiled`)"""
+        pattern = cls.__new__(cls)
+        pattern.index = index
+        pattern.shape = (len(indptr) - 1, index.size)
+        pattern.indptr = np.asarray(indptr, dtype=np.int32)
+        pattern.indices = np.asarray(indices, dtype=np.int32)
+        return pattern
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    @property
+    def rows(self) -> np.ndarray:
+        """Row of each nonzero"""
+        return np.repeat(np.arange(self.shape[0], dtype=np.int32), np.diff(self.indptr))
+
+    def position(self, row: int, col: int) -> int:
+        """Position of entry (row, col) in the CSR data array"""
+        a, b = self.indptr[row], self.indptr[row + 1]
+        k = a + int(np.searchsorted(self.indices[a:b], col))
+        if k >= b or self.indices[k] != col:
+            raise KeyError((row, col))
+        return k
+
+    def todense(self) -> np.ndarray:
+        """Boolean incidence matrix"""
+        m = np.zeros(self.shape, dtype=bool)
+        m[self.rows, self.indices] = True
+        return m
+
+    def __repr__(self):
+        return f"SparsityPattern(shape={self.shape}, nnz={self.nnz})"
+
+
+class SparseJacobian:
+    """
+    Residuals and jacobian evaluated into preallocated arrays.
+
+    The compiled kernel writes each residual into `self.residuals` and each symbolic nonzero
+    directly at its (fixed) position in `self.data`, the data array of the CSR matrix `self.matrix`.
+    Calls allocate no arrays: they return the same `residuals` and `matrix` objects, refilled.
+
+    The kernel is generated from `compiled.symbolic`, unless its `source` (and possibly the
+    compiled `function`) are given, e.g. when loading a saved model.
+    """
+
+    def __init__(self, compiled, pattern: SparsityPattern, source: str = None, function=None):
+
+        self.compiled = compiled
+        self.pattern = pattern
+        if source is None:
+            jac = compiled.symbolic
+            dag = jac.dag
+            outputs = [(f"r[{i}]", root) for i, root in enumerate(dag.roots)]
+            for row, col, node in zip(jac.rows, jac.cols, jac.nodes):
+                outputs.append((f"data[{pattern.position(int(row), int(col))}]", node))
+            source = dag.fill_source("jacobian_fill", outputs)
+        self.source = source
+        if function is None:
+            namespace = {**MATH_FUNCTIONS, **DERIVATIVE_FUNCTIONS}
+            exec(compile(self.source, "<dynsym-sparse-jacobian>", "exec"), namespace)
+            function = namespace["jacobian_fill"]
+        self.function = function
+
+        self.residuals = np.zeros(pattern.shape[0])
+        # entries of the pattern which are not symbolic nonzeros remain 0
+        self.matrix = csr_matrix(np.zeros(pattern.nnz), pattern.indices, pattern.indptr, pattern.shape)
+        self.data = self.matrix.data
+
+    def __call__(self, y_lead, y, y_lag, e, params=None):
+        """Refills and returns (residuals, matrix)"""
+        if params is None:
+            params = self.compiled.parameter_values
+        self.function(y_lead, y, y_lag, e, params, self.residuals, self.data)
+        return self.residuals, self.matrix
+
+    def __repr__(self):
+        return f"SparseJacobian(shape={self.pattern.shape}, nnz={self.pattern.nnz})"
+
+
+def color_columns(pattern: SparsityPattern) -> Tuple[np.ndarray, int]:
+    """
+    Greedy coloring of the columns of a sparsity pattern: columns with the same color have no
+    nonzero in a common row (structurally orthogonal), so their derivatives can be computed
+    along one seed direction.
+
+    Columns are colored by decreasing number of nonzeros. Returns (colors, ncolors).
+    """
+    nrows, ncols = pattern.shape
+    rows = pattern.rows
+    # rows of each column (CSC view of the pattern)
+    order = np.argsort(pattern.indices, kind='stable')
+    col_ptr = np.zeros(ncols + 1, dtype=np.int64)
+    col_ptr[1:] = np.cumsum(np.bincount(pattern.indices, minlength=ncols))
+    col_rows = rows[order]
+
+    colors = np.full(ncols, -1, dtype=np.int64)
+    # colors already used in each row
+    used = [set() for _ in range(nrows)]
+    for j in sorted(range(ncols), key=lambda j: col_ptr[j] - col_ptr[j + 1]):
+        rj = col_rows[col_ptr[j]:col_ptr[j + 1]]
+        if len(rj) == 0:
+            continue
+        forbidden = set().union(*[used[i] for i in rj])
+        c = 0
+        while c in forbidden:
+            c += 1
+        colors[j] = c
+        for i in rj:
+            used[i].add(c)
+    ncolors = int(colors.max()) + 1 if (colors >= 0).any() else 0
+    # columns without nonzeros don't need a seed
+    colors[colors < 0] = 0
+    return colors, ncolors
+
+
+class CompressedJacobian:
+    """
+    Compressed forward-mode jacobian.
+
+    The columns of the sparsity pattern are colored (`color_columns`) and each variable is seeded with
+    the unit direction of its color: equations are evaluated once with dense dual numbers carrying
+    `ncolors` directional derivatives (instead of one per variable), which are then decompressed into
+    the data array of a preallocated CSR matrix.
+    """
+
+    def __init__(self, compiled, pattern: SparsityPattern):
+
+        self.compiled = compiled
+        self.pattern = pattern
+        self.colors, self.ncolors = color_columns(pattern)
+        index = pattern.index
+        n = len(index.endogenous)
+        directions = np.eye(max(self.ncolors, 1))
+        seeds = [directions[c] for c in self.colors]
+        # seed directions of y_lead, y, y_lag and e
+        self.seeds = [seeds[k * n:(k + 1) * n] for k in range(3)] + [seeds[3 * n:]]
+
+        self.residuals = np.zeros(pattern.shape[0])
+        self.matrix = csr_matrix(np.zeros(pattern.nnz), pattern.indices, pattern.indptr, pattern.shape)
+        self.data = self.matrix.data
+        # position of each nonzero in the compressed jacobian (rows x colors)
+        self._rows = pattern.rows
+        self._colors = self.colors[pattern.indices]
+
+    def __call__(self, y_lead, y, y_lag, e, params=None):
+        """Refills and returns (residuals, matrix)"""
+        if params is None:
+            params = self.compiled.parameter_values
+        args = [
+            [DenseDNumber(v, g) for v, g in zip(x, seeds)]
+            for x, seeds in zip((y_lead, y, y_lag, e), self.seeds)
+        ]
+        res = self.compiled.function(*args, params)
+        G = np.zeros((len(res), max(self.ncolors, 1)))
+        for i, v in enumerate(res):
+            if isinstance(v, DenseDNumber):
+                self.residuals[i] = v.value
+                G[i] = v.gradient
+            else:
+                self.residuals[i] = v
+        self.data[:] = G[self._rows, self._colors]
+        return self.residuals, self.matrix
+
+    def __repr__(self):
+        return f"CompressedJacobian(shape={self.pattern.shape}, nnz={self.pattern.nnz}, ncolors={self.ncolors})"
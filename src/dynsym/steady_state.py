@@ -0,0 +1,142 @@
+import time
+import numpy as np
+from typing import Dict
+
+from .autodiff import DenseDNumber
+
+
+class SteadyStateResult:
+    """Result of `solve_steady_state`"""
+
+    def __init__(self, x, names, success, iterations, residuals, timings):
+        self.x = x
+        self.names = names
+        self.success = success
+        self.iterations = iterations
+        self.residuals = residuals
+        self.timings = timings
+
+    @property
+    def values(self) -> Dict[str, float]:
+        """Steady-state values by variable name"""
+        return {name: float(v) for name, v in zip(self.names, self.x)}
+
+    def __repr__(self):
+        status = "converged" if self.success else "failed"
+        return (
+            f"SteadyStateResult({status} in {self.iterations} iterations, "
+            f"|r|={np.max(np.abs(self.residuals)):.3e}, time={self.timings['total']:.4f}s)"
+        )
+
+
+def static_residuals(model, x, e, params=None, diff=False):
+    """
+    Residuals of the static system f(x, x, x, e) = 0.
+
+    With `diff=True` returns also the jacobian w.r.t. x (which is A+B+C), computed in forward mode.
+    """
+    compiled = model.compiled
+    if params is None:
+        params = compiled.parameter_values
+    if not diff:
+        return compiled(x, x, x, e, params)
+    n = len(x)
+    eye = np.eye(n)
+    xx = [DenseDNumber(x[i], eye[i]) for i in range(n)]
+    res = compiled.function(xx, xx, xx, e, params)
+    r = np.array([getattr(v, 'value', v) for v in res], dtype=float)
+    J = np.array([
+        v.gradient if isinstance(v, DenseDNumber) else np.zeros(n)
+        for v in res
+    ]).reshape((len(res), n))
+    return r, J
+
+
+def solve_steady_state(model, guess=None, params=None, exogenous=None, tol=1e-10, maxit=50,
+                       verbose=False) -> SteadyStateResult:
+    """
+    Solve for the deterministic steady-state of a model with a damped Newton method.
+
+    The jacobian is exact (forward-mode automatic differentiation of the compiled equations).
+
+    Args:
+        model: a `Model`
+        guess: initial guess for the endogenous variables (defaults to the calibrated steady-state)
+        params: parameter vector (defaults to the calibrated parameters)
+        exogenous: values of the exogenous variables (defaults to their calibrated steady-state)
+        tol: tolerance on the maximum absolute residual
+        maxit: maximum number of Newton iterations
+
+    Returns:
+        A `SteadyStateResult` with the solution, number of iterations and timings. When the jacobian
+        is singular or the line search finds no step decreasing the residuals, iterations stop at
+        the last iterate and `success` is False.
+    """
+
+    t_start = time.perf_counter()
+    timings = {'residuals': 0.0, 'jacobian': 0.0, 'linear_solve': 0.0}
+
+    ys, es = model.steady_state()
+    x = np.array(ys if guess is None else guess, dtype=float)
+    if len(x) != len(model.endogenous):
+        raise ValueError(f"Initial guess has size {len(x)}, expected {len(model.endogenous)}.")
+    if exogenous is not None:
+        es = np.asarray(exogenous, dtype=float)
+
+    def residuals(x):
+        t = time.perf_counter()
+        r = static_residuals(model, x, es, params)
+        timings['residuals'] += time.perf_counter() - t
+        return r
+
+    success = False
+    it = 0
+    r = residuals(x)
+    for it in range(1, maxit + 1):
+
+        err = np.max(np.abs(r))
+        if verbose:
+            print(f"Iteration {it}: |r| = {err:.3e}")
+        if err < tol:
+            success = True
+            it -= 1
+            break
+
+        t = time.perf_counter()
+        _, J = static_residuals(model, x, es, params, diff=True)
+        timings['jacobian'] += time.perf_counter() - t
+
+        t = time.perf_counter()
+        try:
+            dx = -np.linalg.solve(J, r)
+        except np.linalg.LinAlgError:
+            # singular jacobian: stop at the current iterate
+            break
+        finally:
+            timings['linear_solve'] += time.perf_counter() - t
+
+        # backtracking line search on the residual norm
+        norm0 = np.linalg.norm(r)
+        step = 1.0
+        while step >= 1e-10:
+            x_new = x + step * dx
+            try:
+                with np.errstate(all='ignore'):
+                    r_new = residuals(x_new)
+            except (ValueError, ArithmeticError):
+                # outside the domain of the equations (e.g. math.log of a negative number)
+                r_new = None
+            if r_new is not None and np.all(np.isfinite(r_new)) and np.linalg.norm(r_new) <= (1 - 1e-4 * step) * norm0:
+                break
+            step /= 2
+        else:
+            # no step decreases the residuals: stop at the current iterate
+            break
+        x, r = x_new, r_new
+
+    else:
+        success = np.max(np.abs(r)) < tol
+
+    timings['total'] = time.perf_counter() - t_start
+
+    return SteadyStateResult(x, model.endogenous, bool(success), it, r, timings)
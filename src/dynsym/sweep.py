@@ -0,0 +1,177 @@
+"""
+Parameter sweeps.
+
+Steady-states and jacobians are evaluated for many parameter vectors of the same model on a
+`concurrent.futures` process pool. The model is sent to each worker once (through the pool
+initializer) and rebuilt there from its parse tree; tasks only carry chunks of the parameter table.
+"""
+
+import os
+import math
+import time
+import pickle
+import numpy as np
+from typing import Dict, Union
+
+from .steady_state import solve_steady_state
+
+
+class SweepResult:
+    """
+    Results of `sweep`, stacked along the first axis (one entry per parameter vector, in the order of `params`).
+
+    `steady_state` has shape (N, n_endogenous), `residuals` (N, neq), `A`, `B`, `C` (N, neq, n_endogenous)
+    and `D` (N, neq, n_exogenous). `success` tells whether the steady-state solver converged.
+    """
+
+    def __init__(self, params, steady_state, success, residuals, A, B, C, D, timings):
+        self.params = params
+        self.steady_state = steady_state
+        self.success = success
+        self.residuals = residuals
+        self.A = A
+        self.B = B
+        self.C = C
+        self.D = D
+        self.timings = timings
+
+    def __len__(self):
+        return len(self.params)
+
+    def __repr__(self):
+        return (
+            f"SweepResult({len(self)} parameter vectors, {int(self.success.sum())} converged, "
+            f"time={self.timings['total']:.3f}s)"
+        )
+
+
+def parameter_table(model, params: Union[np.ndarray, Dict]) -> np.ndarray:
+    """
+    Parameter vectors as a (N, n_parameters) array.
+
+    `params` is either such an array (used as is), or a dictionary mapping some constants or steady-states
+    (e.g. "rho" or "k[~]") to arrays of shape (N,). Each row is then applied as `model.update` would
+    (on a copy of the model): definitions depending on the swept values (e.g. `beta <- 1/r`) are
+    recomputed, the others keep their calibrated value.
+    """
+    base = model.parameters
+    if isinstance(params, dict):
+        columns = {k: np.asarray(v, dtype=float) for k, v in params.items()}
+        sizes = {len(v) for v in columns.values()}
+        if len(sizes) != 1:
+            raise ValueError("All parameter columns must have the same length.")
+        graph = model.dependencies
+        defined = graph.definitions()
+        keys = set()
+        for name in columns:
+            key = ("steady_state", name[:-3]) if name.endswith("[~]") else ("constant", name)
+            if key not in defined:
+                raise ValueError(f"Unknown parameter: {name}")
+            keys.add(key)
+        _, changed = graph.downstream(keys)
+        if graph.affected_equations({key for key in changed if key[0] == "values"}):
+            # values are embedded in the compiled equations: they can't vary with the parameter vector
+            raise ValueError(f"Parameters {list(columns)} change values used in the equations: they can't be swept.")
+        scratch = pickle.loads(pickle.dumps(model))
+        table = np.empty((sizes.pop(), len(base)))
+        for k in range(len(table)):
+            scratch.update({name: float(v[k]) for name, v in columns.items()})
+            table[k] = scratch.parameters
+        return table
+    table = np.atleast_2d(np.asarray(params, dtype=float))
+    if table.shape[1] != len(base):
+        raise ValueError(f"Parameter vectors have size {table.shape[1]}, expected {len(base)}.")
+    return table
+
+
+def steady_state_slots(model):
+    """Positions of the steady-states `name[~]` of the endogenous and exogenous variables in the parameter vector"""
+    names = model.compiled.parameters
+    return (
+        np.array([names.index(f"{v}[~]") for v in model.endogenous], dtype=int),
+        np.array([names.index(f"{v}[~]") for v in model.exogenous], dtype=int),
+    )
+
+
+def evaluate_chunk(model, table: np.ndarray, steady_state: bool = True):
+    """
+    Steady-state and jacobians for each row of `table`. Returns a tuple of stacked arrays.
+
+    The steady-state values `name[~]` of the endogenous variables in each row are the initial guess
+    of the solver (or, with `steady_state=False`, the point where jacobians are evaluated). Those of
+    the exogenous variables are the values at which the steady-state is solved.
+    """
+    ys, es = model.steady_state()
+    slots_y, slots_e = steady_state_slots(model)
+    N = len(table)
+    n, neq, ne = len(ys), len(model.equations), len(es)
+    X = np.empty((N, n))
+    success = np.ones(N, dtype=bool)
+    R = np.empty((N, neq))
+    A, B, C = np.empty((N, neq, n)), np.empty((N, neq, n)), np.empty((N, neq, n))
+    D = np.empty((N, neq, ne))
+    for k, p in enumerate(table):
+        x, e = p[slots_y], p[slots_e]
+        if steady_state:
+            sol = solve_steady_state(model, guess=x, params=p, exogenous=e)
+            x, success[k] = sol.x, sol.success
+        X[k] = x
+        R[k], A[k], B[k], C[k], D[k] = model.compiled.jacobians(x, x, x, e, p)
+    return X, success, R, A, B, C, D
+
+
+# model of the current worker process (set by `_init_worker`)
+_worker_model = None
+
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+
+
+def _worker_chunk(table, steady_state):
+    return evaluate_chunk(_worker_model, table, steady_state)
+
+
+def sweep(model, params: Union[np.ndarray, Dict], steady_state: bool = True,
+          max_workers: int = None, chunksize: int = None) -> SweepResult:
+    """
+    Evaluate steady-states and jacobians (at the steady-state) for many parameter vectors.
+
+    Args:
+        model: a `Model`
+        params: a (N, n_parameters) array, or a dictionary {parameter name: array of shape (N,)}
+            (see `parameter_table`)
+        steady_state: if True, the steady-state is solved for each parameter vector. Otherwise
+            jacobians are evaluated at the calibrated steady-state.
+        max_workers: number of worker processes (defaults to the number of CPUs).
+            With `max_workers=0`, everything is computed in the current process.
+        chunksize: number of parameter vectors per task (defaults to about 4 tasks per worker)
+
+    Returns:
+        A `SweepResult`, ordered as `params` whatever the number of workers and the chunk size.
+    """
+
+    t_start = time.perf_counter()
+    table = parameter_table(model, params)
+    N = len(table)
+    if N == 0:
+        raise ValueError("Empty parameter table.")
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, math.ceil(N / (4 * max(max_workers, 1))))
+    chunks = [table[i:i + chunksize] for i in range(0, N, chunksize)]
+
+    if max_workers == 0:
+        results = [evaluate_chunk(model, chunk, steady_state) for chunk in chunks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        # the model is pickled once per worker, not once per task
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(model,)) as pool:
+            results = list(pool.map(_worker_chunk, chunks, [steady_state] * len(chunks)))
+
+    X, success, R, A, B, C, D = [np.concatenate(arrays) for arrays in zip(*results)]
+    timings = {'total': time.perf_counter() - t_start, 'tasks': len(chunks), 'workers': max_workers}
+    return SweepResult(table, X, success, R, A, B, C, D, timings)
@@ -0,0 +1,323 @@
+"""
+Symbolic differentiation.
+
+Derivatives are computed on the expression DAG of the equations (see `dynsym.dag`), in which each
+`variable` of the equation trees has been resolved to a slot (`y_lead[i]`, `y[i]`, `y_lag[i]`, `e[i]`).
+The derivative of every node is a sparse dictionary {gradient slot: node}, built with simplifying
+constructors (products by 0 or 1, sums with 0, operations on numbers are folded), so that only
+structural nonzeros remain. Derivative nodes are added to the same DAG as the residuals: the
+residuals and all nonzero derivatives are compiled together into one straight-line function.
+"""
+
+import math
+import numpy as np
+from typing import Dict, List
+
+from .autodiff import MATH_FUNCTIONS, DERIVATIVE_FUNCTIONS, VariableIndex
+from .dag import ExpressionDAG
+
+
+class Simplifier:
+    """Node constructors which simplify trivial operations"""
+
+    def __init__(self, dag: ExpressionDAG):
+        self.dag = dag
+        self.zero = dag.node("number", 0)
+        self.one = dag.node("number", 1)
+
+    def value(self, i):
+        """Numerical value of node i if it is a number, None otherwise"""
+        op, *args = self.dag.nodes[i]
+        return args[0] if op == "number" else None
+
+    def number(self, value):
+        return self.dag.node("number", value)
+
+    def add(self, a, b):
+        va, vb = self.value(a), self.value(b)
+        if va is not None and vb is not None:
+            return self.number(va + vb)
+        if va == 0:
+            return b
+        if vb == 0:
+            return a
+        return self.dag.node("add", a, b)
+
+    def sub(self, a, b):
+        va, vb = self.value(a), self.value(b)
+        if va is not None and vb is not None:
+            return self.number(va - vb)
+        if vb == 0:
+            return a
+        if va == 0:
+            return self.neg(b)
+        if a == b:
+            return self.zero
+        return self.dag.node("sub", a, b)
+
+    def mul(self, a, b):
+        va, vb = self.value(a), self.value(b)
+        if va is not None and vb is not None:
+            return self.number(va * vb)
+        if va == 0 or vb == 0:
+            return self.zero
+        if va == 1:
+            return b
+        if vb == 1:
+            return a
+        if va == -1:
+            return self.neg(b)
+        if vb == -1:
+            return self.neg(a)
+        return self.dag.node("mul", a, b)
+
+    def div(self, a, b):
+        va, vb = self.value(a), self.value(b)
+        if va is not None and vb is not None and vb != 0:
+            return self.number(va / vb)
+        if va == 0:
+            return self.zero
+        if vb == 1:
+            return a
+        return self.dag.node("div", a, b)
+
+    def pow(self, a, b):
+        va, vb = self.value(a), self.value(b)
+        if va is not None and vb is not None:
+            return self.number(va ** vb)
+        if vb == 0:
+            return self.one
+        if vb == 1:
+            return a
+        return self.dag.node("pow", a, b)
+
+    def neg(self, a):
+        va = self.value(a)
+        if va is not None:
+            return self.number(-va)
+        op, *args = self.dag.nodes[a]
+        if op == "neg":
+            return args[0]
+        return self.dag.node("neg", a)
+
+    def call(self, name, *args):
+        values = [self.value(a) for a in args]
+        if name in MATH_FUNCTIONS and all(v is not None for v in values):
+            return self.number(MATH_FUNCTIONS[name](*values))
+        return self.dag.node("call", name, *args)
+
+
+def derivatives(dag: ExpressionDAG, index: VariableIndex, roots: List[int] = None) -> Dict[int, Dict[int, int]]:
+    """
+    Symbolic derivatives of the nodes needed to compute `roots` (defaults to dag.roots).
+
+    Returns a dictionary {node: {gradient slot: derivative node}} containing only structural nonzeros.
+    New nodes are added to `dag`.
+    """
+
+    roots = dag.roots if roots is None else roots
+    s = Simplifier(dag)
+    n = len(index.endogenous)
+    offsets = {"y_lead": 0, "y": n, "y_lag": 2 * n, "e": 3 * n}
+
+    def combine(da, db, fa, fb):
+        """Derivative of an expression whose partial derivatives w.r.t. a and b are fa and fb"""
+        d = {}
+        for k in da.keys() | db.keys():
+            t = s.zero
+            if k in da:
+                t = s.add(t, s.mul(fa, da[k]))
+            if k in db:
+                t = s.add(t, s.mul(fb, db[k]))
+            if s.value(t) != 0:
+                d[k] = t
+        return d
+
+    def scale(da, f):
+        d = {}
+        for k, v in da.items():
+            t = s.mul(f, v)
+            if s.value(t) != 0:
+                d[k] = t
+        return d
+
+    D: Dict[int, Dict[int, int]] = {}
+    for i in dag.reachable(roots):
+        op, *args = dag.nodes[i]
+        if op in offsets:
+            D[i] = {offsets[op] + args[0]: s.one}
+        elif op in ("number", "params"):
+            D[i] = {}
+        elif op == "add":
+            D[i] = combine(D[args[0]], D[args[1]], s.one, s.one)
+        elif op == "sub":
+            D[i] = combine(D[args[0]], D[args[1]], s.one, s.number(-1))
+        elif op == "mul":
+            a, b = args
+            D[i] = combine(D[a], D[b], b, a)
+        elif op == "div":
+            # d(a/b) = da/b - (a/b) db/b
+            a, b = args
+            D[i] = combine(D[a], D[b], s.div(s.one, b), s.neg(s.div(i, b)))
+        elif op == "pow":
+            D[i] = _pow(s, i, args[0], args[1], D)
+        elif op == "neg":
+            D[i] = scale(D[args[0]], s.number(-1))
+        elif op == "call":
+            D[i] = _call(s, i, args[0], args[1:], D, combine, scale)
+        else:
+            raise ValueError(f"Unknown operation: {op}")
+    return D
+
+
+def _pow(s, i, a, b, D):
+    d = {}
+    vb = s.value(b)
+    for k in D[a].keys() | D[b].keys():
+        t = s.zero
+        if k in D[a]:
+            if vb is not None:
+                # b a^(b-1) da
+                fa = s.mul(b, s.pow(a, s.number(vb - 1)))
+            else:
+                fa = s.mul(b, s.div(i, a))
+            t = s.add(t, s.mul(fa, D[a][k]))
+        if k in D[b]:
+            t = s.add(t, s.mul(s.mul(i, s.call("log", a)), D[b][k]))
+        if s.value(t) != 0:
+            d[k] = t
+    return d
+
+
+def _call(s, i, name, args, D, combine, scale):
+
+    if name in ("max", "min"):
+        a, b = args
+        # same branch as autodiff.dmax/dmin when a == b
+        w = s.call("step", a, b) if name == "max" else s.call("step", b, a)
+        return combine(D[a], D[b], w, s.sub(s.one, w))
+
+    if name == "pow":
+        return _pow(s, i, args[0], args[1], D)
+
+    (a,) = args
+    if name == "exp":
+        f = i
+    elif name == "log":
+        f = s.div(s.one, a)
+    elif name == "sqrt":
+        f = s.div(s.number(0.5), i)
+    elif name == "sin":
+        f = s.call("cos", a)
+    elif name == "cos":
+        f = s.neg(s.call("sin", a))
+    elif name == "tan":
+        f = s.add(s.one, s.mul(i, i))
+    elif name == "sinh":
+        f = s.call("cosh", a)
+    elif name == "cosh":
+        f = s.call("sinh", a)
+    elif name == "tanh":
+        f = s.sub(s.one, s.mul(i, i))
+    elif name == "asin":
+        f = s.div(s.one, s.call("sqrt", s.sub(s.one, s.mul(a, a))))
+    elif name == "acos":
+        f = s.div(s.number(-1), s.call("sqrt", s.sub(s.one, s.mul(a, a))))
+    elif name == "atan":
+        f = s.div(s.one, s.add(s.one, s.mul(a, a)))
+    elif name == "log10":
+        f = s.div(s.one, s.mul(a, s.number(math.log(10))))
+    elif name == "log2":
+        f = s.div(s.one, s.mul(a, s.number(math.log(2))))
+    elif name == "abs":
+        f = s.call("sign", a)
+    elif name in ("floor", "ceil"):
+        f = s.zero
+    else:
+        raise ValueError(f"Cannot differentiate function: {name}")
+    return scale(D[a], f)
+
+
+class SymbolicJacobian:
+    """
+    Residuals and structural nonzeros of the jacobian, compiled to a single python function.
+
+    Nonzero k is the derivative of equation `rows[k]` w.r.t. the variable in gradient slot `cols[k]`
+    (slots are those of `VariableIndex`: [endogenous at t+1, at t, at t-1, exogenous]).
+    """
+
+    def __init__(self, source, function, rows, cols, shape, index, dag=None, nodes=None):
+        self.source = source
+        self.function = function
+        self.rows = rows
+        self.cols = cols
+        self.shape = shape
+        self.index = index
+        self.dag = dag
+        self.nodes = nodes
+        self._partial = {}
+
+    @property
+    def nnz(self):
+        return len(self.rows)
+
+    def __call__(self, y_lead, y, y_lag, e, params):
+        """Returns (r, values) with the residuals and the values of the nonzeros"""
+        out = self.function(y_lead, y, y_lag, e, params)
+        neq = self.shape[0]
+        return np.array(out[:neq], dtype=float), np.array(out[neq:], dtype=float)
+
+    def dense(self, y_lead, y, y_lag, e, params):
+        """Returns (r, J) where J is the dense (neq, index.size) jacobian"""
+        r, values = self(y_lead, y, y_lag, e, params)
+        J = np.zeros(self.shape)
+        J[self.rows, self.cols] = values
+        return r, J
+
+    def partial(self, rows):
+        """
+        Residuals and nonzeros of the equations `rows` only, compiled on first use for each set of rows.
+
+        Returns (function, nonzeros): `function(y_lead, y, y_lag, e, params)` returns the residuals
+        of `rows` followed by the values of the nonzeros with indices `nonzeros`.
+        """
+        rows = tuple(rows)
+        if rows not in self._partial:
+            nonzeros = np.flatnonzero(np.isin(self.rows, rows))
+            source = self.dag.source(
+                funname="jacobian", roots=[self.dag.roots[i] for i in rows] + [self.nodes[k] for k in nonzeros]
+            )
+            namespace = {**MATH_FUNCTIONS, **DERIVATIVE_FUNCTIONS}
+            exec(compile(source, "<dynsym-jacobian>", "exec"), namespace)
+            self._partial[rows] = (namespace["jacobian"], nonzeros)
+        return self._partial[rows]
+
+    def __repr__(self):
+        return f"SymbolicJacobian(shape={self.shape}, nnz={self.nnz})"
+
+
+def symbolic_jacobian(dag: ExpressionDAG, index: VariableIndex) -> SymbolicJacobian:
+    """Differentiate the roots of `dag` and compile residuals and nonzero derivatives together"""
+
+    D = derivatives(dag, index)
+    rows, cols, nodes = [], [], []
+    for eq, r in enumerate(dag.roots):
+        for slot, node in sorted(D[r].items()):
+            rows.append(eq)
+            cols.append(slot)
+            nodes.append(node)
+
+    source = dag.source(funname="jacobian", roots=dag.roots + nodes)
+    namespace = {**MATH_FUNCTIONS, **DERIVATIVE_FUNCTIONS}
+    exec(compile(source, "<dynsym-jacobian>", "exec"), namespace)
+
+    return SymbolicJacobian(
+        source,
+        namespace["jacobian"],
+        np.array(rows, dtype=int),
+        np.array(cols, dtype=int),
+        (len(dag.roots), index.size),
+        index,
+        dag=dag,
+        nodes=nodes,
+    )
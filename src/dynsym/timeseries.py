@@ -0,0 +1,131 @@
+"""
+Dense storage for the values of a symbol at consecutive dates.
+
+Values (`name[date] <- ...`) and initial conditions are stored as `TimeSeries`: lookups are a
+bounds check and an array access, and slices of dates are views of the storage.
+"""
+
+import numpy as np
+from collections.abc import Mapping
+
+
+class TimeSeries(Mapping):
+    """
+    Values of a symbol at dates `start, start+1, ..., stop-1`, stored in a float array `data`
+    (`data[i]` is the value at date `start + i`, NaN where it is undefined).
+
+    It behaves as a read-only dictionary {date: value} over the defined dates, so that it can be
+    used wherever values were stored as dictionaries.
+
+    A date can also hold an array of values (e.g. one per point of `FormulaEvaluator.evaluate_batch`):
+    such entries are kept in `batch` ({date: array}), are returned by date lookups and are not part
+    of `data` (nor of the slices returned by `at`).
+    """
+
+    __slots__ = ('data', 'start', 'batch')
+
+    def __init__(self, data=(), start: int = 0):
+        self.data = np.asarray(data, dtype=float)
+        self.start = int(start)
+        self.batch = None
+
+    @classmethod
+    def from_dict(cls, values) -> "TimeSeries":
+        if isinstance(values, TimeSeries):
+            return values
+        if not values:
+            return cls()
+        start = min(values)
+        data = np.full(max(values) - start + 1, np.nan)
+        for t, v in values.items():
+            data[t - start] = v
+        return cls(data, start)
+
+    @property
+    def stop(self) -> int:
+        return self.start + len(self.data)
+
+    def __getitem__(self, t):
+        if isinstance(t, slice):
+            if t.step is not None:
+                raise ValueError("TimeSeries slices can't have a step.")
+            start = self.start if t.start is None else t.start
+            stop = self.stop if t.stop is None else t.stop
+            return TimeSeries(self.at(start, max(start, stop)), start)
+        if self.batch and t in self.batch:
+            return self.batch[t]
+        i = t - self.start
+        if 0 <= i < len(self.data):
+            v = self.data[i]
+            if not np.isnan(v):
+                return float(v)
+        raise KeyError(t)
+
+    @property
+    def defined(self) -> np.ndarray:
+        """Boolean mask of the dates with a value"""
+        return ~np.isnan(self.data)
+
+    def __iter__(self):
+        dates = (self.start + int(i) for i in np.flatnonzero(self.defined))
+        if not self.batch:
+            yield from dates
+            return
+        yield from sorted({*dates, *self.batch})
+
+    def __len__(self):
+        if self.batch:
+            return sum(1 for _ in self)
+        return int(np.count_nonzero(self.defined))
+
+    def __setitem__(self, t, value):
+        if np.ndim(value) > 0:
+            if self.batch is None:
+                self.batch = {}
+            self.batch[t] = np.asarray(value, dtype=float)
+            return
+        self.assign(t, [value])
+
+    def assign(self, start: int, values):
+        """Set the values at dates start, start+1, ... (the storage is extended if needed)"""
+        values = np.asarray(values, dtype=float)
+        stop = start + len(values)
+        if self.batch:
+            for t in [t for t in self.batch if start <= t < stop]:
+                del self.batch[t]
+        if len(self.data) == 0:
+            self.data, self.start = values.copy(), start
+            return
+        if start < self.start or stop > self.stop:
+            lo, hi = min(start, self.start), max(stop, self.stop)
+            # dates assigned one at a time: grow geometrically
+            if stop > self.stop and start >= self.start:
+                hi = max(hi, self.start + 2 * len(self.data))
+            data = np.full(hi - lo, np.nan)
+            data[self.start - lo:self.stop - lo] = self.data
+            self.data, self.start = data, lo
+        self.data[start - self.start:stop - self.start] = values
+
+    def at(self, start: int, stop: int) -> np.ndarray:
+        """
+        Values at dates start, ..., stop-1 (NaN where undefined).
+
+        This is a slice of the storage (a view, not a copy) when all dates are within it.
+        """
+        lo, hi = start - self.start, stop - self.start
+        if 0 <= lo and hi <= len(self.data):
+            return self.data[lo:hi]
+        out = np.full(stop - start, np.nan)
+        a, b = max(lo, 0), min(hi, len(self.data))
+        if a < b:
+            out[a - lo:b - lo] = self.data[a:b]
+        return out
+
+    def copy(self) -> "TimeSeries":
+        ts = TimeSeries(self.data.copy(), self.start)
+        if self.batch:
+            ts.batch = {t: v.copy() for t, v in self.batch.items()}
+        return ts
+
+    def __repr__(self):
+        return f"TimeSeries(start={self.start}, stop={self.stop}, defined={len(self)})"
@@ -0,0 +1,23 @@
+import os
+import shutil
+import tempfile
+
+# the parse and grammar caches of the test session don't go to the user cache directory
+# (set before collection, as some test modules build the parser when imported)
+_cache_dir = None
+_previous = None
+
+
+def pytest_configure(config):
+    global _cache_dir, _previous
+    _previous = os.environ.get("DYNSYM_CACHE_DIR")
+    _cache_dir = tempfile.mkdtemp(prefix="dynsym-cache-")
+    os.environ["DYNSYM_CACHE_DIR"] = _cache_dir
+
+
+def pytest_unconfigure(config):
+    if _previous is None:
+        os.environ.pop("DYNSYM_CACHE_DIR", None)
+    else:
+        os.environ["DYNSYM_CACHE_DIR"] = _previous
+    shutil.rmtree(_cache_dir, ignore_errors=True)
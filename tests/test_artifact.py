@@ -0,0 +1,80 @@
+import sys
+import numpy as np
+
+
+def test_save_compiled(tmp_path):
+
+    from dynsym import import_model, save_compiled, load_compiled
+
+    model = import_model("tests/rbc.dyno")
+    model.update(rho=0.9)
+    filename = str(tmp_path / "rbc.npz")
+    save_compiled(model, filename)
+
+    loaded = load_compiled(filename)
+    print(loaded)
+    assert loaded.endogenous == model.endogenous
+    assert loaded.exogenous == model.exogenous
+    assert loaded.constants == model.constants
+    assert loaded.constants["rho"] == 0.9
+    assert loaded.steady_states == model.steady_states
+    assert {k: (p.mu, p.sigma) for k, p in loaded.processes.items()} == \
+        {k: (p.mu, p.sigma) for k, p in model.processes.items()}
+    for name, ts in model.values.items():
+        assert loaded.values[name].start == ts.start
+        assert dict(loaded.values[name]) == dict(ts)
+    assert np.array_equal(loaded.sparsity.indptr, model.sparsity.indptr)
+    assert np.array_equal(loaded.sparsity.indices, model.sparsity.indices)
+    assert np.array_equal(loaded.parameters, model.parameters)
+
+    ys, es = model.steady_state()
+    y = ys * 1.01
+    assert np.allclose(loaded.residuals(y, ys, ys, es), model.residuals(y, ys, ys, es))
+    for a, b in zip(loaded.jacobians(y, ys, ys, es), model.jacobians(y, ys, ys, es)):
+        assert np.allclose(a, b)
+
+
+def test_load_compiled_other_python(tmp_path, monkeypatch):
+
+    import marshal
+    from dynsym import import_model, save_compiled, load_compiled
+
+    model = import_model("tests/neo.dyno")
+    filename = str(tmp_path / "neo.npz")
+    save_compiled(model, filename)
+
+    # code objects saved by another python version are not used: the kernels are compiled again
+    monkeypatch.setattr(sys.implementation, "cache_tag", "other-version")
+    monkeypatch.setattr(marshal, "loads", None)
+    loaded = load_compiled(filename)
+    assert np.allclose(loaded.jacobians()[2], model.jacobians()[2])
+
+
+LOAD_WITHOUT_LARK = """
+import sys
+
+class BlockLark:
+    def find_spec(self, name, path=None, target=None):
+        if name == "lark" or name.startswith("lark."):
+            raise ImportError("lark is not available")
+
+sys.meta_path.insert(0, BlockLark())
+from dynsym import load_compiled
+model = load_compiled(sys.argv[1])
+print(model.jacobians()[1].sum())
+"""
+
+
+def test_load_compiled_without_lark(tmp_path):
+
+    import subprocess
+    from dynsym import import_model, save_compiled
+
+    model = import_model("tests/rbc.dyno")
+    filename = str(tmp_path / "rbc.npz")
+    save_compiled(model, filename)
+
+    out = subprocess.run(
+        [sys.executable, "-c", LOAD_WITHOUT_LARK, filename], capture_output=True, text=True, check=True
+    )
+    assert np.isclose(float(out.stdout), model.jacobians()[1].sum())
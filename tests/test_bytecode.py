@@ -0,0 +1,37 @@
+import pickle
+import numpy as np
+
+
+def test_bytecode():
+
+    from dynsym import import_model
+    from dynsym.analyze import FormulaEvaluator
+
+    for filename in ["tests/rbc.dyno", "tests/neo.dyno"]:
+        model = import_model(filename)
+        program = model.bytecode
+        print(program)
+        print(program.disassemble())
+        ys, es = model.steady_state()
+        y = ys * 1.01
+        params = model.parameters
+        assert np.allclose(program(y, ys, ys, es, params), model.residuals(y, ys, ys, es))
+
+        fe = FormulaEvaluator(steady_state=True)
+        fe.visit(model.tree)
+        expected = [fe.visit(eq) for eq in fe.equations]
+        assert np.allclose(program(ys, ys, ys, es, params), expected)
+
+        # picklable, and works with dual numbers
+        copy = pickle.loads(pickle.dumps(program))
+        assert np.array_equal(copy.opcodes, program.opcodes)
+        assert np.allclose(copy(y, ys, ys, es, params), program(y, ys, ys, es, params))
+        index = model.compiled.index
+        seeds = [
+            [index.seed(v, shift, x[i]) for i, v in enumerate(model.endogenous)]
+            for shift, x in ((1, y), (0, ys), (-1, ys))
+        ]
+        seeds.append([index.seed(v, 0, es[i]) for i, v in enumerate(model.exogenous)])
+        res = program.run(*seeds, params)
+        r, A, B, C, D = model.compiled.jacobians(y, ys, ys, es)
+        assert np.allclose([v.gradient for v in res], np.hstack([A, B, C, D]))
@@ -0,0 +1,45 @@
+import os
+
+
+def test_parse_cache(tmp_path, monkeypatch):
+
+    from dynsym import cache
+    from dynsym.grammar import parser
+
+    monkeypatch.setenv("DYNSYM_CACHE_DIR", str(tmp_path))
+
+    txt = open("tests/rbc.dyno", "rt", encoding="utf-8").read()
+
+    key = cache.cache_key(txt)
+    assert cache.load(key) is None
+
+    tree = cache.parse(txt)
+    assert os.path.exists(tmp_path / (key + ".pickle"))
+
+    # warm load doesn't call the parser
+    monkeypatch.setattr(parser, "parse", None)
+    tree2 = cache.parse(txt)
+    assert tree2 == tree
+
+    # different content, different key
+    assert cache.cache_key(txt + "\n") != key
+
+
+def test_cache_eviction(tmp_path, monkeypatch):
+
+    import time
+    from dynsym import cache
+
+    monkeypatch.setenv("DYNSYM_CACHE_DIR", str(tmp_path))
+
+    for i in range(5):
+        cache.store(f"entry{i}", b"x" * 1000)
+        t = time.time() - 100 + i
+        os.utime(tmp_path / f"entry{i}.pickle", (t, t))
+
+    cache.evict(max_size=2500, max_age=10**12)
+    remaining = sorted(os.listdir(tmp_path))
+    assert remaining == ["entry3.pickle", "entry4.pickle"]
+
+    cache.evict(max_age=0)
+    assert os.listdir(tmp_path) == []
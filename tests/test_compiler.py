@@ -0,0 +1,63 @@
+import numpy as np
+
+
+def test_compile_equations():
+
+    from dynsym.grammar import parser
+    from dynsym.analyze import FormulaEvaluator
+    from dynsym.compiler import compile_equations
+
+    for filename in ["tests/rbc.dyno", "tests/neo.dyno"]:
+
+        txt = open(filename, "rt", encoding="utf-8").read()
+        tree = parser.parse(txt, start="free_block")
+
+        f = compile_equations(tree)
+        print(f.source)
+
+        # compare with the interpreter at the steady-state
+        fe = FormulaEvaluator(steady_state=True)
+        fe.visit(tree)
+        expected = [fe.visit(eq) for eq in fe.equations]
+
+        ys, es = f.steady_state
+        res = f(ys, ys, ys, es)
+
+        assert res.shape == (len(fe.equations),)
+        assert np.allclose(res, expected)
+
+        # the kernel itself works with plain lists
+        res_list = f.function(list(ys), list(ys), list(ys), list(es), list(f.parameter_values))
+        assert np.allclose(res_list, expected)
+
+
+def test_batch_evaluation():
+
+    from dynsym.grammar import parser
+    from dynsym.analyze import FormulaEvaluator
+    from dynsym.compiler import compile_equations
+
+    txt = open("tests/rbc.dyno", "rt", encoding="utf-8").read()
+    tree = parser.parse(txt, start="free_block")
+
+    f = compile_equations(tree)
+    ys, es = f.steady_state
+    N = 50
+    scale = np.linspace(0.9, 1.1, N)
+
+    Y = ys[:, None] * scale[None, :]
+    E = es[:, None] + 0.01 * scale[None, :]
+
+    # compiled kernel
+    res = f.batch(Y, Y, Y, E)
+    assert res.shape == (len(f.function(ys, ys, ys, es, f.parameter_values)), N)
+    for j in range(N):
+        assert np.allclose(res[:, j], f(Y[:, j], Y[:, j], Y[:, j], E[:, j]))
+
+    # interpreter
+    fe = FormulaEvaluator()
+    fe.visit(tree)
+    variables = {v: {s: Y[i] for s in (-1, 0, 1)} for i, v in enumerate(f.endogenous)}
+    variables.update({v: {0: E[i]} for i, v in enumerate(f.exogenous)})
+    res_fe = fe.evaluate_batch(variables)
+    assert np.allclose(res_fe, res)
@@ -0,0 +1,76 @@
+import numpy as np
+
+
+def test_hash_consing():
+
+    from dynsym.dag import ExpressionDAG
+
+    dag = ExpressionDAG()
+    x = dag.node("y", 0)
+    z = dag.node("y", 1)
+    assert dag.node("y", 0) == x
+    a = dag.node("add", x, z)
+    assert dag.node("add", z, x) == a
+    assert dag.node("sub", x, z) != dag.node("sub", z, x)
+    assert dag.node("number", 1) != dag.node("number", 1.0)
+    e1 = dag.node("call", "exp", a)
+    assert dag.node("call", "exp", a) == e1
+    assert len(dag) == 8
+
+    # only the nodes needed by the roots are evaluated
+    dag.node("div", x, dag.node("number", 0.0))
+    dag.roots = [a]
+    assert dag.evaluate(None, [1.0, 2.0], None, None, None) == (3.0,)
+
+
+def test_shared_subexpressions():
+
+    from dynsym import import_model
+    from dynsym.analyze import FormulaEvaluator
+
+    model = import_model("tests/rbc.dyno")
+    dag = model.compiled.dag
+    print(dag)
+    print(model.compiled.source)
+
+    # exp(b[t]) appears in two equations, exp(b[t+1]) twice in the same equation
+    exp_nodes = [n for n in dag.nodes if n[0] == "call" and n[1] == "exp"]
+    assert len(exp_nodes) == 3
+    assert model.compiled.source.count("exp(") == 3
+
+    ys, es = model.steady_state()
+    params = model.parameters
+
+    # DAG evaluation and compiled code agree with the interpreter
+    fe = FormulaEvaluator(steady_state=True)
+    fe.visit(model.tree)
+    expected = [fe.visit(eq) for eq in fe.equations]
+    assert np.allclose(dag.evaluate(ys, ys, ys, es, params), expected)
+    assert np.allclose(model.residuals(ys, ys, ys, es), expected)
+
+    # expression of each root
+    for r in dag.roots:
+        print(dag.expression(r))
+    assert "exp(y[4])" in dag.expression(dag.roots[3])
+
+
+def test_number_leaves():
+
+    from dynsym import Model
+    from dynsym.grammar import get_parser
+
+    txt = """
+a <- 0.5
+v[0] <- -2
+w[0] <- 1e400
+x[~] <- 0
+e[t] <- N(0, 0.1)
+x[t] = v[0]^2 + a*x[t-1] + e[t] + 1/w[0]
+"""
+    model = Model(get_parser().parse(txt, start="free_block"))
+    print(model.compiled.source)
+    y, e = np.array([4.0]), np.array([0.0])
+    # (-2)^2 + 0.5*4 + 0 + 1/inf - 4
+    assert np.allclose(model.residuals(y, y, y, e), [2.0])
+    assert np.allclose(model.bytecode(y, y, y, e, model.parameters), [2.0])
+    assert np.allclose(model.sparse_jacobian()(y, y, y, e)[0], [2.0])
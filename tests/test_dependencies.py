@@ -0,0 +1,84 @@
+import numpy as np
+
+
+def load(txt):
+    from dynsym.grammar import parser
+    from dynsym.model import Model
+    return Model(parser.parse(txt, start="free_block"))
+
+
+def test_dependency_graph():
+
+    txt = open("tests/neo.dyno", "rt", encoding="utf-8").read()
+    model = load(txt)
+    graph = model.dependencies
+    print(graph)
+
+    statements, changed = graph.downstream({("constant", "β")})
+    targets = [str(graph.statements[i].children[0].children[0].children[0]) for i in statements]
+    assert targets == ["k", "y", "i", "c"]
+    assert ("steady_state", "c") in changed
+    assert graph.affected_equations({("constant", "β")}) == [4]
+
+    statements, _ = graph.downstream({("constant", "ρ")})
+    assert len(statements) == 1  # kappa
+
+
+def test_update():
+
+    txt = open("tests/neo.dyno", "rt", encoding="utf-8").read()
+    model = load(txt)
+    r0, A0, B0, C0, D0 = model.jacobians()
+    model.update(β=0.97, ρ=0.8)
+
+    expected = load(txt.replace("β <- 0.96", "β <- 0.97").replace("ρ <- 0.9", "ρ <- 0.8"))
+    assert model.constants == expected.constants
+    assert model.steady_states == expected.steady_states
+    assert np.allclose(model.parameters, expected.parameters)
+    for a, b in zip(model.jacobians(), expected.jacobians()):
+        assert np.allclose(a, b)
+    assert not np.allclose(model.jacobians()[1], A0)
+
+    # steady-states can be updated too, and updates persist
+    model.update({"k[~]": 4.0})
+    assert model.steady_states["k"] == 4.0
+    assert np.isclose(model.steady_states["y"], 4.0 ** 0.387)
+    model.update(δ=0.05)
+    assert model.steady_states["k"] == 4.0
+    assert np.isclose(model.steady_states["i"], 0.05 * 4.0)
+
+    r, A, B, C, D = model.jacobians()
+    r1, A1, B1, C1, D1 = model.compiled.jacobians(*[model.steady_state()[0]] * 3, model.steady_state()[1])
+    assert np.allclose(A, A1) and np.allclose(B, B1) and np.allclose(C, C1)
+
+
+def test_update_values():
+
+    txt = open("tests/rbc.dyno", "rt", encoding="utf-8").read()
+    model = load(txt)
+    model.compiled
+    model.update(r=1.02)
+    expected = load(txt.replace("r <- 1.01", "r <- 1.02"))
+    assert model.constants["beta"] == 1 / 1.02
+    assert model.values == expected.values
+    assert np.allclose(model.residuals(*[model.steady_state()[0]] * 3, model.steady_state()[1]),
+                       expected.residuals(*[expected.steady_state()[0]] * 3, expected.steady_state()[1]))
+
+    # initial values defined from steady-states are recomputed
+    model.update({"k[~]": 12.0})
+    assert model.values["k"][0] == 12.0 * 1.01
+    assert model.steady_state()[0][model.endogenous.index("k")] == 12.0
+
+
+def test_update_keeps_parameter_order():
+
+    import pickle
+
+    txt = open("tests/rbc.dyno", "rt", encoding="utf-8").read()
+    model = load(txt)
+    # updated before compilation: `beta <- 1/r` is evaluated again, but keeps its position
+    model.update(r=1.05)
+    assert model.compiled.parameters == load(txt).compiled.parameters
+    copy = pickle.loads(pickle.dumps(model))
+    assert copy.compiled.parameters == model.compiled.parameters
+    assert np.array_equal(copy.parameters, model.parameters)
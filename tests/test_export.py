@@ -0,0 +1,65 @@
+import os
+import sys
+import shutil
+import subprocess
+import numpy as np
+
+
+def test_export(tmp_path):
+
+    from dynsym import import_model
+    from dynsym.export import import_exported, export_path
+
+    filename = str(tmp_path / "rbc.dyno")
+    shutil.copy("tests/rbc.dyno", filename)
+
+    module = import_exported(filename)
+    assert os.path.exists(export_path(filename))
+
+    model = import_model("tests/rbc.dyno")
+    ys, es = model.steady_state()
+    y = ys * 1.01
+    assert np.allclose(module.PARAMETER_VALUES, model.parameters)
+    assert np.allclose(module.STEADY_STATE[0], ys)
+    assert np.allclose(module.residuals(y, ys, ys, es), model.residuals(y, ys, ys, es))
+
+    r, A, B, C, D = model.jacobians(y, ys, ys, es)
+    r2, data = module.jacobian(y, ys, ys, es)
+    J = np.zeros(module.SHAPE)
+    J[np.repeat(np.arange(module.SHAPE[0]), np.diff(module.INDPTR)), module.INDICES] = data
+    assert np.allclose(r2, r)
+    assert np.allclose(J, np.hstack([A, B, C, D]))
+
+
+def test_export_cache(tmp_path, monkeypatch):
+
+    from dynsym import cache
+    from dynsym.export import import_exported, export_path
+
+    filename = str(tmp_path / "rbc.dyno")
+    shutil.copy("tests/rbc.dyno", filename)
+    first = export_path(filename)
+    import_exported(filename)
+
+    # the exported module is imported without reading the model again
+    with monkeypatch.context() as m:
+        m.setattr(cache, "parse", None)
+        module = import_exported(filename)
+    assert module.__file__ == first
+
+    # a new version of the model replaces the previous module
+    with open(filename, "at", encoding="utf-8") as f:
+        f.write("\n")
+    second = export_path(filename)
+    assert second != first
+    import_exported(filename)
+    assert os.path.exists(second)
+    assert not os.path.exists(first)
+
+    # exported modules are plain python modules
+    name = os.path.splitext(os.path.basename(second))[0]
+    code = f"import sys; import {name}; print('lark' in sys.modules, {name}.ENDOGENOUS)"
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=str(tmp_path / "__dynsym__"), capture_output=True, text=True, check=True
+    )
+    assert out.stdout.startswith("False")
@@ -0,0 +1,41 @@
+def test_fold_constants():
+
+    from dynsym.grammar import parser, str_expression
+    from dynsym.folding import fold_constants
+
+    tree = parser.parse("k[t] = beta*(1-delta)*k[t-1] + (1-alpha)/r*y[t] + exp(0)*z[~]", start="equation_block")
+    eq = tree.children[0]
+    constants = {'alpha': 0.36, 'beta': 0.99, 'delta': 0.025, 'r': 1.01}
+    (folded,) = fold_constants([eq], constants, {'z': 2.0})
+    s = str_expression(folded)
+    print(s)
+    assert "alpha" not in s and "beta" not in s and "delta" not in s and "z[~]" not in s
+    assert repr(0.99 * (1 - 0.025)) in s
+    assert repr((1 - 0.36) / 1.01) in s
+    # exp(0)*z[~] is folded too
+    assert s.endswith(" + 2.0")
+
+
+def test_folded_equations_update():
+
+    import numpy as np
+    from dynsym.grammar import parser
+    from dynsym.analyze import FormulaEvaluator
+    from dynsym.folding import FoldedEquations
+
+    txt = open("tests/rbc.dyno", "rt", encoding="utf-8").read()
+    tree = parser.parse(txt, start="free_block")
+
+    fe = FormulaEvaluator(steady_state=True)
+    fe.visit(tree)
+    expected = [fe.visit(eq) for eq in fe.equations]
+
+    folded = FoldedEquations(fe.equations, fe.constants, fe.steady_states)
+    assert [fe.visit(eq) for eq in folded.equations] == expected
+
+    # only equations depending on rho are folded again
+    affected = folded.update({'rho': 0.5})
+    assert affected == [4, 5]
+    fe.constants['rho'] = 0.5
+    expected = [fe.visit(eq) for eq in fe.equations]
+    assert np.allclose([fe.visit(eq) for eq in folded.equations], expected)
@@ -7,4 +7,26 @@ t1 = time.time()
 r,A,B,C,D = read_model("tests/rbc.dyno")
 t2 = time.time()
 
-print("Time to read and compute Jacobian: ", t2-t1)
\ No newline at end of file
+print("Time to read and compute Jacobian: ", t2-t1)
+
+# time budget for `import dynsym` (seconds)
+IMPORT_BUDGET = 0.5
+
+def test_import_time():
+
+    import sys
+    import subprocess
+
+    code = (
+        "import time; t = time.perf_counter(); import dynsym; t = time.perf_counter() - t; "
+        "import dynsym.grammar, sys; "
+        "assert dynsym.grammar._parser is None; "
+        "assert 'scipy' not in sys.modules; "
+        "print(t)"
+    )
+    timings = []
+    for i in range(3):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        timings.append(float(out.stdout))
+    print("Import time: ", min(timings))
+    assert min(timings) < IMPORT_BUDGET
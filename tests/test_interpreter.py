@@ -37,17 +37,10 @@ def test_symbols():
     """Test symbol evaluation"""
     print("Testing symbol evaluation...")
     
-    # Create evaluator with some symbols
-    symbol_table = {
-        'α': 0.36,
-        'σ': 2,
-        'c[t]': 10,
-        'y[t]': 15,
-        'y[t+1]': 20,
-        'k': 0.5,
-    }
-    
-    evaluator = FormulaEvaluator(symbol_table)
+    # Create evaluator with some symbols: constants, and variables by shift
+    evaluator = FormulaEvaluator()
+    evaluator.constants = {'α': 0.36, 'σ': 2, 'k': 0.5}
+    evaluator.variables = {'c': {0: 10}, 'y': {0: 15, 1: 20}}
     
     test_cases = [
         ("α", 0.36),
@@ -101,10 +94,10 @@ def test_assignments():
     result = evaluator.visit(tree)
     print(f"Assignment result: {result}")
     
-    # Check that the symbol was added to the table
-    assert 'σ' in evaluator.symbol_table
-    assert evaluator.symbol_table['σ'] == 2
-    print(f"Symbol table after assignment: {evaluator.symbol_table}")
+    # Check that the symbol was added to the constants
+    assert 'σ' in evaluator.constants
+    assert evaluator.constants['σ'] == 2
+    print(f"Symbol table after assignment: {evaluator.get_symbol_table()}")
     
     # Test using the assigned symbol
     formula_expr = "σ * 3"
@@ -121,17 +114,17 @@ def test_analyzer_convenience_class():
     
     analyzer = Analyzer()
     
-    # Add some symbols
-    analyzer.add_symbol('x', 5)
-    analyzer.add_symbol('y', 3)
+    # Define some symbols
+    analyzer.evaluate(parser.parse("x <- 5\ny <- 3\n", start="free_block"))
+    assert analyzer.get_symbol_table() == {'x': 5, 'y': 3}
     
-    # Test evaluation with string input
-    result = analyzer.evaluate("x + y")
+    # Test evaluation of a formula
+    result = analyzer.visit(parser.parse("x + y", start="formula"))
     print(f"x + y = {result} (expected: 8)")
     assert result == 8
     
     # Test evaluation with complex expression
-    result = analyzer.evaluate("x^2 + y^2")
+    result = analyzer.visit(parser.parse("x^2 + y^2", start="formula"))
     print(f"x^2 + y^2 = {result} (expected: 34)")
     assert result == 34
     
@@ -81,3 +81,81 @@ def test_math_functions():
 
 if __name__ == "__main__":
     test_math_functions()
+
+
+def test_dense_dual_numbers():
+    """Dense dual numbers give the same derivatives as dictionary-based ones."""
+
+    import numpy as np
+    from dynsym.autodiff import DenseDNumber, MATH_FUNCTIONS
+
+    for name, f in MATH_FUNCTIONS.items():
+        x0 = 0.3
+        if name in ('max', 'min', 'pow'):
+            args_dict = (DNumber(x0, {'x': 1.0}), 0.5)
+            args_dense = (DenseDNumber(x0, np.array([1.0, 0.0])), 0.5)
+        else:
+            args_dict = (DNumber(x0, {'x': 1.0}),)
+            args_dense = (DenseDNumber(x0, np.array([1.0, 0.0])),)
+        r_dict = f(*args_dict)
+        r_dense = f(*args_dense)
+        print(f"{name}: {r_dict} {r_dense}")
+        assert abs(r_dict.value - r_dense.value) < 1e-12
+        assert abs(r_dict.derivatives.get('x', 0.0) - r_dense.gradient[0]) < 1e-12
+        assert r_dense.gradient[1] == 0.0
+
+    # arithmetic
+    x = DenseDNumber(2.0, np.array([1.0, 0.0]))
+    y = DenseDNumber(3.0, np.array([0.0, 1.0]))
+    z = (x * y - x / y + 1) ** 2 + 2 ** x - 1 / y
+    u = DNumber(2.0, {'x': 1.0})
+    v = DNumber(3.0, {'y': 1.0})
+    w = (u * v - u / v + 1) ** 2 + 2 ** u - 1 / v
+    assert abs(z.value - w.value) < 1e-12
+    assert np.allclose(z.gradient, [w.derivatives['x'], w.derivatives['y']])
+
+
+def test_read_model_jacobian():
+    """The jacobian from read_model matches the one obtained with dictionary-based dual numbers."""
+
+    import numpy as np
+    from dynsym import read_model
+    from dynsym.grammar import parser
+    from dynsym.analyze import FormulaEvaluator
+
+    r, A, B, C, D = read_model("tests/rbc.dyno")
+
+    txt = open("tests/rbc.dyno", "rt", encoding="utf-8").read()
+    tree = parser.parse(txt, start="free_block")
+    fe = FormulaEvaluator(diff=True)
+    res = fe.evaluate(tree)
+    endogenous = fe.symbols['endogenous']
+    exogenous = fe.symbols['exogenous']
+
+    for n, eq in enumerate(res):
+        assert abs(eq.value - r[n]) < 1e-12
+        for i, v in enumerate(endogenous):
+            assert eq.derivatives.get(f"{v}[t+1]", 0.0) == A[n, i]
+            assert eq.derivatives.get(f"{v}[t]", 0.0) == B[n, i]
+            assert eq.derivatives.get(f"{v}[t-1]", 0.0) == C[n, i]
+        for i, v in enumerate(exogenous):
+            assert eq.derivatives.get(f"{v}[t]", 0.0) == D[n, i]
+
+
+def test_read_model_sparse():
+
+    import numpy as np
+    from dynsym import read_model
+    from dynsym.sparse import COOTriplets, sparse_matrix
+
+    r, A, B, C, D = read_model("tests/rbc.dyno")
+    r_s, A_s, B_s, C_s, D_s = read_model("tests/rbc.dyno", sparse=True)
+
+    assert np.allclose(r, r_s)
+    for M, M_s in zip([A, B, C, D], [A_s, B_s, C_s, D_s]):
+        assert M.shape == M_s.shape
+        assert np.allclose(M, M_s.toarray())
+
+    m = COOTriplets(np.array([0, 1]), np.array([1, 0]), np.array([2.0, 3.0]), (2, 2))
+    assert np.allclose(m.toarray(), [[0, 2], [3, 0]])
+    assert np.allclose(sparse_matrix(m.row, m.col, m.data, m.shape).toarray(), m.toarray())
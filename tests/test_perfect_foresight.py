@@ -0,0 +1,122 @@
+import numpy as np
+
+
+def test_stacked_jacobian():
+
+    from dynsym import import_model
+    from dynsym.perfect_foresight import (
+        exogenous_path, stacked_residuals, stacked_jacobian_blocks, stacked_jacobian, solve_block_tridiagonal,
+        StackedJacobian
+    )
+
+    model = import_model("tests/rbc.dyno")
+    ys, es = model.steady_state()
+    T = 5
+    n = len(ys)
+
+    rng = np.random.default_rng(0)
+    Y = np.tile(ys, (T + 2, 1)) * (1 + 0.01 * rng.random((T + 2, n)))
+    E = exogenous_path(model, T)
+
+    A, B, C = stacked_jacobian_blocks(model, Y, E)
+    J = stacked_jacobian(A, B, C).toarray()
+    assert J.shape == (T * n, T * n)
+
+    r0 = stacked_residuals(model, Y, E).ravel()
+    eps = 1e-7
+    J_fd = np.zeros_like(J)
+    for k in range(T * n):
+        Y1 = Y.copy()
+        Y1[1 + k // n, k % n] += eps
+        J_fd[:, k] = (stacked_residuals(model, Y1, E).ravel() - r0) / eps
+    assert np.allclose(J, J_fd, atol=1e-4)
+
+    # the stacked matrix is refilled from the sparse jacobian of the model
+    stacked = StackedJacobian(model, T)
+    print(stacked)
+    for scale in (1.0, 1.01):
+        r, J_sparse = stacked(Y * scale, E)
+        assert np.allclose(r, stacked_residuals(model, Y * scale, E))
+    assert np.allclose(J_sparse.toarray(), stacked_jacobian(*stacked_jacobian_blocks(model, Y * 1.01, E)).toarray())
+    r, J_sparse = stacked(Y, E)
+    assert np.allclose(J_sparse.toarray(), J)
+
+    # block elimination solves the same system
+    x = solve_block_tridiagonal(A, B, C, r0.reshape((T, n)))
+    assert np.allclose(J @ x.ravel(), r0)
+
+
+def test_solve_perfect_foresight():
+
+    from dynsym import import_model, solve_steady_state
+    from dynsym.perfect_foresight import solve_perfect_foresight
+
+    model = import_model("tests/neo.dyno")
+    ss = solve_steady_state(model)
+
+    sol = solve_perfect_foresight(model, T=200, steady_state=ss.x)
+    print(sol)
+    assert sol.success
+    assert sol.paths.shape == (202, len(model.endogenous))
+    # shocks hit at the beginning and vanish
+    assert abs(sol['z'][1] - 0.01) < 1e-10
+    assert np.allclose(sol.paths[-1], ss.x)
+
+    sol_b = solve_perfect_foresight(model, T=200, steady_state=ss.x, method="block")
+    assert sol_b.success
+    assert np.allclose(sol.paths, sol_b.paths)
+
+
+def test_exogenous_path():
+
+    from dynsym import Model
+    from dynsym.grammar import parser
+    from dynsym.perfect_foresight import exogenous_path
+
+    # dated values defined from other dated values
+    txt = """
+x[~] <- 0
+e[t] <- N(0, 0.1)
+e[0] <- 0.1
+e[1] <- e[0]*0.5
+∀ t, 2 <= t < 4 : e[t] <- e[t-1]*0.5
+x[t] = 0.5*x[t-1] + e[t]
+"""
+    model = Model(parser.parse(txt, start="free_block"))
+    assert model.values["e"][1] == 0.05
+    assert np.allclose(exogenous_path(model, 4)[:, 0], [0.1, 0.05, 0.025, 0.0125, 0, 0])
+
+
+def test_perfect_foresight_failures():
+
+    import warnings
+    from dynsym import Model, import_model
+    from dynsym.grammar import parser
+    from dynsym.perfect_foresight import solve_perfect_foresight, stacked_residuals
+
+    # singular jacobian at the guess
+    txt = """
+x[~] <- 0
+e[t] <- N(0, 0.1)
+x[t]^2 + 1 + 0*x[t-1] + e[t] = 0
+"""
+    model = Model(parser.parse(txt, start="free_block"))
+    for method in ("sparse", "block"):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            sol = solve_perfect_foresight(model, T=5, method=method)
+        assert not sol.success
+        assert np.all(sol.paths == 0)
+
+    # the shocks of rbc.dyno are too large for its horizon: iterations stop (or end) at the last
+    # accepted iterate, whose residuals are reported
+    model = import_model("tests/rbc.dyno")
+    sol = solve_perfect_foresight(model, maxit=20)
+    print(sol)
+    assert not sol.success
+    assert np.all(np.isfinite(sol.paths))
+    assert np.allclose(sol.residuals, stacked_residuals(model, sol.paths, sol.exogenous))
+    r0 = stacked_residuals(model, solve_perfect_foresight(model, maxit=0).paths, sol.exogenous)
+    assert np.linalg.norm(sol.residuals) < np.linalg.norm(r0)
+    sol_b = solve_perfect_foresight(model, maxit=20, method="block")
+    assert np.allclose(sol.paths, sol_b.paths)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+
+def test_solve_perturbation():
+
+    from dynsym import import_model
+    from dynsym.perturbation import solve_perturbation
+
+    for filename in ["tests/rbc.dyno", "tests/neo.dyno"]:
+
+        model = import_model(filename)
+        sol = solve_perturbation(model)
+        print(sol)
+        assert sol.bk
+
+        ys, es = sol.steady_state
+        r, A, B, C, D = model.jacobians(ys, ys, ys, es)
+        X, Y = sol.X, sol.Y
+        assert np.allclose(A @ X @ X + B @ X + C, 0, atol=1e-8)
+        assert np.allclose((A @ X + B) @ Y + D, 0, atol=1e-8)
+
+        sol_qz = solve_perturbation(model, method="qz")
+        assert np.allclose(sol_qz.X, X, atol=1e-8)
+        assert np.allclose(sol_qz.Y, Y, atol=1e-8)
+
+        # solutions are cached per parameter vector
+        assert solve_perturbation(model) is sol
+        params = model.parameters.copy()
+        assert solve_perturbation(model, params=params) is sol
+        params[model.compiled.parameters.index("rho" if "rho" in model.constants else "ρ")] = 0.5
+        assert solve_perturbation(model, params=params) is not sol
+
+
+def test_blanchard_kahn():
+
+    from dynsym import Model
+    from dynsym.grammar import parser
+    from dynsym.perturbation import solve_perturbation, BlanchardKahnError
+
+    txt = """
+    rho <- 1.5
+    x[~] <- 0
+    e[t] <- N(0, 0.1)
+    x[t] = rho*x[t-1] + e[t]
+    """
+    model = Model(parser.parse(txt, start="free_block"))
+    with pytest.raises(BlanchardKahnError):
+        solve_perturbation(model)
+    sol = solve_perturbation(model, check=False)
+    assert not sol.bk
+    assert np.allclose(sol.X, [[1.5]])
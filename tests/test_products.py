@@ -0,0 +1,30 @@
+import numpy as np
+
+
+def test_jvp_vjp():
+
+    from dynsym import import_model
+
+    for filename in ["tests/rbc.dyno", "tests/neo.dyno"]:
+        model = import_model(filename)
+        ys, es = model.steady_state()
+        rng = np.random.default_rng(0)
+        point = (ys * 1.01, ys, ys * 0.99, es + 0.001)
+        r, A, B, C, D = model.compiled.jacobians(*point)
+        J = np.hstack([A, B, C, D])
+
+        direction = tuple(rng.normal(size=len(x)) for x in point)
+        r1, Jv = model.jvp(point, direction)
+        assert np.allclose(r1, r)
+        assert np.allclose(Jv, J @ np.concatenate(direction))
+
+        w = rng.normal(size=len(r))
+        r2, grads = model.vjp(point, w)
+        assert np.allclose(r2, r)
+        assert np.allclose(np.concatenate(grads), w @ J)
+
+        # the tape is replayed at other points
+        r3, grads = model.vjp(None, w)
+        r, A, B, C, D = model.jacobians()
+        assert np.allclose(r3, r)
+        assert np.allclose(np.concatenate(grads), w @ np.hstack([A, B, C, D]))
@@ -0,0 +1,38 @@
+def test_profile_evaluator():
+
+    from dynsym.grammar import parser
+    from dynsym.analyze import FormulaEvaluator
+
+    txt = open("tests/rbc.dyno", "rt", encoding="utf-8").read()
+    tree = parser.parse(txt, start="free_block")
+
+    # no instrumentation by default
+    fe = FormulaEvaluator(diff="dense")
+    assert fe.profile is None
+    assert 'add' not in fe.__dict__
+
+    fe = FormulaEvaluator(diff="dense", profile=True)
+    res = fe.evaluate(tree)
+    report = fe.profile.report()
+    print(fe.profile)
+
+    assert report['rules']['equality']['calls'] == len(res)
+    assert report['rules']['quantified_assignment']['calls'] == 2
+    assert report['functions']['exp']['calls'] > 0
+    assert sorted(report['equations'].keys()) == list(range(len(res)))
+    assert report['duals']['allocations'] > 0
+    assert report['duals']['derivatives'] == report['duals']['allocations'] * fe.index.size
+
+
+def test_profile_compiled():
+
+    from dynsym import import_model
+
+    model = import_model("tests/rbc.dyno")
+    ys, es = model.steady_state()
+    profile = model.compiled.profile(ys, ys, ys, es)
+    report = profile.report()
+    print(profile)
+    assert len(report['equations']) == len(model.equations)
+    # exp(b[t+1]) appears twice in the same equation but is computed once
+    assert report['functions']['exp']['calls'] == 4
@@ -0,0 +1,82 @@
+import numpy as np
+
+
+def test_tape_functions():
+
+    from dynsym.reverse import Tape
+    from dynsym.autodiff import MATH_FUNCTIONS, DenseDNumber
+
+    tape = Tape()
+    x = tape.input(0.3)
+    y = tape.input(1.7)
+    f = tape.functions
+    outputs = [
+        f['sin'](x) * f['cos'](y) + f['tan'](x) - f['exp'](x) / f['log'](y) + f['sqrt'](y),
+        f['abs'](-x) + f['sinh'](x) * f['cosh'](y) - f['tanh'](y) + f['asin'](x) + f['acos'](x) + f['atan'](y),
+        f['log10'](y) + f['log2'](y) + f['floor'](y) * f['ceil'](x) + f['max'](x, y) - f['min'](x, y),
+        f['pow'](y, x) + x ** 2 + 2 ** y + y ** x - 1 / x,
+    ]
+    tape.output(outputs)
+
+    def dual(a, b):
+        fd = MATH_FUNCTIONS
+        x, y = DenseDNumber(a, np.array([1.0, 0.0])), DenseDNumber(b, np.array([0.0, 1.0]))
+        return [
+            fd['sin'](x) * fd['cos'](y) + fd['tan'](x) - fd['exp'](x) / fd['log'](y) + fd['sqrt'](y),
+            fd['abs'](-x) + fd['sinh'](x) * fd['cosh'](y) - fd['tanh'](y) + fd['asin'](x) + fd['acos'](x) + fd['atan'](y),
+            fd['log10'](y) + fd['log2'](y) + fd['floor'](y) * fd['ceil'](x) + fd['max'](x, y) - fd['min'](x, y),
+            fd['pow'](y, x) + x ** 2 + 2 ** y + y ** x - 1 / x,
+        ]
+
+    expected = dual(0.3, 1.7)
+    assert np.allclose([o.value for o in outputs], [d.value for d in expected])
+    assert np.allclose(tape.jacobian(), [d.gradient for d in expected])
+
+    # the tape can be replayed at another point
+    values = tape.forward([0.4, 1.2])
+    expected = dual(0.4, 1.2)
+    assert np.allclose(values, [d.value for d in expected])
+    w = np.array([1.0, -2.0, 0.5, 3.0])
+    assert np.allclose(tape.vjp(w), w @ np.array([d.gradient for d in expected]))
+
+
+def test_compiled_tape():
+
+    from dynsym import import_model
+
+    model = import_model("tests/rbc.dyno")
+    ys, es = model.steady_state()
+    compiled = model.compiled
+    tape = compiled.tape(ys, ys, ys, es)
+    print(tape)
+
+    y = ys * 1.01
+    values = tape.forward(np.concatenate([y, ys, ys, es, model.parameters]))
+    r, A, B, C, D = compiled.jacobians(y, ys, ys, es)
+    assert np.allclose(values, r)
+    w = np.arange(1.0, len(r) + 1)
+    g = tape.vjp(w)
+    assert np.allclose(g[:compiled.index.size], w @ np.hstack([A, B, C, D]))
+
+    # gradient w.r.t. the parameters, checked by finite differences
+    gp = g[compiled.index.size:]
+    p = model.parameters
+    k = compiled.parameters.index("alpha")
+    dp = np.zeros_like(p)
+    dp[k] = 1e-6
+    fd = (w @ compiled(y, ys, ys, es, p + dp) - w @ compiled(y, ys, ys, es, p - dp)) / 2e-6
+    assert np.isclose(gp[k], fd, rtol=1e-5)
+
+
+def test_evaluator_tape():
+
+    from dynsym.grammar import parser
+    from dynsym.analyze import FormulaEvaluator
+
+    tree = parser.parse(open("tests/neo.dyno", "rt", encoding="utf-8").read(), start="free_block")
+    fe = FormulaEvaluator(diff="reverse")
+    res = fe.evaluate(tree)
+    dense = FormulaEvaluator(diff="dense")
+    expected = dense.evaluate(tree)
+    assert np.allclose([getattr(v, 'value', v) for v in res], [getattr(v, 'value', v) for v in expected])
+    assert np.allclose(fe.tape.jacobian(), [v.gradient for v in expected])
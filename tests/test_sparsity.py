@@ -0,0 +1,64 @@
+import numpy as np
+
+
+def test_sparsity_pattern():
+
+    from dynsym import import_model
+
+    model = import_model("tests/rbc.dyno")
+    pattern = model.sparsity
+    print(pattern)
+    assert model.sparsity is pattern
+
+    ys, es = model.steady_state()
+    r, A, B, C, D = model.compiled.jacobians(ys * 1.01, ys, ys, es)
+    J = np.hstack([A, B, C, D])
+    # every nonzero derivative is in the pattern
+    assert not (J != 0)[~pattern.todense()].any()
+    # c[t]*theta*h[t]^(1+psi) = (1-alpha)*y[t] depends on c[t], h[t], y[t] only
+    n = len(model.endogenous)
+    expected = sorted(n + model.endogenous.index(v) for v in ["c", "h", "y"])
+    assert list(pattern.indices[pattern.indptr[0]:pattern.indptr[1]]) == expected
+
+
+def test_sparse_jacobian():
+
+    from dynsym import import_model
+
+    model = import_model("tests/neo.dyno")
+    jac = model.sparse_jacobian()
+    ys, es = model.steady_state()
+
+    r, M = jac(ys, ys, ys, es)
+    data = jac.data
+    for y in [ys * 1.01, ys * 0.98]:
+        r1, M1 = jac(y, ys, y, es)
+        # same preallocated objects, refilled
+        assert r1 is r and M1 is M and jac.data is data
+        expected = model.compiled.jacobians(y, ys, y, es)
+        assert np.allclose(r, expected[0])
+        assert np.allclose(M.toarray(), np.hstack(expected[1:]))
+
+
+def test_compressed_jacobian():
+
+    from dynsym import import_model
+    from dynsym.sparsity import color_columns
+
+    model = import_model("tests/rbc.dyno")
+    pattern = model.sparsity
+    colors, ncolors = color_columns(pattern)
+    # columns sharing a color have no common row
+    P = pattern.todense()
+    for c in range(ncolors):
+        assert P[:, colors == c].sum(axis=1).max() <= 1
+    assert ncolors < pattern.shape[1]
+
+    jac = model.sparse_jacobian(method="colored")
+    print(jac)
+    ys, es = model.steady_state()
+    y = ys * 1.01
+    r, M = jac(y, ys, y, es)
+    expected = model.compiled.jacobians(y, ys, y, es)
+    assert np.allclose(r, expected[0])
+    assert np.allclose(M.toarray(), np.hstack(expected[1:]))
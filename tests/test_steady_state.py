@@ -0,0 +1,78 @@
+import numpy as np
+
+
+def test_model_jacobians():
+
+    from dynsym import import_model, read_model
+
+    model = import_model("tests/rbc.dyno")
+    r, A, B, C, D = model.jacobians()
+    r_, A_, B_, C_, D_ = read_model("tests/rbc.dyno")
+
+    for M, M_ in zip([r, A, B, C, D], [r_, A_, B_, C_, D_]):
+        assert np.allclose(M, M_)
+
+
+def test_solve_steady_state():
+
+    from dynsym import import_model, solve_steady_state
+    from dynsym.steady_state import static_residuals
+
+    for filename in ["tests/rbc.dyno", "tests/neo.dyno"]:
+
+        model = import_model(filename)
+        ys, es = model.steady_state()
+
+        sol = solve_steady_state(model, guess=ys * 1.05)
+        print(sol)
+        print(sol.values)
+        assert sol.success
+        assert np.max(np.abs(static_residuals(model, sol.x, es))) < 1e-10
+        assert sol.timings['total'] > 0
+
+        # analytic jacobian of the static system matches finite differences
+        r, J = static_residuals(model, sol.x, es, diff=True)
+        eps = 1e-6
+        J_fd = np.column_stack([
+            (static_residuals(model, sol.x + eps * np.eye(len(ys))[i], es) - r) / eps
+            for i in range(len(ys))
+        ])
+        assert np.allclose(J, J_fd, atol=1e-4)
+
+
+def test_steady_state_failures():
+
+    from dynsym import Model, solve_steady_state
+    from dynsym.grammar import parser
+
+    # x^2 + 1 = 0 has no solution
+    txt = """
+x[~] <- {}
+x[t]^2 + 1 = 0
+"""
+    # singular jacobian at the guess
+    model = Model(parser.parse(txt.format(0.0), start="free_block"))
+    sol = solve_steady_state(model)
+    assert not sol.success
+    assert sol.x[0] == 0.0
+
+    # the line search eventually fails (near x=0): iterations stop at the last iterate
+    model = Model(parser.parse(txt.format(3.0), start="free_block"))
+    sol = solve_steady_state(model, maxit=50)
+    print(sol)
+    assert not sol.success
+    assert sol.iterations < 50
+    assert abs(sol.x[0]) < 1e-3
+    assert np.allclose(np.abs(sol.residuals), [sol.x[0] ** 2 + 1])
+
+    # trial steps outside the domain of the equations are rejected
+    txt = """
+x[~] <- 1.0
+e[t] <- N(0, 0.01)
+e[~] <- 0.0
+log(x[t]) + 0*x[t-1] + e[t] = -5
+"""
+    model = Model(parser.parse(txt, start="free_block"))
+    sol = solve_steady_state(model)
+    assert sol.success
+    assert np.isclose(sol.x[0], np.exp(-5))
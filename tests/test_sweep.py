@@ -0,0 +1,68 @@
+import pickle
+import pytest
+import numpy as np
+
+
+def test_pickle_model():
+
+    from dynsym import import_model
+
+    model = import_model("tests/neo.dyno")
+    model.update(ρ=0.8)
+    copy = pickle.loads(pickle.dumps(model))
+    assert copy.constants == model.constants
+    assert np.allclose(copy.parameters, model.parameters)
+
+
+def test_sweep():
+
+    from dynsym import import_model, sweep
+
+    model = import_model("tests/neo.dyno")
+    betas = np.linspace(0.95, 0.98, 7)
+
+    serial = sweep(model, {"β": betas}, max_workers=0, chunksize=3)
+    print(serial)
+    assert serial.success.all()
+    assert serial.A.shape == (7, len(model.equations), len(model.endogenous))
+
+    # deterministic ordering, whatever the chunk size
+    for k, b in enumerate(betas):
+        p = model.parameters.copy()
+        p[model.compiled.parameters.index("β")] = b
+        r, A, B, C, D = model.compiled.jacobians(*[serial.steady_state[k]] * 3, model.steady_state()[1], p)
+        assert np.allclose(serial.A[k], A)
+        assert np.allclose(r, 0, atol=1e-8)
+
+    pooled = sweep(model, serial.params, max_workers=2, chunksize=2)
+    assert np.array_equal(pooled.steady_state, serial.steady_state)
+    assert np.array_equal(pooled.B, serial.B)
+
+
+def test_sweep_derived_parameters():
+
+    from dynsym import import_model, sweep, solve_steady_state
+
+    # beta <- 1/r is recomputed for each row
+    model = import_model("tests/rbc.dyno")
+    result = sweep(model, {"r": [1.01, 1.05]}, max_workers=0)
+    assert result.success.all()
+    beta = model.compiled.parameters.index("beta")
+    assert np.allclose(result.params[:, beta], [1 / 1.01, 1 / 1.05])
+    # the model itself is left unchanged
+    assert model.constants["r"] == 1.01
+
+    model.update(r=1.05)
+    assert np.allclose(result.steady_state[1], solve_steady_state(model).x)
+    assert not np.allclose(result.steady_state[0], result.steady_state[1])
+
+    with pytest.raises(ValueError):
+        sweep(model, {"unknown": [1.0]}, max_workers=0)
+
+    # the steady-state is solved at the exogenous values of each row
+    model = import_model("tests/neo.dyno")
+    result = sweep(model, {"e_z[~]": [0.0, 0.01]}, max_workers=0)
+    assert result.success.all()
+    assert np.allclose(result.residuals, 0, atol=1e-8)
+    z = model.endogenous.index("z")
+    assert np.allclose(result.steady_state[:, z], [0.0, 0.01 / (1 - 0.9)])
@@ -0,0 +1,50 @@
+import numpy as np
+
+
+def test_symbolic_jacobian():
+
+    from dynsym import import_model
+
+    for filename in ["tests/rbc.dyno", "tests/neo.dyno"]:
+        model = import_model(filename)
+        ys, es = model.steady_state()
+        yl = ys * 1.01
+        sym = model.compiled.jacobians(yl, ys, ys, es)
+        dual = model.compiled.jacobians(yl, ys, ys, es, method="dual")
+        for a, b in zip(sym, dual):
+            assert np.allclose(a, b)
+
+    jac = model.compiled.symbolic
+    print(jac)
+    print(jac.source)
+    # only structural nonzeros are compiled
+    r, J = jac.dense(yl, ys, ys, es, model.parameters)
+    assert jac.nnz < J.size
+    assert np.count_nonzero(J) <= jac.nnz
+
+
+FUNCTIONS = """
+z[t] = 0.1
+
+a[t] = sin(a[t-1]) + cos(b[t]) * tan(c[t+1]) + exp(z[t])*log(b[t-1]) + sqrt(c[t]) / a[t+1]
+b[t] = sinh(a[t]) - cosh(b[t+1])^2 + tanh(c[t-1]) + asin(0.1*a[t]) + acos(0.1*b[t]) + atan(c[t])
+c[t] = max(a[t], b[t]) + min(a[t-1], 2*c[t]) + log10(c[t+1]) + log2(b[t]) + abs(a[t]-b[t]) + a[t]^b[t] + 2^c[t] + pow(a[t], 3)
+"""
+
+
+def test_symbolic_functions():
+
+    from dynsym.grammar import parser
+    from dynsym import compile_equations
+
+    tree = parser.parse(FUNCTIONS, start="free_block")
+    compiled = compile_equations(tree, endogenous=["a", "b", "c"], exogenous=["z"])
+    y = np.array([1.2, 1.5, 1.7])
+    y_lead = np.array([1.3, 1.1, 1.9])
+    y_lag = np.array([0.9, 1.4, 1.6])
+    e = np.array([0.1])
+    params = compiled.parameter_values
+    sym = compiled.jacobians(y_lead, y, y_lag, e, params)
+    dual = compiled.jacobians(y_lead, y, y_lag, e, params, method="dual")
+    for a, b in zip(sym, dual):
+        assert np.allclose(a, b)
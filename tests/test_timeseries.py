@@ -0,0 +1,118 @@
+import pytest
+import numpy as np
+
+
+QUANTIFIED = """
+rho <- 0.9
+e[0] <- 1.0
+∀ t, 1 <= t < 20000 : e[t] <- 0.99/(t+1) + exp(-t/1000)
+∀ t, 1 <= t < 20000 : u[t] <- e[t-1]*rho + e[t+1]
+∀ t, 1 <= t < 100 : v[t] <- 0.5
+∀ t, 0 <= t < 10 : x[t] <- 0.5 + 0*t
+∀ t, 10 <= t < 20 : x[t] <- x[t-1]*rho
+"""
+
+
+def test_vectorized_quantified_assignment():
+
+    import math
+    from dynsym.grammar import parser
+    from dynsym.analyze import FormulaEvaluator
+    from dynsym.timeseries import TimeSeries
+
+    fe = FormulaEvaluator()
+    fe.visit(parser.parse(QUANTIFIED, start="free_block"))
+    e, u, x = fe.values['e'], fe.values['u'], fe.values['x']
+    assert isinstance(e, TimeSeries)
+    assert (e.start, e.stop) == (0, 20000)
+    assert e[0] == 1.0
+    assert np.isclose(e[10], 0.99 / 11 + math.exp(-10 / 1000))
+    assert u[5] == e[4] * 0.9 + e[6]
+    # e[20000] is undefined
+    assert math.isnan(fe.values['u'].data[-1])
+    assert 19999 not in u
+    assert dict(fe.values['v']) == {t: 0.5 for t in range(1, 100)}
+    # recursive definitions are evaluated date by date
+    assert np.allclose([x[t] for t in range(10, 20)], [0.5 * 0.9 ** (k + 1) for k in range(10)])
+    assert 't' not in fe.constants and fe.time is None
+
+
+
+def test_quantified_assignment_arithmetic():
+
+    from dynsym.grammar import parser
+    from dynsym.analyze import FormulaEvaluator
+
+    # same results as date by date: t is not an integer array
+    fe = FormulaEvaluator()
+    fe.visit(parser.parse("∀ t, 1 <= t < 5 : e[t] <- t^(-2)", start="free_block"))
+    assert np.allclose([fe.values['e'][t] for t in range(1, 5)], [1, 0.25, 1 / 9, 0.0625])
+
+    # and the same errors
+    with pytest.raises(ZeroDivisionError):
+        FormulaEvaluator().visit(parser.parse("∀ t, 0 <= t < 5 : e[t] <- 1/t", start="free_block"))
+
+
+def test_timeseries():
+
+    from dynsym.timeseries import TimeSeries
+
+    ts = TimeSeries()
+    ts[3] = 1.0
+    ts[5] = 2.0
+    ts.assign(0, [0.5, 0.25])
+    assert dict(ts) == {0: 0.5, 1: 0.25, 3: 1.0, 5: 2.0}
+    assert 2 not in ts and 4 not in ts and 100 not in ts and -1 not in ts
+    assert ts.get(4) is None
+
+    # slices are views of the storage
+    view = ts[3:6]
+    assert (view.start, view.stop) == (3, 6)
+    assert np.shares_memory(view.data, ts.data)
+    assert dict(view) == {3: 1.0, 5: 2.0}
+    # dates outside of the storage are undefined
+    assert np.isnan(ts.at(-2, 1)[:2]).all() and ts.at(-2, 1)[2] == 0.5
+
+
+def test_undefined_values():
+
+    from dynsym.grammar import parser
+    from dynsym.analyze import FormulaEvaluator
+
+    txt = """
+k[0] <- 1.0
+k[2] <- 3.0
+a <- k[1] + k[2]
+b <- z[0]
+"""
+    fe = FormulaEvaluator()
+    fe.visit(parser.parse(txt, start="free_block"))
+    assert [str(e) for e in fe.errors] == ["(4, 6): Undefined value k[1]", "(5, 6): Undefined value z[~]"]
+    assert fe.values['k'][2] == 3.0
+
+
+def test_batch_values():
+
+    from dynsym.grammar import parser
+    from dynsym.analyze import FormulaEvaluator
+
+    txt = """
+a <- 0.5
+v[0] <- 1.0
+x[~] <- 2.0
+x[t] = a*x[t-1] + v[0]
+"""
+    fe = FormulaEvaluator()
+    fe.visit(parser.parse(txt, start="free_block"))
+    # values can be arrays of shape (N,) in batch evaluation
+    v = np.array([1.0, 2.0, 3.0])
+    fe.values["v"][0] = v
+    assert np.array_equal(fe.values["v"][0], v)
+    x = np.array([2.0, 4.0, 6.0])
+    res = fe.evaluate_batch({"x": {-1: x, 0: x}})
+    assert res.shape == (1, 3)
+    assert np.allclose(res[0], 0.5 * x + v - x)
+
+    # a scalar value replaces the array
+    fe.values["v"][0] = 1.0
+    assert fe.values["v"][0] == 1.0 and dict(fe.values["v"]) == {0: 1.0}